@@ -109,8 +109,479 @@ class Column(object):
         o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
         return o == 0
 
+    # Column
+    def Stats(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        if o != 0:
+            x = o + self._tab.Pos
+            from Project.DataFrame.ColumnStats import ColumnStats
+            obj = ColumnStats()
+            obj.Init(self._tab.Bytes, x)
+            return obj
+        return None
+
+    # Column
+    def MinString(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(14))
+        if o != 0:
+            return self._tab.String(o + self._tab.Pos)
+        return None
+
+    # Column
+    def MaxString(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(16))
+        if o != 0:
+            return self._tab.String(o + self._tab.Pos)
+        return None
+
+    # Column
+    def Dictionary(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(18))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.String(a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 4))
+        return ""
+
+    # Column
+    def DictionaryLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(18))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def DictionaryIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(18))
+        return o == 0
+
+    # Column
+    def Codes(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(20))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int32Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 4))
+        return 0
+
+    # Column
+    def CodesAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(20))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int32Flags, o)
+        return 0
+
+    # Column
+    def CodesLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(20))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def CodesIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(20))
+        return o == 0
+
+    # Column
+    def StringData(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(22))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Uint8Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 1))
+        return 0
+
+    # Column
+    def StringDataAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(22))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Uint8Flags, o)
+        return 0
+
+    # Column
+    def StringDataLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(22))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def StringDataIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(22))
+        return o == 0
+
+    # Column
+    def StringOffsets(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(24))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int32Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 4))
+        return 0
+
+    # Column
+    def StringOffsetsAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(24))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int32Flags, o)
+        return 0
+
+    # Column
+    def StringOffsetsLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(24))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def StringOffsetsIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(24))
+        return o == 0
+
+    # Column
+    def LargeStringOffsets(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(26))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int64Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 8))
+        return 0
+
+    # Column
+    def LargeStringOffsetsAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(26))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int64Flags, o)
+        return 0
+
+    # Column
+    def LargeStringOffsetsLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(26))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def LargeStringOffsetsIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(26))
+        return o == 0
+
+    # Column
+    def BoolValues(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(28))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.BoolFlags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 1))
+        return 0
+
+    # Column
+    def BoolValuesAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(28))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.BoolFlags, o)
+        return 0
+
+    # Column
+    def BoolValuesLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(28))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def BoolValuesIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(28))
+        return o == 0
+
+    # Column
+    def Int8Values(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(30))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int8Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 1))
+        return 0
+
+    # Column
+    def Int8ValuesAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(30))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int8Flags, o)
+        return 0
+
+    # Column
+    def Int8ValuesLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(30))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def Int8ValuesIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(30))
+        return o == 0
+
+    # Column
+    def Int16Values(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(32))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int16Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 2))
+        return 0
+
+    # Column
+    def Int16ValuesAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(32))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int16Flags, o)
+        return 0
+
+    # Column
+    def Int16ValuesLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(32))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def Int16ValuesIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(32))
+        return o == 0
+
+    # Column
+    def Int32Values(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(34))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int32Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 4))
+        return 0
+
+    # Column
+    def Int32ValuesAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(34))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int32Flags, o)
+        return 0
+
+    # Column
+    def Int32ValuesLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(34))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def Int32ValuesIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(34))
+        return o == 0
+
+    # Column
+    def Uint8Values(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(36))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Uint8Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 1))
+        return 0
+
+    # Column
+    def Uint8ValuesAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(36))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Uint8Flags, o)
+        return 0
+
+    # Column
+    def Uint8ValuesLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(36))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def Uint8ValuesIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(36))
+        return o == 0
+
+    # Column
+    def Uint16Values(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(38))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Uint16Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 2))
+        return 0
+
+    # Column
+    def Uint16ValuesAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(38))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Uint16Flags, o)
+        return 0
+
+    # Column
+    def Uint16ValuesLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(38))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def Uint16ValuesIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(38))
+        return o == 0
+
+    # Column
+    def Uint32Values(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(40))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Uint32Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 4))
+        return 0
+
+    # Column
+    def Uint32ValuesAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(40))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Uint32Flags, o)
+        return 0
+
+    # Column
+    def Uint32ValuesLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(40))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def Uint32ValuesIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(40))
+        return o == 0
+
+    # Column
+    def Uint64Values(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(42))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Uint64Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 8))
+        return 0
+
+    # Column
+    def Uint64ValuesAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(42))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Uint64Flags, o)
+        return 0
+
+    # Column
+    def Uint64ValuesLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(42))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def Uint64ValuesIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(42))
+        return o == 0
+
+    # Column
+    def Float32Values(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(44))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Float32Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 4))
+        return 0
+
+    # Column
+    def Float32ValuesAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(44))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Float32Flags, o)
+        return 0
+
+    # Column
+    def Float32ValuesLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(44))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def Float32ValuesIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(44))
+        return o == 0
+
+    # Column
+    def Validity(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(46))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Uint8Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 1))
+        return 0
+
+    # Column
+    def ValidityAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(46))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Uint8Flags, o)
+        return 0
+
+    # Column
+    def ValidityLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(46))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def ValidityIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(46))
+        return o == 0
+
+    # Column
+    def Encoding(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(48))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Int8Flags, o + self._tab.Pos)
+        return 0
+
+    # Column
+    def EncodedType(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(50))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Int8Flags, o + self._tab.Pos)
+        return 0
+
+    # Column
+    def Reference(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(52))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Int64Flags, o + self._tab.Pos)
+        return 0
+
+    # Column
+    def RunEnds(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(54))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int64Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 8))
+        return 0
+
+    # Column
+    def RunEndsAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(54))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int64Flags, o)
+        return 0
+
+    # Column
+    def RunEndsLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(54))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Column
+    def RunEndsIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(54))
+        return o == 0
+
 def ColumnStart(builder):
-    builder.StartObject(4)
+    builder.StartObject(26)
 
 def Start(builder):
     ColumnStart(builder)
@@ -157,6 +628,234 @@ def ColumnStartStringValuesVector(builder, numElems):
 def StartStringValuesVector(builder, numElems):
     return ColumnStartStringValuesVector(builder, numElems)
 
+def ColumnAddStats(builder, stats):
+    builder.PrependStructSlot(4, flatbuffers.number_types.UOffsetTFlags.py_type(stats), 0)
+
+def AddStats(builder, stats):
+    ColumnAddStats(builder, stats)
+
+def ColumnAddMinString(builder, minString):
+    builder.PrependUOffsetTRelativeSlot(5, flatbuffers.number_types.UOffsetTFlags.py_type(minString), 0)
+
+def AddMinString(builder, minString):
+    ColumnAddMinString(builder, minString)
+
+def ColumnAddMaxString(builder, maxString):
+    builder.PrependUOffsetTRelativeSlot(6, flatbuffers.number_types.UOffsetTFlags.py_type(maxString), 0)
+
+def AddMaxString(builder, maxString):
+    ColumnAddMaxString(builder, maxString)
+
+def ColumnAddDictionary(builder, dictionary):
+    builder.PrependUOffsetTRelativeSlot(7, flatbuffers.number_types.UOffsetTFlags.py_type(dictionary), 0)
+
+def AddDictionary(builder, dictionary):
+    ColumnAddDictionary(builder, dictionary)
+
+def ColumnStartDictionaryVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartDictionaryVector(builder, numElems):
+    return ColumnStartDictionaryVector(builder, numElems)
+
+def ColumnAddCodes(builder, codes):
+    builder.PrependUOffsetTRelativeSlot(8, flatbuffers.number_types.UOffsetTFlags.py_type(codes), 0)
+
+def AddCodes(builder, codes):
+    ColumnAddCodes(builder, codes)
+
+def ColumnStartCodesVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartCodesVector(builder, numElems):
+    return ColumnStartCodesVector(builder, numElems)
+
+def ColumnAddStringData(builder, stringData):
+    builder.PrependUOffsetTRelativeSlot(9, flatbuffers.number_types.UOffsetTFlags.py_type(stringData), 0)
+
+def AddStringData(builder, stringData):
+    ColumnAddStringData(builder, stringData)
+
+def ColumnStartStringDataVector(builder, numElems):
+    return builder.StartVector(1, numElems, 1)
+
+def StartStringDataVector(builder, numElems):
+    return ColumnStartStringDataVector(builder, numElems)
+
+def ColumnAddStringOffsets(builder, stringOffsets):
+    builder.PrependUOffsetTRelativeSlot(10, flatbuffers.number_types.UOffsetTFlags.py_type(stringOffsets), 0)
+
+def AddStringOffsets(builder, stringOffsets):
+    ColumnAddStringOffsets(builder, stringOffsets)
+
+def ColumnStartStringOffsetsVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartStringOffsetsVector(builder, numElems):
+    return ColumnStartStringOffsetsVector(builder, numElems)
+
+def ColumnAddLargeStringOffsets(builder, largeStringOffsets):
+    builder.PrependUOffsetTRelativeSlot(11, flatbuffers.number_types.UOffsetTFlags.py_type(largeStringOffsets), 0)
+
+def AddLargeStringOffsets(builder, largeStringOffsets):
+    ColumnAddLargeStringOffsets(builder, largeStringOffsets)
+
+def ColumnStartLargeStringOffsetsVector(builder, numElems):
+    return builder.StartVector(8, numElems, 8)
+
+def StartLargeStringOffsetsVector(builder, numElems):
+    return ColumnStartLargeStringOffsetsVector(builder, numElems)
+
+def ColumnAddBoolValues(builder, boolValues):
+    builder.PrependUOffsetTRelativeSlot(12, flatbuffers.number_types.UOffsetTFlags.py_type(boolValues), 0)
+
+def AddBoolValues(builder, boolValues):
+    ColumnAddBoolValues(builder, boolValues)
+
+def ColumnStartBoolValuesVector(builder, numElems):
+    return builder.StartVector(1, numElems, 1)
+
+def StartBoolValuesVector(builder, numElems):
+    return ColumnStartBoolValuesVector(builder, numElems)
+
+def ColumnAddInt8Values(builder, int8Values):
+    builder.PrependUOffsetTRelativeSlot(13, flatbuffers.number_types.UOffsetTFlags.py_type(int8Values), 0)
+
+def AddInt8Values(builder, int8Values):
+    ColumnAddInt8Values(builder, int8Values)
+
+def ColumnStartInt8ValuesVector(builder, numElems):
+    return builder.StartVector(1, numElems, 1)
+
+def StartInt8ValuesVector(builder, numElems):
+    return ColumnStartInt8ValuesVector(builder, numElems)
+
+def ColumnAddInt16Values(builder, int16Values):
+    builder.PrependUOffsetTRelativeSlot(14, flatbuffers.number_types.UOffsetTFlags.py_type(int16Values), 0)
+
+def AddInt16Values(builder, int16Values):
+    ColumnAddInt16Values(builder, int16Values)
+
+def ColumnStartInt16ValuesVector(builder, numElems):
+    return builder.StartVector(2, numElems, 2)
+
+def StartInt16ValuesVector(builder, numElems):
+    return ColumnStartInt16ValuesVector(builder, numElems)
+
+def ColumnAddInt32Values(builder, int32Values):
+    builder.PrependUOffsetTRelativeSlot(15, flatbuffers.number_types.UOffsetTFlags.py_type(int32Values), 0)
+
+def AddInt32Values(builder, int32Values):
+    ColumnAddInt32Values(builder, int32Values)
+
+def ColumnStartInt32ValuesVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartInt32ValuesVector(builder, numElems):
+    return ColumnStartInt32ValuesVector(builder, numElems)
+
+def ColumnAddUint8Values(builder, uint8Values):
+    builder.PrependUOffsetTRelativeSlot(16, flatbuffers.number_types.UOffsetTFlags.py_type(uint8Values), 0)
+
+def AddUint8Values(builder, uint8Values):
+    ColumnAddUint8Values(builder, uint8Values)
+
+def ColumnStartUint8ValuesVector(builder, numElems):
+    return builder.StartVector(1, numElems, 1)
+
+def StartUint8ValuesVector(builder, numElems):
+    return ColumnStartUint8ValuesVector(builder, numElems)
+
+def ColumnAddUint16Values(builder, uint16Values):
+    builder.PrependUOffsetTRelativeSlot(17, flatbuffers.number_types.UOffsetTFlags.py_type(uint16Values), 0)
+
+def AddUint16Values(builder, uint16Values):
+    ColumnAddUint16Values(builder, uint16Values)
+
+def ColumnStartUint16ValuesVector(builder, numElems):
+    return builder.StartVector(2, numElems, 2)
+
+def StartUint16ValuesVector(builder, numElems):
+    return ColumnStartUint16ValuesVector(builder, numElems)
+
+def ColumnAddUint32Values(builder, uint32Values):
+    builder.PrependUOffsetTRelativeSlot(18, flatbuffers.number_types.UOffsetTFlags.py_type(uint32Values), 0)
+
+def AddUint32Values(builder, uint32Values):
+    ColumnAddUint32Values(builder, uint32Values)
+
+def ColumnStartUint32ValuesVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartUint32ValuesVector(builder, numElems):
+    return ColumnStartUint32ValuesVector(builder, numElems)
+
+def ColumnAddUint64Values(builder, uint64Values):
+    builder.PrependUOffsetTRelativeSlot(19, flatbuffers.number_types.UOffsetTFlags.py_type(uint64Values), 0)
+
+def AddUint64Values(builder, uint64Values):
+    ColumnAddUint64Values(builder, uint64Values)
+
+def ColumnStartUint64ValuesVector(builder, numElems):
+    return builder.StartVector(8, numElems, 8)
+
+def StartUint64ValuesVector(builder, numElems):
+    return ColumnStartUint64ValuesVector(builder, numElems)
+
+def ColumnAddFloat32Values(builder, float32Values):
+    builder.PrependUOffsetTRelativeSlot(20, flatbuffers.number_types.UOffsetTFlags.py_type(float32Values), 0)
+
+def AddFloat32Values(builder, float32Values):
+    ColumnAddFloat32Values(builder, float32Values)
+
+def ColumnStartFloat32ValuesVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartFloat32ValuesVector(builder, numElems):
+    return ColumnStartFloat32ValuesVector(builder, numElems)
+
+def ColumnAddValidity(builder, validity):
+    builder.PrependUOffsetTRelativeSlot(21, flatbuffers.number_types.UOffsetTFlags.py_type(validity), 0)
+
+def AddValidity(builder, validity):
+    ColumnAddValidity(builder, validity)
+
+def ColumnStartValidityVector(builder, numElems):
+    return builder.StartVector(1, numElems, 1)
+
+def StartValidityVector(builder, numElems):
+    return ColumnStartValidityVector(builder, numElems)
+
+def ColumnAddEncoding(builder, encoding):
+    builder.PrependInt8Slot(22, encoding, 0)
+
+def AddEncoding(builder, encoding):
+    ColumnAddEncoding(builder, encoding)
+
+def ColumnAddEncodedType(builder, encodedType):
+    builder.PrependInt8Slot(23, encodedType, 0)
+
+def AddEncodedType(builder, encodedType):
+    ColumnAddEncodedType(builder, encodedType)
+
+def ColumnAddReference(builder, reference):
+    builder.PrependInt64Slot(24, reference, 0)
+
+def AddReference(builder, reference):
+    ColumnAddReference(builder, reference)
+
+def ColumnAddRunEnds(builder, runEnds):
+    builder.PrependUOffsetTRelativeSlot(25, flatbuffers.number_types.UOffsetTFlags.py_type(runEnds), 0)
+
+def AddRunEnds(builder, runEnds):
+    ColumnAddRunEnds(builder, runEnds)
+
+def ColumnStartRunEndsVector(builder, numElems):
+    return builder.StartVector(8, numElems, 8)
+
+def StartRunEndsVector(builder, numElems):
+    return ColumnStartRunEndsVector(builder, numElems)
+
 def ColumnEnd(builder):
     return builder.EndObject()
 
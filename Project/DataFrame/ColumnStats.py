@@ -0,0 +1,41 @@
+# automatically generated by the FlatBuffers compiler, do not modify
+
+# namespace: DataFrame
+
+import flatbuffers
+from flatbuffers.compat import import_numpy
+np = import_numpy()
+
+class ColumnStats(object):
+    __slots__ = ['_tab']
+
+    @classmethod
+    def SizeOf(cls):
+        return 48
+
+    # ColumnStats
+    def Init(self, buf, pos):
+        self._tab = flatbuffers.table.Table(buf, pos)
+
+    # ColumnStats
+    def RowCount(self): return self._tab.Get(flatbuffers.number_types.Int64Flags, self._tab.Pos + flatbuffers.number_types.UOffsetTFlags.py_type(0))
+    # ColumnStats
+    def NullCount(self): return self._tab.Get(flatbuffers.number_types.Int64Flags, self._tab.Pos + flatbuffers.number_types.UOffsetTFlags.py_type(8))
+    # ColumnStats
+    def MinInt(self): return self._tab.Get(flatbuffers.number_types.Int64Flags, self._tab.Pos + flatbuffers.number_types.UOffsetTFlags.py_type(16))
+    # ColumnStats
+    def MaxInt(self): return self._tab.Get(flatbuffers.number_types.Int64Flags, self._tab.Pos + flatbuffers.number_types.UOffsetTFlags.py_type(24))
+    # ColumnStats
+    def MinFloat(self): return self._tab.Get(flatbuffers.number_types.Float64Flags, self._tab.Pos + flatbuffers.number_types.UOffsetTFlags.py_type(32))
+    # ColumnStats
+    def MaxFloat(self): return self._tab.Get(flatbuffers.number_types.Float64Flags, self._tab.Pos + flatbuffers.number_types.UOffsetTFlags.py_type(40))
+
+def CreateColumnStats(builder, rowCount, nullCount, minInt, maxInt, minFloat, maxFloat):
+    builder.Prep(8, 48)
+    builder.PrependFloat64(maxFloat)
+    builder.PrependFloat64(minFloat)
+    builder.PrependInt64(maxInt)
+    builder.PrependInt64(minInt)
+    builder.PrependInt64(nullCount)
+    builder.PrependInt64(rowCount)
+    return builder.Offset()
@@ -57,8 +57,67 @@ class DataFrame(object):
         o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(6))
         return o == 0
 
+    # DataFrame
+    def RowGroups(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(8))
+        if o != 0:
+            x = self._tab.Vector(o)
+            x += flatbuffers.number_types.UOffsetTFlags.py_type(j) * 4
+            x = self._tab.Indirect(x)
+            from Project.DataFrame.RowGroup import RowGroup
+            obj = RowGroup()
+            obj.Init(self._tab.Bytes, x)
+            return obj
+        return None
+
+    # DataFrame
+    def RowGroupsLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(8))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # DataFrame
+    def RowGroupsIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(8))
+        return o == 0
+
+    # DataFrame
+    def SortedColumns(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.Get(flatbuffers.number_types.Int32Flags, a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 4))
+        return 0
+
+    # DataFrame
+    def SortedColumnsAsNumpy(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        if o != 0:
+            return self._tab.GetVectorAsNumpy(flatbuffers.number_types.Int32Flags, o)
+        return 0
+
+    # DataFrame
+    def SortedColumnsLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # DataFrame
+    def SortedColumnsIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        return o == 0
+
+    # DataFrame
+    def SchemaId(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Uint64Flags, o + self._tab.Pos)
+        return 0
+
 def DataFrameStart(builder):
-    builder.StartObject(2)
+    builder.StartObject(5)
 
 def Start(builder):
     DataFrameStart(builder)
@@ -81,6 +140,36 @@ def DataFrameStartColumnsVector(builder, numElems):
 def StartColumnsVector(builder, numElems):
     return DataFrameStartColumnsVector(builder, numElems)
 
+def DataFrameAddRowGroups(builder, rowGroups):
+    builder.PrependUOffsetTRelativeSlot(2, flatbuffers.number_types.UOffsetTFlags.py_type(rowGroups), 0)
+
+def AddRowGroups(builder, rowGroups):
+    DataFrameAddRowGroups(builder, rowGroups)
+
+def DataFrameStartRowGroupsVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartRowGroupsVector(builder, numElems):
+    return DataFrameStartRowGroupsVector(builder, numElems)
+
+def DataFrameAddSortedColumns(builder, sortedColumns):
+    builder.PrependUOffsetTRelativeSlot(3, flatbuffers.number_types.UOffsetTFlags.py_type(sortedColumns), 0)
+
+def AddSortedColumns(builder, sortedColumns):
+    DataFrameAddSortedColumns(builder, sortedColumns)
+
+def DataFrameStartSortedColumnsVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartSortedColumnsVector(builder, numElems):
+    return DataFrameStartSortedColumnsVector(builder, numElems)
+
+def DataFrameAddSchemaId(builder, schemaId):
+    builder.PrependUint64Slot(4, schemaId, 0)
+
+def AddSchemaId(builder, schemaId):
+    DataFrameAddSchemaId(builder, schemaId)
+
 def DataFrameEnd(builder):
     return builder.EndObject()
 
@@ -38,8 +38,42 @@ class Metadata(object):
             return self._tab.Get(flatbuffers.number_types.Int8Flags, o + self._tab.Pos)
         return 0
 
+    # Metadata
+    def PandasDtype(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(8))
+        if o != 0:
+            return self._tab.String(o + self._tab.Pos)
+        return None
+
+    # Metadata
+    def Categories(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        if o != 0:
+            a = self._tab.Vector(o)
+            return self._tab.String(a + flatbuffers.number_types.UOffsetTFlags.py_type(j * 4))
+        return ""
+
+    # Metadata
+    def CategoriesLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # Metadata
+    def CategoriesIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
+        return o == 0
+
+    # Metadata
+    def Ordered(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        if o != 0:
+            return bool(self._tab.Get(flatbuffers.number_types.BoolFlags, o + self._tab.Pos))
+        return False
+
 def MetadataStart(builder):
-    builder.StartObject(2)
+    builder.StartObject(5)
 
 def Start(builder):
     MetadataStart(builder)
@@ -56,6 +90,30 @@ def MetadataAddDtype(builder, dtype):
 def AddDtype(builder, dtype):
     MetadataAddDtype(builder, dtype)
 
+def MetadataAddPandasDtype(builder, pandasDtype):
+    builder.PrependUOffsetTRelativeSlot(2, flatbuffers.number_types.UOffsetTFlags.py_type(pandasDtype), 0)
+
+def AddPandasDtype(builder, pandasDtype):
+    MetadataAddPandasDtype(builder, pandasDtype)
+
+def MetadataAddCategories(builder, categories):
+    builder.PrependUOffsetTRelativeSlot(3, flatbuffers.number_types.UOffsetTFlags.py_type(categories), 0)
+
+def AddCategories(builder, categories):
+    MetadataAddCategories(builder, categories)
+
+def MetadataStartCategoriesVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartCategoriesVector(builder, numElems):
+    return MetadataStartCategoriesVector(builder, numElems)
+
+def MetadataAddOrdered(builder, ordered):
+    builder.PrependBoolSlot(4, ordered, 0)
+
+def AddOrdered(builder, ordered):
+    MetadataAddOrdered(builder, ordered)
+
 def MetadataEnd(builder):
     return builder.EndObject()
 
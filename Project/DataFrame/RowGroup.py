@@ -0,0 +1,87 @@
+# automatically generated by the FlatBuffers compiler, do not modify
+
+# namespace: DataFrame
+
+import flatbuffers
+from flatbuffers.compat import import_numpy
+np = import_numpy()
+
+class RowGroup(object):
+    __slots__ = ['_tab']
+
+    @classmethod
+    def GetRootAs(cls, buf, offset=0):
+        n = flatbuffers.encode.Get(flatbuffers.packer.uoffset, buf, offset)
+        x = RowGroup()
+        x.Init(buf, n + offset)
+        return x
+
+    @classmethod
+    def GetRootAsRowGroup(cls, buf, offset=0):
+        """This method is deprecated. Please switch to GetRootAs."""
+        return cls.GetRootAs(buf, offset)
+    # RowGroup
+    def Init(self, buf, pos):
+        self._tab = flatbuffers.table.Table(buf, pos)
+
+    # RowGroup
+    def NumRows(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(4))
+        if o != 0:
+            return self._tab.Get(flatbuffers.number_types.Int64Flags, o + self._tab.Pos)
+        return 0
+
+    # RowGroup
+    def Columns(self, j):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(6))
+        if o != 0:
+            x = self._tab.Vector(o)
+            x += flatbuffers.number_types.UOffsetTFlags.py_type(j) * 4
+            x = self._tab.Indirect(x)
+            from Project.DataFrame.Column import Column
+            obj = Column()
+            obj.Init(self._tab.Bytes, x)
+            return obj
+        return None
+
+    # RowGroup
+    def ColumnsLength(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(6))
+        if o != 0:
+            return self._tab.VectorLen(o)
+        return 0
+
+    # RowGroup
+    def ColumnsIsNone(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(6))
+        return o == 0
+
+def RowGroupStart(builder):
+    builder.StartObject(2)
+
+def Start(builder):
+    RowGroupStart(builder)
+
+def RowGroupAddNumRows(builder, numRows):
+    builder.PrependInt64Slot(0, numRows, 0)
+
+def AddNumRows(builder, numRows):
+    RowGroupAddNumRows(builder, numRows)
+
+def RowGroupAddColumns(builder, columns):
+    builder.PrependUOffsetTRelativeSlot(1, flatbuffers.number_types.UOffsetTFlags.py_type(columns), 0)
+
+def AddColumns(builder, columns):
+    RowGroupAddColumns(builder, columns)
+
+def RowGroupStartColumnsVector(builder, numElems):
+    return builder.StartVector(4, numElems, 4)
+
+def StartColumnsVector(builder, numElems):
+    return RowGroupStartColumnsVector(builder, numElems)
+
+def RowGroupEnd(builder):
+    return builder.EndObject()
+
+def End(builder):
+    return RowGroupEnd(builder)
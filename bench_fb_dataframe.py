@@ -0,0 +1,467 @@
+"""
+Micro-benchmarks for the flatbuffer dataframe functions. Run with `python bench_fb_dataframe.py`.
+"""
+
+import asyncio
+import dill
+import flatbuffers
+import multiprocessing
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import tempfile
+import time
+
+from contextlib import nullcontext
+
+import fb_shared_memory
+from fb_async import AsyncFbSharedMemory
+from fb_dataframe import to_flatbuffer, fb_dataframe_group_by, fb_dataframe_group_by_sum, fb_dataframe_head, _build_column, \
+    _build_packed_strings, _build_strings, _column_values, _encoded_values, _find_columns, _run_ends, _values_stats
+from fb_file import FbFile, save_flatbuffer
+from fb_lock import FbFileLock, lock_file_path
+from fb_parallel import FbParallelExecutor
+from fb_shared_memory import FbSharedMemory
+from Project.DataFrame import Column, DataFrame, ValueType
+from Project.DataFrame.DataType import DataType
+from Project.DataFrame.Encoding import Encoding
+from test_fb_dataframe import generate_random_df
+
+
+def _best_of(func, repeat: int = 3) -> float:
+    """
+        Returns the best wall-clock time of func() over repeat runs.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _serialize_per_element(values: np.ndarray, start_vector, prepend) -> bytes:
+    """
+        Serializes values into a single vector one element at a time (the original to_flatbuffer loop).
+    """
+    builder = flatbuffers.Builder(1024)
+    start_vector(builder, len(values))
+    for value in values[::-1]:
+        prepend(builder, value)
+    builder.Finish(builder.EndVector())
+    return builder.Output()
+
+
+def _serialize_bulk(values: np.ndarray) -> bytes:
+    """
+        Serializes values into a single vector with one buffer copy.
+    """
+    builder = flatbuffers.Builder(1024)
+    builder.Finish(builder.CreateNumpyVector(values))
+    return builder.Output()
+
+
+def bench_to_flatbuffer_numeric(num_rows: int = 1000000) -> None:
+    """
+        Compares per-element and bulk serialization throughput for each numeric column type.
+    """
+    columns = {
+        "int64": (np.random.randint(0, 1000, num_rows).astype(np.int64),
+                  Column.ColumnStartIntValuesVector, flatbuffers.Builder.PrependInt64),
+        "float64": (np.random.uniform(0, 10000, num_rows),
+                    Column.ColumnStartFloatValuesVector, flatbuffers.Builder.PrependFloat64),
+    }
+    print(f"to_flatbuffer numeric columns ({num_rows} rows)")
+    for name, (values, start_vector, prepend) in columns.items():
+        assert _serialize_per_element(values, start_vector, prepend) == _serialize_bulk(values)
+        mb = values.nbytes / 1e6
+        loop_time = _best_of(lambda: _serialize_per_element(values, start_vector, prepend), repeat=1)
+        bulk_time = _best_of(lambda: _serialize_bulk(values))
+        print(f"  {name:8s} per-element {mb / loop_time:9.1f} MB/s   bulk {mb / bulk_time:9.1f} MB/s"
+              f"   speedup {loop_time / bulk_time:7.1f}x")
+
+
+def _string_column(values: list, packed: bool) -> tuple:
+    """
+        Serializes values as a standalone string column, packed or as a [string] vector. Returns
+        (flatbuffer bytes, column).
+    """
+    builder = flatbuffers.Builder(1024)
+    if packed:
+        fields = _build_packed_strings(builder, values)
+    else:
+        fields = [(Column.ColumnAddStringValues, _build_strings(builder, Column.ColumnStartStringValuesVector, values))]
+    builder.Finish(_build_column(builder, DataType.String, fields, _values_stats(values)))
+    fb_bytes = builder.Output()
+    return fb_bytes, Column.Column.GetRootAs(fb_bytes, 0)
+
+
+def bench_string_columns(num_rows: int = 1000000) -> None:
+    """
+        Compares the size and decode time of the [string] vector and the packed string layout on
+        the string_col of generate_random_df.
+    """
+    values = generate_random_df(num_rows, 0)["string_col"].tolist()
+    print(f"string columns ({num_rows} rows)")
+    for name, packed in [("[string]", False), ("packed", True)]:
+        fb_bytes, col = _string_column(values, packed)
+        assert _column_values(col, ValueType.ValueType.String) == values
+        decode_time = _best_of(lambda: _column_values(col, ValueType.ValueType.String))
+        print(f"  {name:8s} {len(fb_bytes) / 1e6:7.1f} MB   decode {decode_time * 1e3:8.1f} ms")
+
+
+def bench_compression(num_rows: int = 1000000) -> None:
+    """
+        Reports the compressed size and decode throughput of each integer column of a
+        generate_random_df frame plus a timestamp column (delta) and a sorted low-cardinality
+        column (run-length), and group-by speed on the run-length encoded column.
+    """
+    df = generate_random_df(num_rows, 2)
+    df["timestamp_col"] = pd.date_range("2024-01-01", periods=num_rows, freq="s")
+    df["sorted_col"] = np.sort(df["int_col"].to_numpy())
+    plain = to_flatbuffer(df)
+    compressed = to_flatbuffer(df, compress=True)
+    plain_columns = _find_columns(DataFrame.DataFrame.GetRootAsDataFrame(plain, 0), list(df.columns))
+    columns = _find_columns(DataFrame.DataFrame.GetRootAsDataFrame(compressed, 0), list(df.columns))
+
+    encoding_names = {value: name for name, value in vars(Encoding).items() if not name.startswith('_')}
+    print(f"compressed integer columns ({num_rows} rows)")
+    for name, (col, dtype) in columns.items():
+        if name in ("float_col", "string_col"):
+            continue
+        values = _column_values(col, dtype)
+        assert np.array_equal(values, _column_values(*plain_columns[name]))
+        run_ends = _run_ends(col)
+        encoded_bytes = _encoded_values(col).nbytes + (0 if run_ends is None else run_ends.nbytes)
+        decode_time = _best_of(lambda: _column_values(col, dtype))
+        print(f"  {name:16s} {encoding_names[col.Encoding()]:16s} ratio {values.nbytes / encoded_bytes:7.1f}x"
+              f"   decode {values.nbytes / 1e6 / decode_time:9.1f} MB/s")
+    print(f"  whole frame      {len(plain) / 1e6:7.1f} MB -> {len(compressed) / 1e6:7.1f} MB")
+
+    plain_time = _best_of(lambda: fb_dataframe_group_by_sum(plain, "sorted_col", "float_col"))
+    runs_time = _best_of(lambda: fb_dataframe_group_by_sum(compressed, "sorted_col", "float_col"))
+    print(f"  group by sorted_col   plain {plain_time * 1e3:8.1f} ms   runs {runs_time * 1e3:8.1f} ms")
+
+
+def bench_parallel_serialization(num_rows: int = 200000, num_cols: int = 100, max_workers: int = None) -> None:
+    """
+        Reports to_flatbuffer time on a wide frame (a quarter each of int, float, repetitive string
+        and unique string columns) with 1, 2, 4, ... worker processes, with and without row groups.
+    """
+    max_workers = max_workers or os.cpu_count()
+    rng = np.random.default_rng(0)
+    columns = {}
+    for i in range(num_cols):
+        kind = i % 4
+        if kind == 0:
+            columns[f"col_{i}"] = rng.integers(0, 1000, num_rows)
+        elif kind == 1:
+            columns[f"col_{i}"] = rng.random(num_rows)
+        elif kind == 2:
+            columns[f"col_{i}"] = rng.choice(["red", "green", "blue"], num_rows).astype(object)
+        else:
+            columns[f"col_{i}"] = [f"value {j}" for j in rng.integers(0, num_rows, num_rows)]
+    df = pd.DataFrame(columns)
+
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    print(f"parallel to_flatbuffer ({num_rows} rows x {num_cols} columns, {os.cpu_count()} cores)")
+    for row_group_size in (None, num_rows // 16):
+        sequential = _best_of(lambda: to_flatbuffer(df, row_group_size), repeat=1)
+        for workers in counts:
+            elapsed = sequential if workers == 1 else \
+                _best_of(lambda: to_flatbuffer(df, row_group_size, workers=workers), repeat=1)
+            print(f"  row groups {row_group_size or '-':>7}   {workers:3d} workers {elapsed:8.2f} s"
+                  f"   speedup {sequential / elapsed:5.2f}x")
+
+
+def bench_multi_aggregate_group_by(num_rows: int = 1000000, additional_cols: int = 10) -> None:
+    """
+        Compares summing every additional column of a generate_random_df frame with one
+        fb_dataframe_group_by_sum call per column against a single fb_dataframe_group_by computing
+        all the sums from the same group ids, grouping by int_col and by (int_col, string_col).
+    """
+    df = generate_random_df(num_rows, additional_cols)
+    fb_bytes = to_flatbuffer(df)
+    sum_cols = [f"additional_col_{i}" for i in range(additional_cols)]
+
+    print(f"multi-aggregate group by ({num_rows} rows, {additional_cols} sums)")
+    for keys in ("int_col", ["int_col", "string_col"]):
+        if isinstance(keys, str):
+            one_per_column = _best_of(lambda: [fb_dataframe_group_by_sum(fb_bytes, keys, col) for col in sum_cols])
+        else:
+            one_per_column = _best_of(lambda: [fb_dataframe_group_by(fb_bytes, keys, {col: 'sum'}) for col in sum_cols])
+        one_pass = _best_of(lambda: fb_dataframe_group_by(fb_bytes, keys, [(col, 'sum') for col in sum_cols]))
+        print(f"  {str(keys):28s}  one per column {one_per_column * 1e3:8.1f} ms   one pass {one_pass * 1e3:8.1f} ms"
+              f"   ({one_per_column / one_pass:4.1f}x)")
+
+
+# Lock file byte used to emulate a single global lock around every shared memory operation.
+GLOBAL_LOCK = 1 << 20
+
+
+def _shared_memory_worker(lock_mode: str, role: str, deadline: float, ops) -> None:
+    """
+        Runs head/group-by (reader) or map (mapper) operations until deadline and adds the count to ops.
+    """
+    fb_shm = FbSharedMemory(lock_mode="seqlock" if lock_mode == "global" else lock_mode)
+    global_lock = FbFileLock(lock_file_path(fb_shared_memory.SHM_NAME)) if lock_mode == "global" else None
+    count = 0
+    while time.monotonic() < deadline:
+        with global_lock.exclusive(GLOBAL_LOCK) if global_lock else nullcontext():
+            if role == "mapper":
+                fb_shm.dataframe_map_numeric_column("bench_df", "int_col", lambda x: x + 1, vectorized=True)
+            elif count % 2:
+                fb_shm.dataframe_group_by_sum("bench_df", "int_col", "float_col")
+            else:
+                fb_shm.dataframe_head("bench_df", 5)
+        count += 1
+    with ops.get_lock():
+        ops.value += count
+    fb_shm.close()
+
+
+def bench_shared_memory_concurrency(num_readers: int = 4, num_mappers: int = 1, seconds: float = 3.0,
+                                    rows: int = 1000000) -> None:
+    """
+        Hammers one shared memory dataframe with concurrent reader and mapper processes and compares
+        the throughput of seqlock readers, file-locked readers and a single global lock.
+    """
+    fb_shared_memory.SHM_NAME = f"CS598-bench-{os.getpid()}"
+    context = multiprocessing.get_context("fork")
+    df = pd.DataFrame({"int_col": np.random.randint(0, 10, rows), "float_col": np.random.uniform(0, 1, rows)})
+    fb_shm = FbSharedMemory()
+    fb_shm.add_dataframe("bench_df", df)
+
+    print(f"shared memory concurrency ({num_readers} readers, {num_mappers} mappers, {rows} rows)")
+    try:
+        for lock_mode in ["global", "file", "seqlock"]:
+            reads, maps = context.Value('i', 0), context.Value('i', 0)
+            deadline = time.monotonic() + seconds
+            workers = [context.Process(target=_shared_memory_worker, args=(lock_mode, "reader", deadline, reads))
+                       for _ in range(num_readers)]
+            workers += [context.Process(target=_shared_memory_worker, args=(lock_mode, "mapper", deadline, maps))
+                        for _ in range(num_mappers)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            print(f"  {lock_mode:8s} reads {reads.value / seconds:9.1f}/s   maps {maps.value / seconds:9.1f}/s")
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def bench_parallel_queries(num_rows: int = 1000000, additional_cols: int = 100, max_workers: int = None) -> None:
+    """
+        Reports group-by-sum and filter time on a generate_random_df frame in shared memory, run in
+        one read and by FbParallelExecutor with 1, 2, 4, ... worker processes, with and without row groups.
+    """
+    max_workers = max_workers or os.cpu_count()
+    fb_shared_memory.SHM_NAME = f"CS598-bench-{os.getpid()}"
+    df = generate_random_df(num_rows, additional_cols)
+    fb_shm = FbSharedMemory(segment_size=2 * len(to_flatbuffer(df.head(1000))) * (num_rows // 1000 + 1),
+                            result_cache_size=0)
+    fb_shm.add_dataframe("plain", df)
+    fb_shm.add_dataframe("row_groups", df, row_group_size=max(num_rows // 64, 1))
+    predicate = ("and", ("int_col", "==", 3), ("float_col", "<", 5000.0))
+
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    print(f"parallel queries ({num_rows} rows x {additional_cols + 3} columns, {os.cpu_count()} cores)")
+    try:
+        for name in ("plain", "row_groups"):
+            group_by = _best_of(lambda: fb_shm.dataframe_group_by_sum(name, "int_col", "float_col"))
+            filtered = _best_of(lambda: fb_shm.dataframe_filter(name, predicate))
+            print(f"  {name:10s}  one read   group by {group_by * 1e3:8.1f} ms   filter {filtered * 1e3:8.1f} ms")
+            for workers in counts:
+                with FbParallelExecutor(fb_shm, workers) as executor:
+                    executor.group_by_sum(name, "int_col", "float_col")
+                    parallel_group_by = _best_of(lambda: executor.group_by_sum(name, "int_col", "float_col"))
+                    parallel_filter = _best_of(lambda: executor.filter(name, predicate))
+                print(f"  {name:10s}  {workers:3d} workers  group by {parallel_group_by * 1e3:8.1f} ms"
+                      f" ({group_by / parallel_group_by:4.2f}x)   filter {parallel_filter * 1e3:8.1f} ms"
+                      f" ({filtered / parallel_filter:4.2f}x)")
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def bench_async_load(num_clients=(1, 16, 64), seconds: float = 2.0, num_rows: int = 200000) -> None:
+    """
+        Load test of the asyncio API: concurrent clients each send head requests to one dataframe
+        and group-by-sum requests to another, back to back, for a few seconds. Reports p50/p99
+        latency and throughput of plain synchronous calls (which block the event loop), requests
+        each run on their own on the thread pool, and batched requests.
+    """
+    fb_shared_memory.SHM_NAME = f"CS598-bench-{os.getpid()}"
+    df = generate_random_df(num_rows, 10)
+    fb_shm = FbSharedMemory(segment_size=4 * len(to_flatbuffer(df)), result_cache_size=0)
+    fb_shm.add_dataframe("heads", df)
+    fb_shm.add_dataframe("group_bys", df)
+
+    # clients ask for different rows and columns, so batches merge requests rather than repeat them
+    async def sync_request(client: int) -> None:
+        if client % 2:
+            fb_shm.dataframe_head("heads", client)
+        else:
+            fb_shm.dataframe_group_by_sum("group_bys", "int_col", f"additional_col_{client % 10}")
+        await asyncio.sleep(0)
+
+    def async_request(async_shm: AsyncFbSharedMemory):
+        async def request(client: int) -> None:
+            if client % 2:
+                await async_shm.head("heads", client)
+            else:
+                await async_shm.group_by_sum("group_bys", "int_col", f"additional_col_{client % 10}")
+        return request
+
+    async def run(request, clients: int) -> list:
+        latencies, deadline = [], time.monotonic() + seconds
+
+        async def client(index: int) -> None:
+            # a client is ready to send as soon as its last request returned, so the latency also
+            # counts the time spent waiting for the event loop (what synchronous calls block)
+            ready = time.perf_counter()
+            while time.monotonic() < deadline:
+                await request(index)
+                done = time.perf_counter()
+                latencies.append(done - ready)
+                ready = done
+        await asyncio.gather(*(client(index) for index in range(clients)))
+        return latencies
+
+    print(f"async load test ({num_rows} rows, {os.cpu_count()} cores)")
+    try:
+        for clients in num_clients:
+            for mode in ("sync", "threads", "batched"):
+                async_shm = AsyncFbSharedMemory(fb_shm, batching=mode == "batched")
+                latencies = np.array(asyncio.run(run(sync_request if mode == "sync" else async_request(async_shm),
+                                                     clients)))
+                async_shm.close()
+                p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+                print(f"  {clients:3d} clients  {mode:8s} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms"
+                      f"   {len(latencies) / seconds:8.1f} requests/s"
+                      f"   ({async_shm.requests / max(async_shm.batches, 1):5.1f} requests/batch)")
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def bench_append_rows(num_chunks: int = 100, chunk_rows: int = 10000, additional_cols: int = 10) -> None:
+    """
+        Grows a shared memory dataframe chunk by chunk, re-adding the whole dataframe each time
+        versus appending the chunk with append_rows, then compares group-by-sum latency on the
+        appended frames before and after merge_appended.
+    """
+    fb_shared_memory.SHM_NAME = f"CS598-bench-{os.getpid()}"
+    df = generate_random_df(num_chunks * chunk_rows, additional_cols)
+    chunks = [df.iloc[i * chunk_rows:(i + 1) * chunk_rows] for i in range(num_chunks)]
+    fb_shm = FbSharedMemory(segment_size=4 * len(to_flatbuffer(df)), result_cache_size=0)
+
+    print(f"append rows ({num_chunks} chunks of {chunk_rows} rows)")
+    try:
+        start = time.perf_counter()
+        for i in range(num_chunks):
+            if i:
+                fb_shm.remove_dataframe("readded")
+            fb_shm.add_dataframe("readded", df.iloc[:(i + 1) * chunk_rows])
+        readded = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fb_shm.add_dataframe("appended", chunks[0])
+        for chunk in chunks[1:]:
+            fb_shm.append_rows("appended", chunk)
+        appended = time.perf_counter() - start
+        print(f"  re-add all rows {readded * 1e3 / num_chunks:8.2f} ms/chunk"
+              f"   append_rows {appended * 1e3 / num_chunks:8.2f} ms/chunk")
+
+        query = lambda: fb_shm.dataframe_group_by_sum("appended", "int_col", "float_col")
+        unmerged = _best_of(query)
+        start = time.perf_counter()
+        fb_shm.merge_appended("appended")
+        merge = time.perf_counter() - start
+        print(f"  group by sum  {num_chunks} frames {unmerged * 1e3:8.2f} ms   merged {_best_of(query) * 1e3:8.2f} ms"
+              f"   (merge took {merge * 1e3:.1f} ms)")
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def bench_cold_start(num_rows: int = 1000000, additional_cols: int = 10) -> None:
+    """
+        Compares the cold start of a worker that needs a frame and its head and group-by-sum:
+        reading a CSV and serializing it, loading a dill pickle and serializing it, or mapping a
+        saved flatbuffer file (see fb_file).
+    """
+    df = generate_random_df(num_rows, additional_cols)
+    directory = tempfile.mkdtemp()
+    csv_path, dill_path, fb_path = (os.path.join(directory, name) for name in ("df.csv", "df.dill", "df.fbdf"))
+    df.to_csv(csv_path, index=False)
+    with open(dill_path, "wb") as file:
+        dill.dump(df, file)
+    save_flatbuffer(to_flatbuffer(df), fb_path)
+
+    def query(fb_buf) -> None:
+        fb_dataframe_head(fb_buf)
+        fb_dataframe_group_by_sum(fb_buf, "int_col", "float_col")
+
+    def from_dill() -> None:
+        with open(dill_path, "rb") as file:
+            query(to_flatbuffer(dill.load(file)))
+
+    def mapped() -> None:
+        with FbFile(fb_path) as fb_file:
+            query(fb_file.buf)
+
+    print(f"cold start ({num_rows} rows x {additional_cols + 3} columns)")
+    try:
+        for label, start in (("csv", lambda: query(to_flatbuffer(pd.read_csv(csv_path)))),
+                             ("dill", from_dill), ("mmap", mapped)):
+            print(f"  {label:5s} {_best_of(start) * 1e3:9.1f} ms")
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_shared_memory_head(sizes_mb=(1, 10, 50, 200)) -> None:
+    """
+        Compares dataframe_head latency on shared memory frames of growing size when the frame is
+        read in place versus copied out with bytes() first.
+    """
+    fb_shared_memory.SHM_NAME = f"CS598-bench-{os.getpid()}"
+    fb_shm = FbSharedMemory(segment_size=max(sizes_mb) * 1000000 + 10000000)
+
+    print("shared memory head() latency")
+    try:
+        for size_mb in sizes_mb:
+            rows = size_mb * 1000000 // 16
+            name = f"head_{size_mb}mb"
+            fb_shm.add_dataframe(name, pd.DataFrame({"int_col": np.arange(rows), "float_col": np.ones(rows)}))
+            in_place = _best_of(lambda: fb_shm.dataframe_head(name), repeat=10)
+            copied = _best_of(lambda: fb_dataframe_head(bytes(fb_shm._get_fb_buf(name))), repeat=3)
+            print(f"  {size_mb:4d} MB   in place {in_place * 1e6:9.1f} us   bytes() copy {copied * 1e6:11.1f} us")
+            fb_shm.remove_dataframe(name)
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+if __name__ == '__main__':
+    bench_to_flatbuffer_numeric()
+    bench_string_columns()
+    bench_compression()
+    bench_parallel_serialization()
+    bench_multi_aggregate_group_by()
+    bench_shared_memory_concurrency()
+    bench_parallel_queries()
+    bench_async_load()
+    bench_append_rows()
+    bench_cold_start()
+    bench_shared_memory_head()
@@ -0,0 +1,228 @@
+"""
+An asyncio API over FbSharedMemory reads. Requests made concurrently against the same dataframe are
+answered together from one read of it, on a thread pool so the event loop never blocks on a scan.
+"""
+
+import asyncio
+import concurrent.futures
+import numpy as np
+import pandas as pd
+import traceback
+
+from fb_dataframe import fb_dataframe_filter, fb_dataframe_group_by, fb_dataframe_head
+from fb_groupby import aggregate_pairs
+from fb_shared_memory import FbSharedMemory
+
+
+def _freeze(value):
+    """
+        Returns a hashable version of a request argument (lists and dicts become tuples).
+    """
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple(_freeze(item) for item in value)
+    return value
+
+
+def _answer(fb_buf, requests: dict) -> dict:
+    """
+        Answers a batch of requests against one dataframe. Heads are answered from a single head of
+        the most rows and columns any of them asks for, and group bys on the same columns from a
+        single group by computing every aggregate any of them asks for. Returns a dict mapping each
+        request key to its result.
+
+        @param fb_buf: the flatbuffer dataframe.
+        @param requests: dict mapping request keys to (kind, arguments) pairs.
+    """
+    results = {}
+    heads = {key: args for key, (kind, args) in requests.items() if kind == 'head'}
+    if heads:
+        rows = max(rows for rows, _ in heads.values())
+        columns = None
+        if all(requested is not None for _, requested in heads.values()):
+            columns = list(dict.fromkeys(name for _, requested in heads.values() for name in requested))
+        head = fb_dataframe_head(fb_buf, rows, columns=columns)
+        for key, (rows, requested) in heads.items():
+            results[key] = (head if requested is None else head[list(requested)]).iloc[:rows].copy()
+
+    group_bys = {}
+    for key, (kind, args) in requests.items():
+        if kind == 'group_by':
+            group_bys.setdefault(_freeze(args[0]), (args[0], {}))[1][key] = args[1]
+    for grouping_col_name, batch in group_bys.values():
+        pairs = {key: aggregate_pairs(aggregates) for key, aggregates in batch.items()}
+        union = list(dict.fromkeys(pair for columns, _ in pairs.values() for pair in columns))
+        grouped = fb_dataframe_group_by(fb_buf, grouping_col_name, union)
+        for key, (columns, multi) in pairs.items():
+            result = grouped[columns].copy()
+            if not multi:
+                result.columns = [col_name for col_name, _ in columns]
+            results[key] = result
+
+    for key, (kind, args) in requests.items():
+        if kind == 'filter':
+            results[key] = fb_dataframe_filter(fb_buf, args)
+    return results
+
+
+class AsyncFbSharedMemory:
+    """
+        Awaitable reads of the dataframes of an FbSharedMemory. Requests against a dataframe are
+        queued; while a batch of them is being answered, new ones wait and are answered together in
+        the next batch, from a single consistent read (see _answer), on executor. Identical
+        requests in a batch are answered once. If a batch fails, its requests are retried one by
+        one so each gets its own result or error. Requests against different dataframes run
+        concurrently. Only reads are offered: mapping in place stays on the FbSharedMemory.
+
+        batches and requests count the batches run and the requests they answered.
+    """
+    def __init__(self, fb_shm: FbSharedMemory, executor: concurrent.futures.Executor = None,
+                 max_workers: int = None, batching: bool = True):
+        """
+            @param fb_shm: the shared memory holding the dataframes.
+            @param executor: executor the batches run on; by default a thread pool of max_workers.
+            @param max_workers: number of threads of the default executor.
+            @param batching: answer concurrent requests together; without it, each request is read
+                on its own.
+        """
+        self.fb_shm = fb_shm
+        self.executor = executor or concurrent.futures.ThreadPoolExecutor(max_workers)
+        self.batching = batching
+        self.batches = 0
+        self.requests = 0
+        # dataframe name -> [(request key, (kind, arguments), future)] waiting for the next batch
+        self._pending = {}
+        self._draining = set()
+
+    async def head(self, df_name: str, rows: int = 5, columns: list = None) -> pd.DataFrame:
+        """
+            Returns the first rows of a dataframe (see FbSharedMemory.dataframe_head).
+
+            @param df_name: name of the Dataframe.
+            @param rows: number of rows to return.
+            @param columns: optional names of the columns to return.
+        """
+        args = (rows, None if columns is None else list(columns))
+        return await self._submit(df_name, ('head', rows, _freeze(columns)), ('head', args))
+
+    async def group_by(self, df_name: str, grouping_col_name: str, aggregates: dict) -> pd.DataFrame:
+        """
+            Applies GROUP BY on a dataframe (see FbSharedMemory.dataframe_group_by).
+
+            @param df_name: name of the Dataframe.
+            @param grouping_col_name: column to group by, or a list of them.
+            @param aggregates: dict mapping column names to an aggregate name or a list of them, or a
+                list of (column name, aggregate) pairs.
+        """
+        key = ('group_by', _freeze(grouping_col_name), _freeze(aggregates))
+        return await self._submit(df_name, key, ('group_by', (grouping_col_name, aggregates)))
+
+    async def group_by_sum(self, df_name: str, grouping_col_name: str, sum_col_name: str) -> pd.DataFrame:
+        """
+            Applies GROUP BY SUM on a dataframe (see FbSharedMemory.dataframe_group_by_sum).
+
+            @param df_name: name of the Dataframe.
+            @param grouping_col_name: column to group by.
+            @param sum_col_name: column to sum.
+        """
+        return await self.group_by(df_name, grouping_col_name, {sum_col_name: 'sum'})
+
+    async def filter(self, df_name: str, predicate) -> np.ndarray:
+        """
+            Returns the selection vector of the rows satisfying predicate (see FbSharedMemory.dataframe_filter).
+
+            @param df_name: name of the Dataframe.
+            @param predicate: the predicate, e.g. ('or', ("int_col", "<", 3), ("float_col", ">=", 0.5)).
+        """
+        return await self._submit(df_name, ('filter', _freeze(predicate)), ('filter', predicate))
+
+    async def _submit(self, df_name: str, key: tuple, request: tuple):
+        """
+            Queues a request against a dataframe and waits for its result.
+
+            @param df_name: name of the Dataframe.
+            @param key: hashable identity of the request.
+            @param request: (kind, arguments) of the request.
+        """
+        loop = asyncio.get_running_loop()
+        if not self.batching:
+            self.batches += 1
+            self.requests += 1
+            results = await loop.run_in_executor(self.executor, self._run_batch, df_name, {key: request})
+            return self._result(results[key])
+
+        future = loop.create_future()
+        self._pending.setdefault(df_name, []).append((key, request, future))
+        if df_name not in self._draining:
+            self._draining.add(df_name)
+            loop.create_task(self._drain(df_name))
+        return await future
+
+    async def _drain(self, df_name: str) -> None:
+        """
+            Answers the requests queued against a dataframe, one batch at a time, until none are left.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # let the requests made in the same iteration of the event loop join the batch
+                await asyncio.sleep(0)
+                batch = self._pending.pop(df_name, None)
+                if not batch:
+                    return
+                self.batches += 1
+                self.requests += len(batch)
+                requests = {key: request for key, request, _ in batch}
+                try:
+                    results = await loop.run_in_executor(self.executor, self._run_batch, df_name, requests)
+                except Exception as error:
+                    results = {key: (False, error) for key in requests}
+                shared = set()
+                for key, _, future in batch:
+                    if future.done():
+                        continue
+                    ok, value = results[key]
+                    if not ok:
+                        future.set_exception(value)
+                        continue
+                    # identical requests each get their own copy
+                    future.set_result(value.copy() if key in shared else value)
+                    shared.add(key)
+        finally:
+            self._draining.discard(df_name)
+
+    def _run_batch(self, df_name: str, requests: dict) -> dict:
+        """
+            Answers a batch of requests from one read of a dataframe (on the executor). Returns a
+            dict mapping each request key to (True, result) or (False, exception).
+        """
+        try:
+            results = self.fb_shm._read_dataframe(df_name, lambda fb_buf: _answer(fb_buf, requests))
+            return {key: (True, result) for key, result in results.items()}
+        except Exception:
+            if len(requests) == 1:
+                raise
+        outcomes = {}
+        for key, request in requests.items():
+            try:
+                outcomes[key] = (True, self.fb_shm._read_dataframe(
+                    df_name, lambda fb_buf: _answer(fb_buf, {key: request})[key]))
+            except Exception as error:
+                # the frames of the traceback would keep views of the shared memory alive
+                traceback.clear_frames(error.__traceback__)
+                outcomes[key] = (False, error)
+        return outcomes
+
+    @staticmethod
+    def _result(outcome: tuple):
+        ok, value = outcome
+        if not ok:
+            raise value
+        return value
+
+    def close(self) -> None:
+        """
+            Shuts down the executor.
+        """
+        self.executor.shutdown()
@@ -0,0 +1,74 @@
+"""
+A small thread-safe LRU cache bounded by entry count, shared by the schema, descriptor and result
+caches.
+"""
+
+import collections
+import threading
+
+
+class LruCache:
+    """
+        Maps keys to values, evicting the least recently used entries beyond max_entries. Counts
+        the hits and misses of get so the cache can be sized.
+    """
+    def __init__(self, max_entries: int):
+        if max_entries < 0:
+            raise ValueError(f"max_entries must not be negative, got {max_entries}.")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+            Returns the value cached for key (marking it as the most recently used), or default.
+
+            @param key: the key.
+            @param default: value returned when key isn't cached.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value) -> None:
+        """
+            Caches value under key, evicting the least recently used entries if the cache is full.
+
+            @param key: the key.
+            @param value: the value.
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, predicate) -> None:
+        """
+            Removes the entries whose key satisfies predicate.
+
+            @param predicate: function of a key.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """
+            Removes every entry and resets the hit and miss counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
@@ -0,0 +1,483 @@
+"""
+Catalog of the flatbuffer dataframes stored in shared memory. The catalog lives in a header region at
+the start of the first segment, so every process attached to it can find a dataframe from its name
+without scanning the buffers:
+
++--------+------------------------------------+--------------------------------+----------------+
+| header | directory: hash table of name ->   | free list: unused extents      | dataframes ... |
+|        | (segment, offset, length, version) | sorted by (segment, offset)    |                |
++--------+------------------------------------+--------------------------------+----------------+
+
+Dataframes that don't fit are spilled into additional segments, which only hold dataframes.
+
+Concurrent readers use seqlocks instead of locks: the header holds a sequence number that is odd while
+the directory is being changed, and every entry holds one that is odd while its dataframe is being
+written. A reader retries if the number it started with was odd or has changed by the time it is done.
+Writers must exclude each other (see fb_lock.py).
+"""
+
+import hashlib
+import struct
+import time
+
+from contextlib import contextmanager
+
+MAGIC = b"FBDFCAT\x03"
+
+# magic, number of directory slots, number of free extents, next version, data start offset,
+# number of segments, directory sequence number.
+HEADER_FORMAT = struct.Struct("<8sIIQQI4xQ")
+HEADER_FIELDS = ('magic', 'num_slots', 'num_free', 'next_version', 'data_start', 'num_segments', 'catalog_seq')
+
+# state, segment, name length, utf-8 name, offset, length, version, sequence number.
+ENTRY_FORMAT = struct.Struct("<BxHI64sQQQQ")
+ENTRY_VERSION_SEQ_FORMAT = struct.Struct("<QQ")
+MAX_NAME_LENGTH = 64
+
+# segment, offset, length.
+EXTENT_FORMAT = struct.Struct("<QQQ")
+
+SLOT_EMPTY = 0
+SLOT_USED = 1
+SLOT_DELETED = 2
+
+DIRECTORY_SLOTS = 1024
+MAX_SEGMENTS = 64
+
+# Dataframes are placed at 8-byte aligned offsets so their int64/float64 vectors stay aligned.
+ALIGNMENT = 8
+
+
+def _align(n: int) -> int:
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _name_hash(name: bytes) -> int:
+    """
+        Returns a hash of name that is stable across processes (unlike the builtin hash()).
+    """
+    return int.from_bytes(hashlib.blake2b(name, digest_size=8).digest(), "little")
+
+
+class FbCatalog:
+    """
+        Directory and allocator for the dataframes stored in one or more buffers (segments). The
+        directory is an open addressing hash table, so lookups are O(1); free space is tracked as a
+        list of extents allocated first-fit and coalesced on release.
+
+        Segment 0 is the buffer holding the catalog. Other segments are resolved through
+        segment_buf(index), and created through create_segment(index, min_size) when no free
+        extent is large enough; without create_segment the catalog is limited to segment 0.
+    """
+    def __init__(self, buf: memoryview, num_slots: int = DIRECTORY_SLOTS, segment_buf=None, create_segment=None):
+        self.buf = buf
+        self._segment_buf = segment_buf
+        self._create_segment = create_segment
+        header = self._header()
+        if header['magic'] == MAGIC:
+            self.num_slots = header['num_slots']
+        else:
+            self.num_slots = num_slots
+            self._format()
+
+    def _format(self) -> None:
+        """
+            Writes an empty catalog whose single free extent spans the rest of segment 0.
+        """
+        directory_size = self.num_slots * ENTRY_FORMAT.size
+        # Coalescing keeps at most one free extent between (and around) the stored dataframes.
+        free_list_size = (self.num_slots + MAX_SEGMENTS) * EXTENT_FORMAT.size
+        data_start = _align(HEADER_FORMAT.size + directory_size + free_list_size)
+        if data_start >= len(self.buf):
+            raise ValueError("Buffer is too small to hold the dataframe catalog.")
+
+        self.buf[HEADER_FORMAT.size:data_start] = bytes(data_start - HEADER_FORMAT.size)
+        HEADER_FORMAT.pack_into(self.buf, 0, MAGIC, self.num_slots, 0, 1, data_start, 1, 0)
+        self._write_free_list([(0, data_start, len(self.buf) - data_start)])
+
+    def _header(self) -> dict:
+        return dict(zip(HEADER_FIELDS, HEADER_FORMAT.unpack_from(self.buf, 0)))
+
+    def _set_header(self, **fields) -> None:
+        header = self._header()
+        header.update(fields)
+        HEADER_FORMAT.pack_into(self.buf, 0, *(header[field] for field in HEADER_FIELDS))
+
+    @property
+    def num_segments(self) -> int:
+        return self._header()['num_segments']
+
+    def segment_buf(self, segment: int) -> memoryview:
+        """
+            Returns the buffer of a segment.
+
+            @param segment: index of the segment.
+        """
+        if segment == 0:
+            return self.buf
+        if self._segment_buf is None:
+            raise ValueError(f"Segment {segment} can't be resolved without segment_buf.")
+        return self._segment_buf(segment)
+
+    def _entry_position(self, slot: int) -> int:
+        return HEADER_FORMAT.size + slot * ENTRY_FORMAT.size
+
+    def _read_entry(self, slot: int) -> tuple:
+        return ENTRY_FORMAT.unpack_from(self.buf, self._entry_position(slot))
+
+    def _write_entry(self, slot: int, state: int, segment: int, name: bytes, offset: int, length: int,
+                     version: int, seq: int = 0) -> None:
+        ENTRY_FORMAT.pack_into(self.buf, self._entry_position(slot), state, segment, len(name), name,
+                               offset, length, version, seq)
+
+    @contextmanager
+    def _updating(self):
+        """
+            Marks the directory as being changed (odd catalog_seq) for the duration of the block.
+        """
+        seq = self._header()['catalog_seq']
+        self._set_header(catalog_seq=seq + 1)
+        try:
+            yield
+        finally:
+            self._set_header(catalog_seq=seq + 2)
+
+    def _probe(self, name: bytes):
+        """
+            Returns (slot holding name or None, first slot where name could be inserted or None).
+        """
+        start = _name_hash(name) % self.num_slots
+        insert_slot = None
+        for i in range(self.num_slots):
+            slot = (start + i) % self.num_slots
+            state, _, name_length, slot_name, _, _, _, _ = self._read_entry(slot)
+            if state == SLOT_EMPTY:
+                return None, slot if insert_slot is None else insert_slot
+            if state == SLOT_DELETED:
+                if insert_slot is None:
+                    insert_slot = slot
+            elif slot_name[:name_length] == name:
+                return slot, None
+        return None, insert_slot
+
+    def _read_free_list(self) -> list:
+        num_free = self._header()['num_free']
+        start = self._entry_position(self.num_slots)
+        return [EXTENT_FORMAT.unpack_from(self.buf, start + i * EXTENT_FORMAT.size) for i in range(num_free)]
+
+    def _write_free_list(self, extents: list) -> None:
+        start = self._entry_position(self.num_slots)
+        for i, extent in enumerate(extents):
+            EXTENT_FORMAT.pack_into(self.buf, start + i * EXTENT_FORMAT.size, *extent)
+        self._set_header(num_free=len(extents))
+
+    def _add_segment(self, min_size: int) -> None:
+        """
+            Creates a new segment of at least min_size bytes and adds it to the free list.
+        """
+        segment = self.num_segments
+        if self._create_segment is None or segment >= MAX_SEGMENTS:
+            raise MemoryError(f"Not enough shared memory to store {min_size} bytes; try compact().")
+        size = len(self._create_segment(segment, min_size))
+        self._set_header(num_segments=segment + 1)
+        self._write_free_list(self._read_free_list() + [(segment, 0, size)])
+
+    def _allocate(self, length: int) -> tuple:
+        """
+            Reserves an aligned extent of at least length bytes (first fit), adding a segment if none
+            is large enough. Returns (segment, offset).
+        """
+        length = _align(max(length, 1))
+        for attempt in range(2):
+            extents = self._read_free_list()
+            for i, (segment, offset, extent_length) in enumerate(extents):
+                if extent_length >= length:
+                    if extent_length == length:
+                        del extents[i]
+                    else:
+                        extents[i] = (segment, offset + length, extent_length - length)
+                    self._write_free_list(extents)
+                    return segment, offset
+            if attempt == 0:
+                self._add_segment(length)
+        raise MemoryError(f"Not enough shared memory to store {length} bytes.")
+
+    def release(self, segment: int, offset: int, length: int) -> None:
+        """
+            Returns an extent to the free list, merging it with adjacent free extents.
+
+            @param segment: index of the segment.
+            @param offset: offset of the extent in the segment.
+            @param length: length of the extent.
+        """
+        length = _align(max(length, 1))
+        extents = self._read_free_list()
+        i = 0
+        while i < len(extents) and extents[i][:2] < (segment, offset):
+            i += 1
+        extents.insert(i, (segment, offset, length))
+        if i + 1 < len(extents) and extents[i + 1][:2] == (segment, offset + length):
+            extents[i] = (segment, offset, length + extents[i + 1][2])
+            del extents[i + 1]
+        if i > 0 and extents[i - 1][0] == segment and extents[i - 1][1] + extents[i - 1][2] == offset:
+            extents[i - 1] = (segment, extents[i - 1][1], extents[i - 1][2] + extents[i][2])
+            del extents[i]
+        self._write_free_list(extents)
+
+    def _encode_name(self, name: str) -> bytes:
+        encoded = name.encode("utf-8")
+        if len(encoded) > MAX_NAME_LENGTH:
+            raise ValueError(f"Dataframe name '{name}' is longer than {MAX_NAME_LENGTH} bytes.")
+        return encoded
+
+    def snapshot(self, name: str) -> tuple:
+        """
+            Returns (slot, raw entry) of the dataframe with name as seen while the directory wasn't
+            being changed, or (None, None) if it doesn't exist. Pass both to unchanged() after
+            reading the dataframe to check the read was consistent.
+
+            @param name: name of the dataframe.
+        """
+        encoded = self._encode_name(name)
+        while True:
+            seq = self._header()['catalog_seq']
+            if seq % 2:
+                time.sleep(0)
+                continue
+            slot, _ = self._probe(encoded)
+            entry = None if slot is None else self._read_entry(slot)
+            if self._header()['catalog_seq'] == seq:
+                return slot, entry
+
+    def unchanged(self, slot: int, entry: tuple) -> bool:
+        """
+            Returns whether a snapshot entry was stable: no write was in progress when it was taken
+            and the dataframe hasn't been written, moved or removed since.
+
+            @param slot: slot returned by snapshot().
+            @param entry: entry returned by snapshot().
+        """
+        return entry[-1] % 2 == 0 and self._read_entry(slot) == entry
+
+    def lookup(self, name: str):
+        """
+            Returns (segment, offset, length, version) of the dataframe with name, or None if it
+            doesn't exist.
+
+            @param name: name of the dataframe.
+        """
+        slot, entry = self.snapshot(name)
+        if slot is None:
+            return None
+        _, segment, _, _, offset, length, version, _ = entry
+        return segment, offset, length, version
+
+    def begin_write(self, slot: int) -> None:
+        """
+            Marks the dataframe in slot as being written in place (odd sequence number).
+
+            @param slot: slot of the dataframe.
+        """
+        position = self._entry_position(slot) + ENTRY_FORMAT.size - ENTRY_VERSION_SEQ_FORMAT.size
+        version, seq = ENTRY_VERSION_SEQ_FORMAT.unpack_from(self.buf, position)
+        ENTRY_VERSION_SEQ_FORMAT.pack_into(self.buf, position, version, seq + 1)
+
+    def end_write(self, slot: int) -> None:
+        """
+            Marks the write to the dataframe in slot as done and bumps its version.
+
+            @param slot: slot of the dataframe.
+        """
+        position = self._entry_position(slot) + ENTRY_FORMAT.size - ENTRY_VERSION_SEQ_FORMAT.size
+        version, seq = ENTRY_VERSION_SEQ_FORMAT.unpack_from(self.buf, position)
+        ENTRY_VERSION_SEQ_FORMAT.pack_into(self.buf, position, version + 1, seq + 1)
+
+    def __contains__(self, name: str) -> bool:
+        return self.lookup(name) is not None
+
+    def add(self, name: str, data: bytes) -> tuple:
+        """
+            Copies data into a newly allocated extent and publishes it under name. The entry is
+            written after the data, so readers never see a partially copied dataframe. Returns
+            (segment, offset, length, version).
+
+            @param name: name of the dataframe.
+            @param data: bytes of the flatbuffer dataframe.
+        """
+        encoded = self._encode_name(name)
+        slot, insert_slot = self._probe(encoded)
+        if slot is not None:
+            raise KeyError(f"Dataframe '{name}' already exists.")
+        if insert_slot is None:
+            raise MemoryError(f"The catalog is full ({self.num_slots} dataframes).")
+
+        with self._updating():
+            segment, offset = self._allocate(len(data))
+            self.segment_buf(segment)[offset:offset + len(data)] = data
+            version = self._header()['next_version']
+            self._set_header(next_version=version + 1)
+            self._write_entry(insert_slot, SLOT_USED, segment, encoded, offset, len(data), version)
+        return segment, offset, len(data), version
+
+    def reserve(self, min_length: int) -> tuple:
+        """
+            Takes the largest free extent out of the free list (adding a segment if it is smaller than
+            min_length), for writing a dataframe whose final size isn't known yet. Returns
+            (segment, offset, length); publish the dataframe with commit() or hand the extent back
+            with release().
+
+            @param min_length: minimum length of the extent.
+        """
+        min_length = _align(max(min_length, 1))
+        extents = self._read_free_list()
+        if not extents or max(extent[2] for extent in extents) < min_length:
+            self._add_segment(min_length)
+            extents = self._read_free_list()
+        extent = max(extents, key=lambda extent: extent[2])
+        extents.remove(extent)
+        self._write_free_list(extents)
+        return extent
+
+    def commit(self, name: str, segment: int, offset: int, length: int, reserved: int) -> tuple:
+        """
+            Publishes a dataframe written into an extent obtained from reserve() under name, returning
+            the unused end of the extent to the free list. Returns (segment, offset, length, version).
+
+            @param name: name of the dataframe.
+            @param segment: segment of the reserved extent.
+            @param offset: offset of the reserved extent.
+            @param length: number of bytes written.
+            @param reserved: length of the reserved extent.
+        """
+        encoded = self._encode_name(name)
+        slot, insert_slot = self._probe(encoded)
+        if slot is not None:
+            raise KeyError(f"Dataframe '{name}' already exists.")
+        if insert_slot is None:
+            raise MemoryError(f"The catalog is full ({self.num_slots} dataframes).")
+
+        with self._updating():
+            used = _align(max(length, 1))
+            if reserved > used:
+                self.release(segment, offset + used, reserved - used)
+            version = self._header()['next_version']
+            self._set_header(next_version=version + 1)
+            self._write_entry(insert_slot, SLOT_USED, segment, encoded, offset, length, version)
+        return segment, offset, length, version
+
+    def grow(self, name: str, length: int, spare: int = 0, in_place: bool = True) -> tuple:
+        """
+            Finds room for the dataframe with name to grow to length bytes: its own extent, extended
+            into the free extent right after it when that is large enough (and in_place), else a
+            new extent of length + spare bytes. Returns (segment, offset, capacity). What readers
+            see doesn't change: write the dataframe's bytes there (copying the ones it keeps when
+            the extent is new) and publish them with update().
+
+            @param name: name of the dataframe.
+            @param length: length the dataframe grows to.
+            @param spare: extra bytes to allocate when the dataframe has to move, so it can grow
+                in place next time.
+            @param in_place: whether the dataframe may keep its offset (its bytes are only added to).
+        """
+        slot, _ = self._probe(self._encode_name(name))
+        if slot is None:
+            raise KeyError(f"Dataframe '{name}' not found.")
+        _, segment, _, _, offset, old_length, _, _ = self._read_entry(slot)
+        used, needed = _align(max(old_length, 1)), _align(max(length, 1))
+        if in_place:
+            if needed <= used:
+                return segment, offset, used
+            extents = self._read_free_list()
+            for i, (free_segment, free_offset, free_length) in enumerate(extents):
+                if (free_segment, free_offset) == (segment, offset + used) and used + free_length >= needed:
+                    if used + free_length == needed:
+                        del extents[i]
+                    else:
+                        extents[i] = (segment, offset + needed, used + free_length - needed)
+                    self._write_free_list(extents)
+                    return segment, offset, needed
+        segment, offset = self._allocate(length + spare)
+        return segment, offset, _align(length + spare)
+
+    def update(self, name: str, segment: int, offset: int, length: int, capacity: int) -> int:
+        """
+            Publishes the new bytes of an existing dataframe written into an extent obtained from
+            grow() or reserve(), bumping its version. Its previous extent is freed if it moved, and
+            so is the unused end of the new one. Returns the new version.
+
+            @param name: name of the dataframe.
+            @param segment: segment of the extent.
+            @param offset: offset of the extent.
+            @param length: number of bytes of the dataframe.
+            @param capacity: length of the extent.
+        """
+        encoded = self._encode_name(name)
+        slot, _ = self._probe(encoded)
+        if slot is None:
+            raise KeyError(f"Dataframe '{name}' not found.")
+        _, old_segment, _, _, old_offset, old_length, version, seq = self._read_entry(slot)
+        with self._updating():
+            used = _align(max(length, 1))
+            if capacity > used:
+                self.release(segment, offset + used, capacity - used)
+            if (segment, offset) != (old_segment, old_offset):
+                self.release(old_segment, old_offset, old_length)
+            self._write_entry(slot, SLOT_USED, segment, encoded, offset, length, version + 1, seq)
+        return version + 1
+
+    def remove(self, name: str) -> None:
+        """
+            Removes the dataframe with name and frees its space.
+
+            @param name: name of the dataframe.
+        """
+        slot, _ = self._probe(self._encode_name(name))
+        if slot is None:
+            raise KeyError(f"Dataframe '{name}' not found.")
+        _, segment, _, _, offset, length, version, _ = self._read_entry(slot)
+        with self._updating():
+            self._write_entry(slot, SLOT_DELETED, 0, b"", 0, 0, version)
+            self.release(segment, offset, length)
+            # Versions of a name keep increasing across remove and re-add, even after in-place writes.
+            self._set_header(next_version=max(self._header()['next_version'], version + 1))
+
+    def entries(self) -> list:
+        """
+            Returns (name, segment, offset, length, version) for every stored dataframe, ordered by
+            segment and offset.
+        """
+        entries = []
+        for slot in range(self.num_slots):
+            state, segment, name_length, name, offset, length, version, _ = self._read_entry(slot)
+            if state == SLOT_USED:
+                entries.append((name[:name_length].decode("utf-8"), segment, offset, length, version))
+        return sorted(entries, key=lambda entry: entry[1:3])
+
+    def compact(self) -> None:
+        """
+            Moves the dataframes of each segment to the start of the segment, leaving one free extent
+            at its end, and rebuilds the directory without deleted slots. Buffers previously returned
+            for the moved dataframes are invalidated.
+        """
+        entries = self.entries()
+        directory_start, directory_end = self._entry_position(0), self._entry_position(self.num_slots)
+        with self._updating():
+            self.buf[directory_start:directory_end] = bytes(directory_end - directory_start)
+
+            positions = {0: self._header()['data_start']}
+            for name, segment, offset, length, version in entries:
+                buf = self.segment_buf(segment)
+                position = positions.get(segment, 0)
+                if offset != position:
+                    buf[position:position + length] = buf[offset:offset + length]
+                encoded = self._encode_name(name)
+                _, slot = self._probe(encoded)
+                self._write_entry(slot, SLOT_USED, segment, encoded, position, length, version)
+                positions[segment] = position + _align(max(length, 1))
+
+            extents = []
+            for segment in range(self.num_segments):
+                position, size = positions.get(segment, 0), len(self.segment_buf(segment))
+                if position < size:
+                    extents.append((segment, position, size - position))
+            self._write_free_list(extents)
@@ -0,0 +1,122 @@
+"""
+Lightweight encodings of integer columns (frame-of-reference, delta and run-length) and their
+vectorized decoders. to_flatbuffer(..., compress=True) picks the smallest one for each column chunk.
+"""
+
+import numpy as np
+
+from Project.DataFrame.Encoding import Encoding
+
+# An encoding is only used when it stores a column in at most this fraction of its plain size.
+ENCODING_MAX_RATIO = 0.75
+
+# Dtypes the frame-of-reference offsets and the deltas are stored in, narrowest first.
+_OFFSET_DTYPES = [np.dtype(np.uint8), np.dtype(np.uint16), np.dtype(np.uint32)]
+_DELTA_DTYPES = [np.dtype(np.int8), np.dtype(np.int16), np.dtype(np.int32)]
+
+
+def _narrowest(low: int, high: int, dtypes: list):
+    """
+        Returns the first of dtypes that can hold every integer in [low, high], or None.
+    """
+    for dtype in dtypes:
+        bounds = np.iinfo(dtype)
+        if bounds.min <= low and high <= bounds.max:
+            return dtype
+    return None
+
+
+def encode(values: np.ndarray) -> tuple:
+    """
+        Encodes integer column values with the encoding that stores them in the fewest bytes.
+        Returns (encoding, reference, encoded, run_ends): encoded is the array to store in place of
+        the values (the values themselves for Encoding.Plain) and run_ends the end of each run for
+        Encoding.RunLength (None otherwise).
+
+        @param values: the values, of a signed int dtype or uint8/16/32.
+    """
+    plain = (Encoding.Plain, 0, values, None)
+    if len(values) < 2:
+        return plain
+    wide = values.astype(np.int64, copy=False)
+    low, high = int(wide.min()), int(wide.max())
+    # (size in bytes, encoding, function building (reference, encoded, run_ends))
+    candidates = []
+
+    offset_dtype = _narrowest(0, high - low, _OFFSET_DTYPES)
+    if offset_dtype is not None:
+        candidates.append((len(values) * offset_dtype.itemsize, Encoding.FrameOfReference,
+                           lambda: (low, (wide - low).astype(offset_dtype), None)))
+
+    deltas = np.diff(wide)
+    delta_dtype = _narrowest(int(deltas.min()), int(deltas.max()), _DELTA_DTYPES)
+    if delta_dtype is not None:
+        candidates.append((len(values) * delta_dtype.itemsize, Encoding.Delta,
+                           lambda: (int(wide[0]), np.concatenate(([0], deltas)).astype(delta_dtype), None)))
+
+    run_starts = np.flatnonzero(deltas) + 1
+    candidates.append(((len(run_starts) + 1) * (values.itemsize + 8), Encoding.RunLength,
+                       lambda: (0, values[np.concatenate(([0], run_starts))],
+                                np.append(run_starts, len(values)).astype(np.int64))))
+
+    size, encoding, build = min(candidates, key=lambda candidate: candidate[0])
+    if size > ENCODING_MAX_RATIO * values.nbytes:
+        return plain
+    return (encoding, *build())
+
+
+def encode_as(encoding: int, values: np.ndarray, encoded_dtype: np.dtype, reference: int = None):
+    """
+        Encodes integer column values with a given frame-of-reference or delta encoding in
+        encoded_dtype, e.g. to store mapped values in place of a column's encoded vector. Returns
+        (reference, encoded), or None if the values don't fit in encoded_dtype. The arithmetic wraps
+        around like int64 does, and so does decode, so wrapped values still decode exactly.
+
+        @param encoding: Encoding.FrameOfReference or Encoding.Delta.
+        @param values: the values, of a signed int dtype or uint8/16/32.
+        @param encoded_dtype: dtype of the encoded values.
+        @param reference: the reference value; by default the smallest value (FrameOfReference) or
+            the first one (Delta).
+    """
+    wide = values.astype(np.int64, copy=False)
+    if reference is None:
+        reference = int(wide.min() if encoding == Encoding.FrameOfReference else wide[0]) if len(wide) else 0
+    with np.errstate(over='ignore'):
+        if encoding == Encoding.FrameOfReference:
+            encoded = wide - np.int64(reference)
+        else:
+            encoded = np.diff(wide, prepend=np.int64(reference))
+    if len(encoded) and _narrowest(int(encoded.min()), int(encoded.max()), [encoded_dtype]) is None:
+        return None
+    return reference, encoded.astype(encoded_dtype)
+
+
+def decode(encoding: int, reference: int, encoded: np.ndarray, run_ends: np.ndarray, rows: int,
+           dtype: np.dtype) -> np.ndarray:
+    """
+        Returns the first rows values of an encoded column as a new array.
+
+        @param encoding: the Encoding.
+        @param reference: the reference value of FrameOfReference and Delta.
+        @param encoded: the encoded values (run values for RunLength).
+        @param run_ends: the run ends of RunLength.
+        @param rows: number of values to decode.
+        @param dtype: dtype of the column values.
+    """
+    if encoding == Encoding.FrameOfReference:
+        return (encoded[:rows].astype(np.int64) + reference).astype(dtype, copy=False)
+    elif encoding == Encoding.Delta:
+        return (np.cumsum(encoded[:rows], dtype=np.int64) + reference).astype(dtype, copy=False)
+    elif encoding == Encoding.RunLength:
+        runs = min(int(np.searchsorted(run_ends, rows)) + 1, len(run_ends))
+        return np.repeat(encoded[:runs], run_lengths(run_ends[:runs]))[:rows]
+    raise ValueError(f"Unknown encoding {encoding}.")
+
+
+def run_lengths(run_ends: np.ndarray) -> np.ndarray:
+    """
+        Returns the number of rows in each run given the run ends of a RunLength column.
+
+        @param run_ends: the run ends.
+    """
+    return np.diff(run_ends, prepend=0)
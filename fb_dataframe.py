@@ -1,4 +1,7 @@
+import concurrent.futures
 import flatbuffers
+import itertools
+import operator
 import pandas as pd
 import struct
 import time
@@ -7,10 +10,50 @@ import numpy as np
 
 # Your Flatbuffer imports here (i.e. the files generated from running ./flatc with your Flatbuffer definition)...
 from flatbuffers import Builder
-from Project.DataFrame import DataFrame, Column, Metadata, ValueType
+from pandas.api.types import union_categoricals
+from Project.DataFrame import DataFrame, Column, ColumnStats, Metadata, RowGroup, ValueType
 from Project.DataFrame.DataType import DataType
+from Project.DataFrame.Encoding import Encoding
 
-def to_flatbuffer(df: pd.DataFrame) -> bytes:
+from fb_codecs import decode, encode, encode_as, run_lengths
+from fb_descriptors import DescribedBuffer, FrameDescriptor, vtable_offset
+from fb_dtypes import FIXED_WIDTH_TYPES, NUMPY_DATA_TYPES, column_dtype, is_time_dtype, time_array, time_value, \
+    time_values, to_pandas
+from fb_groupby import aggregated_columns, group_by_aggregate, partial_aggregate
+from fb_schema import FbSchema, cached_schema, find_columns, read_pandas_dtype, read_schema, schema_id
+
+# Vtable offset and layout of the reference of an encoded column, rewritten when the column is mapped.
+REFERENCE_OFFSET = vtable_offset(Column.ColumnAddReference)
+REFERENCE = struct.Struct('<q')
+
+# Number of values mapped per batch when map_func is applied per element.
+MAP_CHUNK_SIZE = 65536
+
+# String columns with at most this many distinct values per row are dictionary-encoded.
+DICTIONARY_MAX_RATIO = 0.5
+
+# Marks a buffer holding a stream of chunk flatbuffers (see fb_dataframe_write_stream).
+STREAM_MAGIC = b"FBDFSTRM"
+STREAM_LENGTH = struct.Struct("<Q")
+
+# Layout of the ColumnStats struct (row_count, null_count, min_int, max_int, min_float, max_float).
+COLUMN_STATS = struct.Struct("<qqqqdd")
+
+# Comparison operators accepted in the (column, op, value) conditions of a predicate.
+COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+# Connectives combining predicates: ('and', predicate, ...) and ('or', predicate, ...).
+CONNECTIVES = ('and', 'or')
+
+def to_flatbuffer(df: pd.DataFrame, row_group_size: int = None, compress: bool = False,
+                  workers: int = None) -> bytes:
     """
         Converts a DataFrame to a flatbuffer. Returns the bytes of the flatbuffer.
 
@@ -24,70 +67,1102 @@ def to_flatbuffer(df: pd.DataFrame) -> bytes:
             functions, respectively (i.e., don't convert them to strings yourself - you will lose
             precision for floats).
 
+        Besides int64 and float64, int8/16/32, uint8/16/32/64, float32 and bool columns are stored in
+        vectors of their own fixed width, datetime64/timedelta64 columns as int64 counts of their unit
+        and category columns (with string categories) as dictionary codes; the pandas dtype is
+        restored on read. Missing values (None/NaN in object columns, NaT, <NA> in the pandas
+        nullable dtypes such as Int64, Float64, boolean and string) are recorded in a per-column
+        validity bitmap. Every column carries row count/null count/min/max statistics. With
+        row_group_size the rows are split into row groups of that many rows, laid out as above one
+        group after another, each with its own statistics so filtered reads can skip whole groups.
+        With compress, every integer column chunk is stored with whichever of frame-of-reference,
+        delta or run-length encoding makes it smallest (see fb_codecs), if any makes it small enough;
+        run-length encoded columns can still be mapped in place, the others can't. The frame also
+        stores a column name index (column positions sorted by name) and a schema id (see fb_schema).
+
+        With workers, the columns (the row groups with row_group_size) are serialized in that many
+        worker processes, each into a standalone block, and the blocks are copied into the frame;
+        the result reads exactly like a sequentially built one.
+
         @param df: the dataframe.
+        @param row_group_size: number of rows per row group; by default every column is stored as
+            a single contiguous vector.
+        @param compress: encode integer columns when that shrinks them.
+        @param workers: number of worker processes; by default (or with 1) everything is
+            serialized in this process.
+    """
+    if row_group_size is not None and row_group_size < 1:
+        raise ValueError(f"row_group_size must be positive, got {row_group_size}.")
+    # Use the order of columns as in DataFrame; they are serialized (and stored) in reverse.
+    col_names = list(df.columns[::-1])
+    dtypes, pandas_dtypes = {}, {}
+    for col_name in col_names:
+        dtypes[col_name], pandas_dtypes[col_name] = column_dtype(df[col_name])
+
+    # Build the last group first so the groups end up in row order in the buffer.
+    parts = col_names if row_group_size is None else list(reversed(range(0, len(df), row_group_size)))
+    frame = (df, dtypes, pandas_dtypes, row_group_size, compress)
+    if workers is None or workers == 1 or not parts:
+        builder = flatbuffers.Builder(1024)
+        built = [_build_part(builder, frame, part) for part in parts]
+    else:
+        # The workers get the dataframe once, when they start (without a copy where processes fork).
+        with concurrent.futures.ProcessPoolExecutor(workers, initializer=_set_worker_frame,
+                                                    initargs=(frame,)) as executor:
+            blocks = list(executor.map(_build_block, parts))
+        builder = flatbuffers.Builder(sum(len(block[0]) for block in blocks) + 1024)
+        built = [_prepend_block(builder, block) for block in blocks]
+
+    row_groups_offset = None
+    if row_group_size is None:
+        column_offsets = [offset for offset, _ in built]
+    else:
+        row_groups_offset = _build_offset_vector(builder, DataFrame.DataFrameStartRowGroupsVector,
+                                                 [offset for offset, _ in built][::-1])
+        chunk_stats = {col_name: [stats[i] for _, stats in built] for i, col_name in enumerate(col_names)}
+
+        # The top-level columns only describe the column and summarize its row groups.
+        column_offsets = [_build_column(builder, dtypes[col_name], [], _merge_stats(chunk_stats[col_name]), col_name,
+                                        pandas_dtypes[col_name]) for col_name in col_names]
+
+    columns_offset = _build_offset_vector(builder, DataFrame.DataFrameStartColumnsVector, column_offsets)
+    sorted_columns = sorted(range(len(col_names)), key=lambda i: col_names[i].encode('utf-8'))
+    sorted_columns_offset = builder.CreateNumpyVector(np.array(sorted_columns, dtype=np.int32))
+
+    DataFrame.DataFrameStart(builder)
+    DataFrame.DataFrameAddColumns(builder, columns_offset)
+    if row_groups_offset is not None:
+        DataFrame.DataFrameAddRowGroups(builder, row_groups_offset)
+    DataFrame.DataFrameAddSortedColumns(builder, sorted_columns_offset)
+    DataFrame.DataFrameAddSchemaId(builder, schema_id(col_names, dtypes, pandas_dtypes))
+    dataframe_offset = DataFrame.DataFrameEnd(builder)
+
+    builder.Finish(dataframe_offset)
+    return builder.Output()
+
+
+def _build_part(builder: flatbuffers.Builder, frame: tuple, part) -> tuple:
+    """
+        Builds one part of a frame: a Column table for a frame without row groups, else a RowGroup
+        table. Returns (its offset, its stats) as _build_full_column or _build_row_group do.
+
+        @param builder: the flatbuffer builder.
+        @param frame: (df, dtypes, pandas_dtypes, row_group_size, compress) as in to_flatbuffer.
+        @param part: the name of the column, or the first row of the row group.
+    """
+    df, dtypes, pandas_dtypes, row_group_size, compress = frame
+    if row_group_size is None:
+        return _build_full_column(builder, dtypes[part], pandas_dtypes[part], part, df[part], compress)
+    return _build_row_group(builder, dtypes, df.iloc[part:part + row_group_size], compress)
+
+
+def _build_full_column(builder: flatbuffers.Builder, dtype: int, pandas_dtype, name: str, col_data: pd.Series,
+                       compress: bool) -> tuple:
+    """
+        Builds the Column table of a frame without row groups. Returns (its offset, its stats).
+
+        @param builder: the flatbuffer builder.
+        @param dtype: the DataType of the column.
+        @param pandas_dtype: pandas dtype to restore on read (as returned by column_dtype).
+        @param name: name of the column.
+        @param col_data: the pandas column.
+        @param compress: encode integer values when that shrinks them.
+    """
+    values, valid, fields = _build_values(builder, dtype, col_data, compress)
+    stats = _values_stats(values, valid)
+    return _build_column(builder, dtype, fields, stats, name, pandas_dtype), stats
+
+
+def _build_row_group(builder: flatbuffers.Builder, dtypes: dict, chunk: pd.DataFrame, compress: bool) -> tuple:
+    """
+        Builds a RowGroup table with the column chunks of chunk. Returns (its offset, the stats of
+        each column chunk).
+
+        @param builder: the flatbuffer builder.
+        @param dtypes: dict mapping column names, in the order they are stored, to their DataType.
+        @param chunk: the rows of the row group.
+        @param compress: encode integer values when that shrinks them.
+    """
+    chunk_offsets, chunk_stats = [], []
+    for col_name, dtype in dtypes.items():
+        values, valid, fields = _build_values(builder, dtype, chunk[col_name], compress)
+        stats = _values_stats(values, valid)
+        chunk_stats.append(stats)
+        chunk_offsets.append(_build_column(builder, dtype, fields, stats))
+    chunk_columns_offset = _build_offset_vector(builder, RowGroup.RowGroupStartColumnsVector, chunk_offsets)
+
+    RowGroup.RowGroupStart(builder)
+    RowGroup.RowGroupAddNumRows(builder, len(chunk))
+    RowGroup.RowGroupAddColumns(builder, chunk_columns_offset)
+    return RowGroup.RowGroupEnd(builder), chunk_stats
+
+
+# The (df, dtypes, pandas_dtypes, row_group_size, compress) a to_flatbuffer worker process serializes.
+_worker_frame = None
+
+
+def _set_worker_frame(frame: tuple) -> None:
+    """
+        Initializes a to_flatbuffer worker process with the frame it serializes parts of.
+    """
+    global _worker_frame
+    _worker_frame = frame
+
+
+def _build_block(part) -> tuple:
+    """
+        Builds one part of the worker's frame (see _build_part) on a builder of its own. Returns
+        (block, offset, alignment, stats): the bytes built, the offset of the table (from the end
+        of block), the largest alignment anything in block needs and the stats of the part.
+        Offsets in a flatbuffer are relative, so the block stays valid wherever it is copied, as
+        long as its end is aligned (see _prepend_block).
+
+        @param part: the name of the column, or the first row of the row group.
     """
     builder = flatbuffers.Builder(1024)
+    offset, stats = _build_part(builder, _worker_frame, part)
+    # pad the block to a multiple of its alignment, so aligning its end aligns its start too
+    builder.Prep(builder.minalign, 0)
+    return bytes(builder.Bytes[builder.Head():]), offset, builder.minalign, stats
 
-    # Serialize columns and collect their offsets.
-    column_offsets = []
-    for col_name in df[df.columns[::-1]]:  # Use the order of columns as in DataFrame
-        col_data = df[col_name]
-        dtype = None
-        values_offset = None
 
-        # Create the column name string outside of any other object creation to avoid nesting.
-        name_offset = builder.CreateString(col_name)
-
-        if col_data.dtype == 'int64':
-            dtype = DataType.Int64
-            Column.ColumnStartIntValuesVector(builder, len(col_data))
-            for value in col_data.iloc[::-1]:  # reverse iterate using iloc
-                builder.PrependInt64(value)
-            values_offset = builder.EndVector(len(col_data))
-        elif col_data.dtype == 'float64':
-            dtype = DataType.Float
-            Column.ColumnStartFloatValuesVector(builder, len(col_data))
-            for value in col_data.iloc[::-1]:  # reverse iterate using iloc
-                builder.PrependFloat64(value)
-            values_offset = builder.EndVector(len(col_data))
-        elif col_data.dtype == 'object':
-            dtype = DataType.String
-            # Pre-create strings for column values to avoid nested construction
-            string_offsets = [builder.CreateString(str(value)) for value in col_data.iloc[::-1]]
-            Column.ColumnStartStringValuesVector(builder, len(col_data))
-            for offset in string_offsets:
-                builder.PrependUOffsetTRelative(offset)
-            values_offset = builder.EndVector(len(col_data))
+def _prepend_block(builder: flatbuffers.Builder, block: tuple) -> tuple:
+    """
+        Copies a block built by _build_block into builder. Returns (the offset of its table, now
+        relative to builder, its stats).
+
+        @param builder: the flatbuffer builder.
+        @param block: the (block, offset, alignment, stats) returned by _build_block.
+    """
+    data, offset, alignment, stats = block
+    builder.Prep(alignment, len(data))
+    builder.head = builder.Head() - len(data)
+    builder.Bytes[builder.Head():builder.Head() + len(data)] = data
+    return builder.Offset() - len(data) + offset, stats
+
+
+def _build_values(builder: flatbuffers.Builder, dtype: int, col_data: pd.Series, compress: bool = False) -> tuple:
+    """
+        Serializes the values of a column into vectors. Returns (values, valid, fields), where values
+        are the serialized values as a NumPy array (numeric columns) or a list of strings, valid is
+        a boolean mask of the non-null rows (None if there are no nulls), and fields is a list of
+        (Column.ColumnAdd... function, vector offset or value) pairs to add to the column.
+
+        @param builder: the flatbuffer builder.
+        @param dtype: the DataType of the column.
+        @param col_data: the pandas column (or a slice of it).
+        @param compress: store integer values with a lightweight encoding when it shrinks them.
+    """
+    valid, fields = None, []
+    # NaN is a regular float value; nulls only exist in object, datetime and nullable columns.
+    if col_data.dtype not in NUMPY_DATA_TYPES:
+        null = col_data.isna().to_numpy()
+        if null.any():
+            valid = ~null
+            fields.append((Column.ColumnAddValidity, builder.CreateNumpyVector(np.packbits(valid, bitorder='little'))))
+
+    if dtype in FIXED_WIDTH_TYPES:
+        np_dtype, field = FIXED_WIDTH_TYPES[dtype]
+        if col_data.dtype.kind in 'mM':
+            values = time_values(col_data)
+            values = values if valid is None else np.where(valid, values, 0)
+        else:
+            values = col_data.to_numpy(dtype=np_dtype, na_value=np.nan if np_dtype.kind == 'f' else 0)
+        if compress and np_dtype.kind in 'iu' and dtype != DataType.UInt64:
+            encoding, reference, encoded, run_ends = encode(values)
+            if encoding != Encoding.Plain:
+                encoded_type = NUMPY_DATA_TYPES[encoded.dtype]
+                fields += [(getattr(Column, f'ColumnAdd{FIXED_WIDTH_TYPES[encoded_type][1]}'),
+                            builder.CreateNumpyVector(encoded)),
+                           (Column.ColumnAddEncoding, encoding), (Column.ColumnAddEncodedType, encoded_type),
+                           (Column.ColumnAddReference, reference)]
+                if run_ends is not None:
+                    fields.append((Column.ColumnAddRunEnds, builder.CreateNumpyVector(run_ends)))
+                return values, valid, fields
+        # Copy the whole column buffer in one shot; same layout as PrependInt64/PrependFloat64 per value.
+        return values, valid, fields + [(getattr(Column, f'ColumnAdd{field}'), builder.CreateNumpyVector(values))]
+
+    if isinstance(col_data.dtype, pd.CategoricalDtype):
+        # The dictionary is the full list of categories, in order, and the codes are pandas' own.
+        categories = col_data.cat.categories.to_numpy(dtype=object)
+        codes = col_data.cat.codes.to_numpy()
+        values = np.append(categories, '')[np.where(codes < 0, len(categories), codes)].tolist()
+        codes_offset = builder.CreateNumpyVector(np.maximum(codes, 0).astype(np.int32))
+        dictionary_offset = _build_strings(builder, Column.ColumnStartDictionaryVector, categories)
+        return values, valid, fields + [(Column.ColumnAddDictionary, dictionary_offset),
+                                        (Column.ColumnAddCodes, codes_offset)]
+
+    values = [str(value) for value in (col_data if valid is None else col_data.where(valid, ''))]
+    codes, dictionary = pd.factorize(np.array(values, dtype=object))
+    if len(dictionary) <= DICTIONARY_MAX_RATIO * len(values):
+        # Repetitive column: store each distinct string once (sorted) plus an int32 code per row.
+        order = np.argsort(dictionary)
+        dictionary = dictionary[order]
+        ranks = np.empty(len(order), dtype=np.int32)
+        ranks[order] = np.arange(len(order), dtype=np.int32)
+        codes_offset = builder.CreateNumpyVector(ranks[codes])
+        dictionary_offset = _build_strings(builder, Column.ColumnStartDictionaryVector, dictionary)
+        return values, valid, fields + [(Column.ColumnAddDictionary, dictionary_offset),
+                                        (Column.ColumnAddCodes, codes_offset)]
+    return values, valid, fields + _build_packed_strings(builder, values)
 
+
+def _build_packed_strings(builder: flatbuffers.Builder, values: list) -> list:
+    """
+        Builds the packed layout of a string column: one UTF-8 blob plus the offset of each value in
+        it. Returns the (Column.ColumnAdd... function, vector offset) pairs to add to the column.
+
+        @param builder: the flatbuffer builder.
+        @param values: the strings.
+    """
+    text = ''.join(values)
+    if text.isascii():
+        # one character per byte: encode everything at once
+        data = text.encode('ascii')
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    else:
+        encoded = [value.encode('utf-8') for value in values]
+        data = b''.join(encoded)
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    if len(data) <= np.iinfo(np.int32).max:
+        offsets_field = (Column.ColumnAddStringOffsets, builder.CreateNumpyVector(offsets.astype(np.int32)))
+    else:
+        offsets_field = (Column.ColumnAddLargeStringOffsets, builder.CreateNumpyVector(offsets))
+    return [offsets_field, (Column.ColumnAddStringData, builder.CreateByteVector(data))]
+
+
+def _build_strings(builder: flatbuffers.Builder, start_vector, values) -> int:
+    """
+        Builds a vector of strings. Returns the offset of the vector.
+
+        @param builder: the flatbuffer builder.
+        @param start_vector: the generated Start...Vector function of the vector field.
+        @param values: the strings.
+    """
+    # Pre-create strings for column values to avoid nested construction
+    string_offsets = [builder.CreateString(value) for value in values[::-1]]
+    start_vector(builder, len(values))
+    for offset in string_offsets:
+        builder.PrependUOffsetTRelative(offset)
+    return builder.EndVector()
+
+
+def _build_column(builder: flatbuffers.Builder, dtype: int, fields: list, stats: tuple, name: str = None,
+                  pandas_dtype=None) -> int:
+    """
+        Builds a Column table. Returns its offset.
+
+        @param builder: the flatbuffer builder.
+        @param dtype: the DataType of the column.
+        @param fields: the value vectors as returned by _build_values (empty for a column without values).
+        @param stats: (row count, null count, min, max) of the values.
+        @param name: name of the column, or None for the column chunks of a row group.
+        @param pandas_dtype: pandas dtype to restore on read, if not the default one for dtype (as
+            returned by column_dtype).
+    """
+    row_count, null_count, min_value, max_value = stats
+    metadata_offset = None
+    if name is not None:
+        # Create the column name string outside of any other object creation to avoid nesting.
+        name_offset = builder.CreateString(name)
+        categorical = isinstance(pandas_dtype, pd.CategoricalDtype)
+        pandas_dtype_offset = builder.CreateString('category' if categorical else pandas_dtype) \
+            if pandas_dtype is not None else None
+        if categorical:
+            categories_offset = _build_strings(builder, Metadata.MetadataStartCategoriesVector,
+                                               pandas_dtype.categories.to_numpy(dtype=object))
         Metadata.MetadataStart(builder)
         Metadata.MetadataAddName(builder, name_offset)
         Metadata.MetadataAddDtype(builder, dtype)
+        if pandas_dtype_offset is not None:
+            Metadata.MetadataAddPandasDtype(builder, pandas_dtype_offset)
+        if categorical:
+            Metadata.MetadataAddCategories(builder, categories_offset)
+            Metadata.MetadataAddOrdered(builder, bool(pandas_dtype.ordered))
         metadata_offset = Metadata.MetadataEnd(builder)
+    has_bounds = min_value is not None
+    if dtype == DataType.String and has_bounds:
+        min_string_offset = builder.CreateString(min_value)
+        max_string_offset = builder.CreateString(max_value)
 
-        Column.ColumnStart(builder)
+    Column.ColumnStart(builder)
+    if metadata_offset is not None:
         Column.ColumnAddMetadata(builder, metadata_offset)
-        if dtype == DataType.Int64:
-            Column.ColumnAddIntValues(builder, values_offset)
-        elif dtype == DataType.Float:
-            Column.ColumnAddFloatValues(builder, values_offset)
-        elif dtype == DataType.String:
-            Column.ColumnAddStringValues(builder, values_offset)
-        column_offsets.append(Column.ColumnEnd(builder))
-
-    DataFrame.DataFrameStartColumnsVector(builder, len(column_offsets))
-    for offset in reversed(column_offsets):
+    for add_field, offset in fields:
+        add_field(builder, offset)
+    int_bounds, float_bounds = _stats_bounds(dtype, min_value, max_value)
+    Column.ColumnAddStats(builder, ColumnStats.CreateColumnStats(builder, row_count, null_count,
+                                                                 *int_bounds, *float_bounds))
+    if dtype == DataType.String and has_bounds:
+        Column.ColumnAddMinString(builder, min_string_offset)
+        Column.ColumnAddMaxString(builder, max_string_offset)
+    return Column.ColumnEnd(builder)
+
+
+def _stats_bounds(dtype: int, min_value, max_value) -> tuple:
+    """
+        Returns ((min_int, max_int), (min_float, max_float)) to store in the ColumnStats of a column;
+        the bounds of the other kind (and of string columns) are zero. uint64 bounds are bit-cast to
+        int64.
+
+        @param dtype: the DataType (or ValueType) of the column.
+        @param min_value: min of the column values, or None if it has none.
+        @param max_value: max of the column values.
+    """
+    kind = FIXED_WIDTH_TYPES[dtype][0].kind if dtype in FIXED_WIDTH_TYPES and min_value is not None else None
+    if kind == 'f':
+        return (0, 0), (min_value, max_value)
+    elif kind == 'u' and dtype == DataType.UInt64:
+        return tuple(np.array([min_value, max_value], dtype=np.uint64).view(np.int64).tolist()), (0.0, 0.0)
+    elif kind in ('i', 'u', 'b'):
+        return (int(min_value), int(max_value)), (0.0, 0.0)
+    return (0, 0), (0.0, 0.0)
+
+
+def _build_offset_vector(builder: flatbuffers.Builder, start_vector, offsets: list) -> int:
+    """
+        Builds a vector of tables with offsets[i] at index i. Returns the offset of the vector.
+
+        @param builder: the flatbuffer builder.
+        @param start_vector: the generated Start...Vector function of the vector field.
+        @param offsets: offsets of the tables.
+    """
+    start_vector(builder, len(offsets))
+    for offset in reversed(offsets):
         builder.PrependUOffsetTRelative(offset)
-    columns_offset = builder.EndVector(len(column_offsets))
+    return builder.EndVector()
 
-    DataFrame.DataFrameStart(builder)
-    DataFrame.DataFrameAddColumns(builder, columns_offset)
-    dataframe_offset = DataFrame.DataFrameEnd(builder)
 
-    builder.Finish(dataframe_offset)
-    return builder.Output()
-    
+def _values_stats(values, valid: np.ndarray = None) -> tuple:
+    """
+        Returns (row count, null count, min, max) of column values; NaNs count as nulls and min/max
+        are None when there are no other values.
+
+        @param values: NumPy array of numeric values or list of strings.
+        @param valid: optional mask of the non-null values.
+    """
+    if valid is not None:
+        row_count, null_count, min_value, max_value = _values_stats(
+            values[valid] if isinstance(values, np.ndarray) else list(itertools.compress(values, valid)))
+        return len(valid), null_count + len(valid) - row_count, min_value, max_value
+    if isinstance(values, np.ndarray):
+        valid = values[~np.isnan(values)] if values.dtype.kind == 'f' else values
+        if not len(valid):
+            return len(values), len(values), None, None
+        return len(values), len(values) - len(valid), valid.min().item(), valid.max().item()
+    if not values:
+        return 0, 0, None, None
+    return len(values), 0, min(values), max(values)
+
+
+def _merge_stats(stats: list) -> tuple:
+    """
+        Combines the (row count, null count, min, max) stats of several chunks of a column.
+
+        @param stats: stats of each chunk.
+    """
+    bounded = [chunk for chunk in stats if chunk[2] is not None]
+    return (sum(chunk[0] for chunk in stats), sum(chunk[1] for chunk in stats),
+            min(chunk[2] for chunk in bounded) if bounded else None,
+            max(chunk[3] for chunk in bounded) if bounded else None)
+
+
+def fb_dataframe_write_stream(chunks, out, compress: bool = False) -> int:
+    """
+        Serializes an iterator of DataFrame chunks (e.g. pd.read_csv(..., chunksize=n)) into a
+        flatbuffer stream written to out, holding only one serialized chunk in memory at a time.
+        Returns the number of bytes written. The stream is read as one logical dataframe by
+        fb_dataframe_head, fb_dataframe_group_by(_sum) and fb_dataframe_map_numeric_column:
+        +--------------+--------+---------------------+-----+--------+---------------------+-----+
+        | STREAM_MAGIC | length | chunk 1 flatbuffer  | pad | length | chunk 2 flatbuffer  | ... |
+        +--------------+--------+---------------------+-----+--------+---------------------+-----+
+
+        @param chunks: iterable of dataframes with the same columns.
+        @param out: binary file-like object to write to (anything with a write(bytes) method).
+        @param compress: encode integer columns when that shrinks them (see to_flatbuffer).
+    """
+    out.write(STREAM_MAGIC)
+    written = len(STREAM_MAGIC)
+    for chunk in chunks:
+        framed = stream_chunk(to_flatbuffer(chunk, compress=compress))
+        out.write(framed)
+        written += len(framed)
+    return written
+
+
+def stream_chunk(fb_bytes) -> bytes:
+    """
+        Returns a flatbuffer framed as one chunk of a stream (see fb_dataframe_write_stream): its
+        length, its bytes and the padding that keeps the next chunk 8-byte aligned, so its
+        int64/float64 vectors stay aligned. Appending it to a stream adds the flatbuffer's rows.
+
+        @param fb_bytes: bytes of the Flatbuffer Dataframe (a single frame).
+    """
+    return STREAM_LENGTH.pack(len(fb_bytes)) + bytes(fb_bytes) + bytes(-len(fb_bytes) % 8)
+
+
+def is_stream(fb_buf) -> bool:
+    """
+        Returns whether fb_buf holds a stream of flatbuffer frames rather than a single flatbuffer.
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe.
+    """
+    return bytes(fb_buf[:len(STREAM_MAGIC)]) == STREAM_MAGIC
+
+
+def _frame_extents(fb_buf) -> list:
+    """
+        Returns (start, length) of each flatbuffer frame in fb_buf: the whole buffer for a single
+        flatbuffer, or each chunk of a stream written by fb_dataframe_write_stream.
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe.
+    """
+    if bytes(fb_buf[:len(STREAM_MAGIC)]) != STREAM_MAGIC:
+        return [(0, len(fb_buf))]
+    extents = []
+    position = len(STREAM_MAGIC)
+    while position + STREAM_LENGTH.size <= len(fb_buf):
+        length, = STREAM_LENGTH.unpack_from(fb_buf, position)
+        position += STREAM_LENGTH.size
+        extents.append((position, length))
+        position += length + (-length % 8)
+    return extents
+
+
+def _frames(fb_buf) -> list:
+    """
+        Returns the flatbuffer frames making up a dataframe: the buffer itself for a single flatbuffer,
+        or a memoryview per chunk for a stream written by fb_dataframe_write_stream.
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe, or a DescribedBuffer.
+    """
+    if isinstance(fb_buf, DescribedBuffer):
+        return [frame for frame, _ in fb_buf.frames()]
+    if bytes(fb_buf[:len(STREAM_MAGIC)]) != STREAM_MAGIC:
+        return [fb_buf]
+    view = memoryview(fb_buf)
+    return [view[start:start + length] for start, length in _frame_extents(fb_buf)]
+
+
+def fb_dataframe_describe(fb_buf, staged: bool = False) -> DescribedBuffer:
+    """
+        Wraps the flatbuffer dataframe with descriptors of its frames (see fb_descriptors). The
+        result can be passed to the fb_dataframe functions instead of fb_buf: each column's layout
+        is resolved the first time it is read and reused by later queries through the same
+        descriptors, skipping the flatbuffer tables. They stay valid while the layout of fb_buf
+        does (mapping values in place doesn't change it).
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe.
+        @param staged: keep the columns resolved while reading aside until DescribedBuffer.commit(),
+            for buffers that may change under the reader.
+    """
+    if isinstance(fb_buf, DescribedBuffer):
+        return fb_buf
+    view = memoryview(fb_buf)
+    descriptors = []
+    for start, length in _frame_extents(fb_buf):
+        root_df = DataFrame.DataFrame.GetRootAsDataFrame(view[start:start + length], 0)
+        num_rows = [root_df.RowGroups(g).NumRows() for g in range(root_df.RowGroupsLength())] or None
+        descriptors.append(FrameDescriptor(start, length, read_schema(root_df), num_rows))
+    return DescribedBuffer(fb_buf, descriptors, staged)
+
+
+def _column_length(col: Column.Column, dtype: int) -> int:
+    """
+        Returns the number of values stored in a column.
+
+        @param col: the flatbuffer column.
+        @param dtype: the ValueType of the column.
+    """
+    if dtype in FIXED_WIDTH_TYPES:
+        encoding = col.Encoding()
+        if encoding == Encoding.RunLength:
+            return int(col.RunEnds(col.RunEndsLength() - 1)) if col.RunEndsLength() else 0
+        elif encoding != Encoding.Plain:
+            dtype = col.EncodedType()
+        return getattr(col, f'{FIXED_WIDTH_TYPES[dtype][1]}Length')()
+    elif dtype == ValueType.ValueType.String:
+        if not col.CodesIsNone():
+            return col.CodesLength()
+        elif not col.StringOffsetsIsNone():
+            return col.StringOffsetsLength() - 1
+        elif not col.LargeStringOffsetsIsNone():
+            return col.LargeStringOffsetsLength() - 1
+        return col.StringValuesLength()
+    return 0
+
+
+def _column_values(col: Column.Column, dtype: int, rows: int = None, first: int = 0):
+    """
+        Returns the first rows values of a column (all values if rows is None), skipping the values
+        before first. Numeric columns are
+        returned as NumPy views over the flatbuffer vector without copying (encoded ones are decoded
+        into a new array); string columns are
+        decoded into a list, except dictionary-encoded ones, which are returned as a pd.Categorical
+        over the codes (decoding only the dictionary) unless fewer rows than distinct values are read.
+
+        @param col: the flatbuffer column.
+        @param dtype: the ValueType of the column.
+        @param rows: number of values to return.
+        @param first: index of the first value to return.
+    """
+    length = _column_length(col, dtype)
+    rows = length if rows is None else min(rows, length)
+    first = min(first, rows)
+    if dtype in FIXED_WIDTH_TYPES:
+        np_dtype, field = FIXED_WIDTH_TYPES[dtype]
+        if not length:
+            return np.empty(0, dtype=np_dtype)
+        elif col.Encoding() != Encoding.Plain:
+            return decode(col.Encoding(), col.Reference(), _encoded_values(col), _run_ends(col), rows,
+                          np_dtype)[first:]
+        return getattr(col, f'{field}AsNumpy')()[first:rows]
+    elif dtype == ValueType.ValueType.String and not col.CodesIsNone():
+        codes = col.CodesAsNumpy()[first:rows] if length else np.empty(0, dtype=np.int32)
+        if len(codes) < col.DictionaryLength():
+            return [col.Dictionary(code).decode('utf-8') for code in codes.tolist()]
+        dictionary = pd.Index([col.Dictionary(j).decode('utf-8') for j in range(col.DictionaryLength())], dtype=object)
+        return pd.Categorical.from_codes(codes, categories=dictionary, validate=False)
+    elif dtype == ValueType.ValueType.String and col.StringDataIsNone():
+        return [col.StringValues(j).decode('utf-8') for j in range(first, rows)]
+    elif dtype == ValueType.ValueType.String:
+        return _packed_strings(col, rows, first)
+    return []
+
+
+def _encoded_values(col: Column.Column) -> np.ndarray:
+    """
+        Returns a NumPy view over the stored vector of an encoded column: the offsets, deltas or run
+        values, in the column's EncodedType.
+
+        @param col: the flatbuffer column.
+    """
+    return getattr(col, f'{FIXED_WIDTH_TYPES[col.EncodedType()][1]}AsNumpy')()
+
+
+def _run_ends(col: Column.Column):
+    """
+        Returns the run ends of a run-length encoded column, or None for other columns.
+
+        @param col: the flatbuffer column.
+    """
+    return None if col.RunEndsIsNone() else col.RunEndsAsNumpy()
+
+
+def _column_validity(col: Column.Column, rows: int, first: int = 0):
+    """
+        Returns a boolean mask of the non-null values among the first rows of a column (from the
+        value at first on), or None if the column has no nulls.
+
+        @param col: the flatbuffer column.
+        @param rows: number of values.
+        @param first: index of the first value.
+    """
+    if col.ValidityIsNone():
+        return None
+    return np.unpackbits(col.ValidityAsNumpy(), count=rows, bitorder='little').view(bool)[first:]
+
 
-def fb_dataframe_head(fb_bytes: bytes, rows: int = 5) -> pd.DataFrame:
+def _packed_strings(col: Column.Column, rows: int, first: int = 0) -> list:
+    """
+        Returns the first rows values of a packed string column from the value at first on, decoding
+        the bytes they span in one call.
+
+        @param col: the flatbuffer column.
+        @param rows: number of values to return.
+        @param first: index of the first value to return.
+    """
+    if rows <= first:
+        return []
+    offsets = col.StringOffsetsAsNumpy() if not col.StringOffsetsIsNone() else col.LargeStringOffsetsAsNumpy()
+    bounds = offsets[first:rows + 1].tolist()
+    data = col.StringDataAsNumpy()[bounds[0]:bounds[-1]].tobytes()
+    text = data.decode('utf-8')
+    if len(text) == len(data):
+        # ASCII only, so byte offsets are character offsets into the decoded text
+        return [text[start - bounds[0]:end - bounds[0]] for start, end in zip(bounds, bounds[1:])]
+    return [data[start - bounds[0]:end - bounds[0]].decode('utf-8') for start, end in zip(bounds, bounds[1:])]
+
+
+def _locate_columns(root_df: DataFrame.DataFrame, names=None) -> dict:
+    """
+        Returns a dict mapping each requested column name to its (index in root_df.Columns, dtype)
+        pair: all columns in the original column order, or the requested ones found in the order
+        requested.
+
+        @param root_df: the flatbuffer dataframe.
+        @param names: names of the columns to look up; None for all columns.
+    """
+    if names is None:
+        return read_schema(root_df).columns
+    return find_columns(root_df, names)
+
+
+def _find_columns(root_df: DataFrame.DataFrame, names) -> dict:
+    """
+        Returns a dict mapping each requested column name to its (column, dtype) pair.
+
+        @param root_df: the flatbuffer dataframe.
+        @param names: names of the columns to look up.
+    """
+    return {name: (root_df.Columns(i), dtype) for name, (i, dtype) in _locate_columns(root_df, names).items()}
+
+
+def _pandas_dtypes(fb_buf, names=None) -> dict:
+    """
+        Returns a dict mapping the name of each requested column stored with a pandas dtype other
+        than the default one of its ValueType to that dtype (e.g. 'Int64', 'datetime64[ns]' or a
+        pd.CategoricalDtype).
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe.
+        @param names: names of the columns to look up; None for all columns.
+    """
+    frames = _frames(fb_buf)
+    if not frames:
+        return {}
+    root_df = DataFrame.DataFrame.GetRootAsDataFrame(frames[0], 0)
+    schema = read_schema(root_df) if names is None else cached_schema(root_df)
+    if schema is not None:
+        return {name: schema.pandas_dtypes[name] for name in (schema.names if names is None else names)
+                if name in schema.pandas_dtypes}
+    pandas_dtypes = {}
+    for name, (col, _) in _find_columns(root_df, names).items():
+        pandas_dtype = read_pandas_dtype(col.Metadata())
+        if pandas_dtype is not None:
+            pandas_dtypes[name] = pandas_dtype
+    return pandas_dtypes
+
+
+def _row_groups(root_df: DataFrame.DataFrame, located: dict):
+    """
+        Yields (number of rows, {name: (column, dtype)}) for each row group of a frame. A frame
+        written without row groups is a single row group.
+
+        @param root_df: the flatbuffer dataframe.
+        @param located: the columns to return, as returned by _locate_columns.
+    """
+    if root_df.RowGroupsLength() == 0:
+        columns = {name: (root_df.Columns(i), dtype) for name, (i, dtype) in located.items()}
+        # use the shortest column to handle columns with diff. lengths
+        yield min((_column_length(col, dtype) for col, dtype in columns.values()), default=0), columns
+        return
+    for g in range(root_df.RowGroupsLength()):
+        row_group = root_df.RowGroups(g)
+        yield row_group.NumRows(), {name: (row_group.Columns(i), dtype) for name, (i, dtype) in located.items()}
+
+
+def _iter_row_groups(fb_buf, names=None):
+    """
+        Yields (number of rows, {name: (column, dtype)}) for every row group of every frame in fb_buf.
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe, or a DescribedBuffer.
+        @param names: names of the columns to return; None for all columns.
+    """
+    if isinstance(fb_buf, DescribedBuffer):
+        for frame_index, (frame, descriptor) in enumerate(fb_buf.frames()):
+            schema = descriptor.schema
+            located = schema.columns if names is None else {name: schema.columns[name]
+                                                            for name in names if name in schema.columns}
+            for group, num_rows in enumerate(descriptor.num_rows or [None]):
+                columns = {name: (fb_buf.column(frame_index, frame, group, name), dtype)
+                           for name, (_, dtype) in located.items()}
+                if num_rows is None:
+                    num_rows = min((_column_length(col, dtype) for col, dtype in columns.values()), default=0)
+                yield num_rows, columns
+        return
+    for frame in _frames(fb_buf):
+        root_df = DataFrame.DataFrame.GetRootAsDataFrame(frame, 0)
+        yield from _row_groups(root_df, _locate_columns(root_df, names))
+
+
+def _read_stats(col: Column.Column, dtype: int):
+    """
+        Returns the (row count, null count, min, max) stats stored in a column, or None for frames
+        written without column statistics.
+
+        @param col: the flatbuffer column.
+        @param dtype: the ValueType of the column.
+    """
+    stats = col.Stats()
+    if stats is None:
+        return None
+    row_count, null_count = stats.RowCount(), stats.NullCount()
+    if row_count == null_count:
+        return row_count, null_count, None, None
+    kind = FIXED_WIDTH_TYPES[dtype][0].kind if dtype in FIXED_WIDTH_TYPES else None
+    if kind == 'f':
+        return row_count, null_count, stats.MinFloat(), stats.MaxFloat()
+    elif kind == 'b':
+        return row_count, null_count, bool(stats.MinInt()), bool(stats.MaxInt())
+    elif dtype == ValueType.ValueType.UInt64:
+        bounds = np.array([stats.MinInt(), stats.MaxInt()], dtype=np.int64).view(np.uint64).tolist()
+        return row_count, null_count, *bounds
+    elif kind in ('i', 'u'):
+        return row_count, null_count, stats.MinInt(), stats.MaxInt()
+    return row_count, null_count, col.MinString().decode('utf-8'), col.MaxString().decode('utf-8')
+
+
+def _write_stats(col: Column.Column, dtype: int, stats: tuple) -> None:
+    """
+        Overwrites the stats of a numeric column in place, e.g. after its values were mapped.
+
+        @param col: the flatbuffer column (over a writable buffer).
+        @param dtype: the ValueType of the column.
+        @param stats: the new (row count, null count, min, max).
+    """
+    target = col.Stats()
+    row_count, null_count, min_value, max_value = stats
+    int_bounds, float_bounds = _stats_bounds(dtype, min_value, max_value)
+    COLUMN_STATS.pack_into(target._tab.Bytes, target._tab.Pos, row_count, null_count, *int_bounds, *float_bounds)
+
+
+def _may_match(stats: tuple, op: str, value) -> bool:
+    """
+        Returns False if the stats of a column chunk prove that no value in it satisfies 'op value'.
+
+        @param stats: (row count, null count, min, max) of the chunk.
+        @param op: one of the COMPARISONS operators.
+        @param value: the literal compared against.
+    """
+    _, null_count, min_value, max_value = stats
+    if min_value is None:
+        # only nulls; NaN compares unequal to everything
+        return op == '!='
+    if op == '==':
+        return min_value <= value <= max_value
+    elif op == '!=':
+        return null_count > 0 or not min_value == max_value == value
+    elif op in ('<', '<='):
+        return COMPARISONS[op](min_value, value)
+    return COMPARISONS[op](max_value, value)
+
+
+def _is_condition(predicate) -> bool:
+    """
+        Returns True if predicate is a single (column, op, value) condition.
+    """
+    return isinstance(predicate, tuple) and len(predicate) == 3 and isinstance(predicate[1], str)
+
+
+def _prepare_predicate(fb_buf, predicate) -> tuple:
+    """
+        Validates a predicate and returns it in normal form: (column, op, value) conditions, with
+        datetime/timedelta literals converted to the int64 values they are compared on, combined by
+        ('and', predicate, ...) and ('or', predicate, ...) nodes. A list of predicates (such as the
+        where clause of fb_dataframe_group_by) means all of them.
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe.
+        @param predicate: the predicate.
+    """
+    def normalize(node):
+        if isinstance(node, list):
+            return ('and', *map(normalize, node))
+        elif _is_condition(node):
+            if node[1] not in COMPARISONS:
+                raise ValueError(f"Unsupported comparison operator '{node[1]}', expected one of {list(COMPARISONS)}.")
+            return node
+        elif isinstance(node, tuple) and node and node[0] in CONNECTIVES:
+            return (node[0], *map(normalize, node[1:]))
+        raise ValueError(f"Invalid predicate {node!r}, expected a (column, op, value) condition, "
+                         f"an ('and'|'or', predicate, ...) tuple or a list of predicates.")
+
+    def convert_times(node):
+        if _is_condition(node):
+            name, op, value = node
+            return (name, op, time_value(value, pandas_dtypes[name])) if is_time_dtype(pandas_dtypes.get(name)) else node
+        return (node[0], *map(convert_times, node[1:]))
+
+    predicate = normalize(predicate)
+    pandas_dtypes = _pandas_dtypes(fb_buf, _predicate_columns(predicate))
+    return convert_times(predicate)
+
+
+def _predicate_columns(predicate: tuple) -> list:
+    """
+        Returns the names of the columns a normalized predicate refers to, without duplicates.
+
+        @param predicate: the predicate, as returned by _prepare_predicate.
+    """
+    if _is_condition(predicate):
+        return [predicate[0]]
+    return list(dict.fromkeys(itertools.chain.from_iterable(map(_predicate_columns, predicate[1:]))))
+
+
+def _predicate_may_match(columns: dict, predicate: tuple) -> bool:
+    """
+        Returns False if the column stats of a row group prove that no row in it satisfies predicate.
+
+        @param columns: dict mapping column names to (column, dtype) pairs of the row group.
+        @param predicate: the predicate, as returned by _prepare_predicate.
+    """
+    if _is_condition(predicate):
+        name, op, value = predicate
+        stats = _read_stats(*columns[name])
+        return stats is None or _may_match(stats, op, value)
+    matches = (_predicate_may_match(columns, node) for node in predicate[1:])
+    return all(matches) if predicate[0] == 'and' else any(matches)
+
+
+def _predicate_mask(columns: dict, num_rows: int, predicate: tuple, first: int = 0) -> np.ndarray:
+    """
+        Evaluates a predicate on the values of a row group from the row at first on. Returns a
+        boolean mask of the rows satisfying it.
+
+        @param columns: dict mapping column names to (column, dtype) pairs of the row group.
+        @param num_rows: number of rows in the row group.
+        @param predicate: the predicate, as returned by _prepare_predicate.
+        @param first: index of the first row to evaluate.
+    """
+    if not _is_condition(predicate):
+        conjunction = predicate[0] == 'and'
+        mask = np.full(num_rows - first, conjunction)
+        for node in predicate[1:]:
+            # stop as soon as the outcome can't change
+            if not mask.any() if conjunction else mask.all():
+                break
+            if conjunction:
+                mask &= _predicate_mask(columns, num_rows, node, first)
+            elif _predicate_may_match(columns, node):
+                # alternatives the stats rule out add no rows
+                mask |= _predicate_mask(columns, num_rows, node, first)
+        return mask
+
+    name, op, value = predicate
+    col, dtype = columns[name]
+    values = _column_values(col, dtype, num_rows, first)
+    if isinstance(values, pd.Categorical):
+        # compare each distinct value once and look the outcome up by code
+        mask = np.asarray(COMPARISONS[op](values.categories.to_numpy(), value), dtype=bool)[values.codes]
+    else:
+        mask = np.asarray(COMPARISONS[op](np.asarray(values), value), dtype=bool)
+    # null values never satisfy a condition
+    valid = _column_validity(col, num_rows, first)
+    return mask if valid is None else mask & valid
+
+
+def _select_rows(columns: dict, num_rows: int, predicate: tuple, first: int = 0):
+    """
+        Returns a boolean mask of the rows of a row group (from the row at first on) satisfying
+        predicate, or None if the column stats show that no row can.
+
+        @param columns: dict mapping column names to (column, dtype) pairs of the row group.
+        @param num_rows: number of rows in the row group.
+        @param predicate: the predicate, as returned by _prepare_predicate.
+        @param first: index of the first row to evaluate.
+    """
+    if not _predicate_may_match(columns, predicate):
+        return None
+    return _predicate_mask(columns, num_rows, predicate, first)
+
+
+def _concat_values(parts: list, dtype: int):
+    """
+        Concatenates chunks of column values; a single chunk is returned as is.
+
+        @param parts: NumPy arrays or lists of strings.
+        @param dtype: the ValueType of the column.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    if dtype in FIXED_WIDTH_TYPES:
+        return np.concatenate(parts) if parts else np.empty(0, dtype=FIXED_WIDTH_TYPES[dtype][0])
+    elif parts and all(isinstance(part, pd.Categorical) for part in parts):
+        # merge the chunk dictionaries and remap the codes instead of decoding
+        return union_categoricals(parts, sort_categories=True)
+    return list(itertools.chain.from_iterable(parts))
+
+
+def _concat_validity(parts: list, lengths: list):
+    """
+        Concatenates the validity masks of chunks of a column (None for chunks without nulls).
+        Returns None if no chunk has nulls.
+
+        @param parts: validity mask or None per chunk.
+        @param lengths: number of values per chunk.
+    """
+    if all(part is None for part in parts):
+        return None
+    return np.concatenate([np.ones(length, dtype=bool) if part is None else part
+                           for part, length in zip(parts, lengths)])
+
+
+def _read_columns(fb_bytes: bytes, names, where=None, selection: np.ndarray = None, rows: tuple = None) -> tuple:
+    """
+        Returns (values, validity): dicts mapping each requested column name to all its values and
+        to a mask of its non-null values (None if it has no nulls). For a single flatbuffer
+        numeric values are zero-copy views; row groups and the chunks of a stream are concatenated.
+
+        @param fb_bytes: bytes of the Flatbuffer Dataframe.
+        @param names: names of the columns to read.
+        @param where: optional predicate (see fb_dataframe_filter) the returned rows must satisfy;
+            row groups whose stats rule them out aren't read at all.
+        @param selection: optional sorted indices of the rows to return (see fb_dataframe_filter);
+            row groups without selected rows aren't read at all.
+        @param rows: optional (start, stop) range of the rows to return; row groups outside it
+            aren't read at all.
+    """
+    predicate = _prepare_predicate(fb_bytes, where) if where else None
+    predicate_names = _predicate_columns(predicate) if predicate else []
+    if selection is not None:
+        selection = np.asarray(selection, dtype=np.int64)
+    parts, valid_parts, lengths, dtypes = {}, {}, {}, {}
+    end = 0
+    for num_rows, columns in _iter_row_groups(fb_bytes, list(names) + predicate_names):
+        for name, (_, dtype) in columns.items():
+            parts.setdefault(name, [])
+            valid_parts.setdefault(name, [])
+            lengths.setdefault(name, [])
+            dtypes[name] = dtype
+        missing = [name for name in predicate_names if name not in columns]
+        if missing:
+            raise KeyError(f"Columns not found in dataframe: {missing}")
+
+        start, end = end, end + num_rows
+        # read rows [first, last) of the row group
+        first, last = (0, num_rows) if rows is None else (max(rows[0] - start, 0), min(rows[1] - start, num_rows))
+        if first >= last:
+            continue
+        mask = None
+        if selection is not None:
+            low, high = np.searchsorted(selection, [start + first, start + last])
+            if low == high:
+                continue
+            mask = np.zeros(last - first, dtype=bool)
+            mask[selection[low:high] - start - first] = True
+        if predicate is not None:
+            selected = _select_rows(columns, last, predicate, first)
+            if selected is None:
+                continue
+            mask = selected if mask is None else mask & selected
+        for name, (col, dtype) in columns.items():
+            values = _column_values(col, dtype, last, first)
+            valid = _column_validity(col, last, first)
+            if mask is not None:
+                values = list(itertools.compress(values, mask)) if isinstance(values, list) else values[mask]
+                valid = None if valid is None else valid[mask]
+            parts[name].append(values)
+            valid_parts[name].append(valid)
+            lengths[name].append(len(values))
+
+    return ({name: _concat_values(parts[name], dtypes[name]) for name in parts},
+            {name: _concat_validity(valid_parts[name], lengths[name]) for name in parts})
+
+
+def fb_dataframe_column_stats(fb_bytes: bytes, col_name: str) -> dict:
+    """
+        Returns the number of non-null values ('count'), the number of nulls ('null_count') and the
+        'min' and 'max' of a column from the column statistics, without reading its values (frames
+        written before column statistics existed are scanned instead). min/max are None if the
+        column has no non-null values.
+
+        @param fb_bytes: bytes of the Flatbuffer Dataframe.
+        @param col_name: name of the column.
+    """
+    stats = []
+    for frame in _frames(fb_bytes):
+        root_df = DataFrame.DataFrame.GetRootAsDataFrame(frame, 0)
+        columns = _find_columns(root_df, [col_name])
+        if col_name not in columns:
+            raise KeyError(f"Column not found in dataframe: {col_name}")
+        col, dtype = columns[col_name]
+        frame_stats = _read_stats(col, dtype)
+        if frame_stats is None:
+            values = _column_values(col, dtype)
+            frame_stats = _values_stats(values, _column_validity(col, len(values)))
+        stats.append(frame_stats)
+
+    row_count, null_count, min_value, max_value = _merge_stats(stats)
+    pandas_dtype = _pandas_dtypes(fb_bytes, [col_name]).get(col_name)
+    if is_time_dtype(pandas_dtype) and min_value is not None:
+        min_value, max_value = time_array(np.array([min_value, max_value], dtype=np.int64), pandas_dtype)
+    return {'count': row_count - null_count, 'null_count': null_count, 'min': min_value, 'max': max_value}
+
+
+def fb_dataframe_filter(fb_buf, predicate, rows: tuple = None) -> np.ndarray:
+    """
+        Evaluates a predicate on the columns of the flatbuffer dataframe, in place, and returns the
+        selection vector: the sorted indices of the rows satisfying it, to pass as the selection of
+        fb_dataframe_head, fb_dataframe_select or fb_dataframe_group_by. Row groups whose column
+        stats rule the predicate out aren't read. Null values never satisfy a condition.
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe.
+        @param predicate: a (column name, op, value) condition with op one of the COMPARISONS
+            operators, e.g. ("int_col", ">", 3); ('and', predicate, ...) or ('or', predicate, ...)
+            combining predicates; or a list of predicates that must all hold.
+        @param rows: optional (start, stop) range of the rows to evaluate the predicate on.
+    """
+    predicate = _prepare_predicate(fb_buf, predicate)
+    names = _predicate_columns(predicate)
+    selected, end = [], 0
+    for num_rows, columns in _iter_row_groups(fb_buf, names):
+        missing = [name for name in names if name not in columns]
+        if missing:
+            raise KeyError(f"Columns not found in dataframe: {missing}")
+        start, end = end, end + num_rows
+        first, last = (0, num_rows) if rows is None else (max(rows[0] - start, 0), min(rows[1] - start, num_rows))
+        if first >= last:
+            continue
+        mask = _select_rows(columns, last, predicate, first)
+        if mask is not None:
+            selected.append(np.flatnonzero(mask) + start + first)
+    return np.concatenate(selected) if selected else np.empty(0, dtype=np.int64)
+
+
+def fb_dataframe_select(fb_buf, columns: list = None, where=None, selection: np.ndarray = None) -> pd.DataFrame:
+    """
+        Returns the requested columns of the rows satisfying where and/or picked by selection as a
+        Pandas Dataframe, reading only those columns (and, with row groups, only the groups holding
+        such rows).
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe.
+        @param columns: names of the columns to return, in order; None for all columns.
+        @param where: optional predicate the rows must satisfy (see fb_dataframe_filter).
+        @param selection: optional selection vector as returned by fb_dataframe_filter.
+    """
+    if columns is None:
+        columns = fb_dataframe_schema(fb_buf).names
+    data, valid = _read_columns(fb_buf, columns, where, selection)
+    missing = [name for name in columns if name not in data]
+    if missing:
+        raise KeyError(f"Columns not found in dataframe: {missing}")
+
+    pandas_dtypes = _pandas_dtypes(fb_buf, columns)
+    result = {}
+    for name in columns:
+        values = data[name]
+        # copy so the result doesn't pin the buffer
+        if isinstance(values, pd.Categorical):
+            values = np.asarray(values, dtype=object)
+        elif isinstance(values, np.ndarray) and where is None and selection is None:
+            values = values.copy()
+        elif isinstance(values, list) and not values:
+            # no rows selected; keep the string column's object dtype
+            values = np.empty(0, dtype=object)
+        result[name] = to_pandas(values, valid[name], pandas_dtypes.get(name))
+    return pd.DataFrame(result, columns=columns)
+
+
+def fb_dataframe_schema(fb_buf) -> FbSchema:
+    """
+        Returns the schema of the flatbuffer dataframe: its column names in order, their ValueTypes
+        and pandas dtypes. Schemas are cached by schema id, so this is cheap after the first call
+        for frames with the same columns.
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe.
+    """
+    if isinstance(fb_buf, DescribedBuffer) and fb_buf.descriptors:
+        return fb_buf.descriptors[0].schema
+    frames = _frames(fb_buf)
+    if not frames:
+        return FbSchema()
+    return read_schema(DataFrame.DataFrame.GetRootAsDataFrame(frames[0], 0))
+
+
+def fb_dataframe_head(fb_bytes: bytes, rows: int = 5, selection: np.ndarray = None,
+                      columns: list = None) -> pd.DataFrame:
     """
     Returns the first n rows of the Flatbuffer Dataframe as a Pandas Dataframe
     similar to df.head(). If there are less than n rows, return the entire Dataframe.
@@ -95,43 +1170,153 @@ def fb_dataframe_head(fb_bytes: bytes, rows: int = 5) -> pd.DataFrame:
 
     @param fb_bytes: bytes of the Flatbuffer Dataframe.
     @param rows: number of rows to return.
+    @param selection: optional selection vector as returned by fb_dataframe_filter; the first n
+        selected rows are returned.
+    @param columns: optional names of the columns to return (projection); only those are read.
+    """
+    if selection is not None:
+        return fb_dataframe_select(fb_bytes, columns, selection=np.asarray(selection)[:max(rows, 0)])
+    projection = columns
+    names, parts, valid_parts, lengths, dtypes = None, {}, {}, [], {}
+    for num_rows, columns in _iter_row_groups(fb_bytes, projection):
+        if names is None:
+            names = list(columns)
+            missing = [name for name in projection or [] if name not in columns]
+            if missing:
+                raise KeyError(f"Columns not found in dataframe: {missing}")
+        rows_to_fetch = min(rows, num_rows)
+        # slice each column; numeric slices are copied so the result doesn't pin the buffer
+        for name, (col, dtype) in columns.items():
+            values = _column_values(col, dtype, rows_to_fetch)
+            if isinstance(values, pd.Categorical):
+                values = np.asarray(values, dtype=object)
+            elif isinstance(values, np.ndarray):
+                values = values.copy()
+            parts.setdefault(name, []).append(values)
+            valid_parts.setdefault(name, []).append(_column_validity(col, rows_to_fetch))
+            dtypes[name] = dtype
+        lengths.append(rows_to_fetch)
+        rows -= rows_to_fetch
+        if rows <= 0:
+            break
+
+    if names is None:
+        return pd.DataFrame()
+    pandas_dtypes = _pandas_dtypes(fb_bytes, projection)
+    return pd.DataFrame({name: to_pandas(_concat_values(parts[name], dtypes[name]),
+                                         _concat_validity(valid_parts[name], lengths), pandas_dtypes.get(name))
+                         for name in names}, columns=names)
+
+
+def _read_runs(fb_bytes: bytes, name: str):
+    """
+        Returns (run values, run lengths, validity) of a column if every chunk of it is run-length
+        encoded, else None. validity is a mask of the non-null rows (None if there are no nulls).
+
+        @param fb_bytes: bytes of the Flatbuffer Dataframe.
+        @param name: name of the column.
+    """
+    values, lengths, valid_parts, row_counts = [], [], [], []
+    for num_rows, columns in _iter_row_groups(fb_bytes, [name]):
+        if name not in columns:
+            return None
+        col, dtype = columns[name]
+        if dtype not in FIXED_WIDTH_TYPES or col.Encoding() != Encoding.RunLength:
+            return None
+        values.append(_encoded_values(col))
+        lengths.append(run_lengths(_run_ends(col)))
+        valid_parts.append(_column_validity(col, num_rows))
+        row_counts.append(num_rows)
+    if not values:
+        return None
+    return _concat_values(values, dtype), np.concatenate(lengths), _concat_validity(valid_parts, row_counts)
+
+
+def fb_dataframe_group_by(fb_bytes: bytes, grouping_col_name, aggregates, where=None,
+                          selection: np.ndarray = None) -> pd.DataFrame:
+    """
+        Applies GROUP BY on the flatbuffer dataframe grouping by grouping_col_name and computing
+        every requested aggregate in one pass over the group ids, which are computed once. Returns
+        the same result as df.groupby(grouping_col_name).agg(aggregates) as a Pandas dataframe
+        (float sums and means can differ from pandas' in the last bits, see fb_groupby._group_sum).
+
+        @param fb_bytes: bytes of the Flatbuffer Dataframe.
+        @param grouping_col_name: column to group by, or a list of columns (composite keys, e.g.
+            ["int_col", "string_col"]) to group by their combinations.
+        @param aggregates: dict mapping column names to one of 'sum', 'count', 'min', 'max', 'mean'
+            or a list of them, or a list of (column name, aggregate) pairs such as
+            [("float_col", "sum"), ("int_col", "max")] (the result columns are then labelled by the pairs).
+        @param where: optional predicate restricting the rows that are grouped, e.g. a list of
+            (column name, op, value) conditions such as [("int_col", ">", 3)] (see fb_dataframe_filter).
+        @param selection: optional selection vector as returned by fb_dataframe_filter restricting
+            the rows that are grouped.
     """
-    root_df = DataFrame.DataFrame.GetRootAsDataFrame(fb_bytes, 0)
-    column_count = root_df.ColumnsLength()
-
-    # get column metadata and reverse order of columns to match the original df
-    column_metadata = [(root_df.Columns(i).Metadata().Name().decode('utf-8'), root_df.Columns(i).Metadata().Dtype(), i)
-                       for i in range(column_count)][::-1]
-
-    # dict to hold colunm data
-    data = {meta[0]: [] for meta in column_metadata}
-
-    # get min rows across all columns to handle columns with diff. lengths
-    rows_available = float('inf')
-    for name, dtype, index in column_metadata:
-        col = root_df.Columns(index)
-        if dtype == ValueType.ValueType.Int:
-            rows_available = min(rows_available, col.IntValuesLength())
-        elif dtype == ValueType.ValueType.Float:
-            rows_available = min(rows_available, col.FloatValuesLength())
-        elif dtype == ValueType.ValueType.String:
-            rows_available = min(rows_available, col.StringValuesLength())
-
-    # get data for each column up to the min of available and requested rows
-    rows_to_fetch = min(rows, rows_available)
-    for row_idx in range(rows_to_fetch):
-        for name, dtype, index in column_metadata:
-            col = root_df.Columns(index)
-            if dtype == ValueType.ValueType.Int:
-                data[name].append(col.IntValues(row_idx))
-            elif dtype == ValueType.ValueType.Float:
-                data[name].append(col.FloatValues(row_idx))
-            elif dtype == ValueType.ValueType.String:
-                data[name].append(col.StringValues(row_idx).decode('utf-8'))
-
-    # make pd df with reversed column order
-    df_result = pd.DataFrame(data, columns=[meta[0] for meta in column_metadata])
-    return df_result
+    key_names = _key_names(grouping_col_name)
+    grouping_col_name = key_names[0] if len(key_names) == 1 else key_names
+    # a run-length encoded grouping column is grouped run by run without expanding it
+    runs = None
+    if not isinstance(grouping_col_name, list) and not where and selection is None:
+        runs = _read_runs(fb_bytes, grouping_col_name)
+    names = list(dict.fromkeys(([] if runs else key_names) + aggregated_columns(aggregates)))
+    data, valid = _read_columns(fb_bytes, names, where, selection)
+    missing = [name for name in names if name not in data]
+    if missing:
+        raise KeyError(f"Columns not found in dataframe: {missing}")
+    if runs:
+        keys, key_run_lengths, valid[grouping_col_name] = runs
+    elif isinstance(grouping_col_name, list):
+        keys, key_run_lengths = [data[name] for name in key_names], None
+    else:
+        keys, key_run_lengths = data[grouping_col_name], None
+
+    return group_by_aggregate(keys, grouping_col_name, data, aggregates, valid,
+                              _pandas_dtypes(fb_bytes, key_names + aggregated_columns(aggregates)), key_run_lengths)
+
+
+def _key_names(grouping_col_name) -> list:
+    """
+        Returns the names of the grouping columns of a group by on one column or a list of them.
+    """
+    if not isinstance(grouping_col_name, (list, tuple)):
+        return [grouping_col_name]
+    if not grouping_col_name:
+        raise ValueError("At least one grouping column is required.")
+    return list(grouping_col_name)
+
+
+def fb_dataframe_group_by_partial(fb_bytes: bytes, grouping_col_name, aggregates, where=None,
+                                  selection: np.ndarray = None, rows: tuple = None) -> tuple:
+    """
+        Computes the partial aggregates of fb_dataframe_group_by over a range of rows, to combine
+        with those of the other ranges with fb_groupby.merge_aggregates (see partial_aggregate).
+
+        @param fb_bytes: bytes of the Flatbuffer Dataframe.
+        @param grouping_col_name: column to group by, or a list of them.
+        @param aggregates: dict mapping column names to an aggregate name or a list of them, or a
+            list of (column name, aggregate) pairs.
+        @param where: optional predicate restricting the rows that are grouped.
+        @param selection: optional selection vector restricting the rows that are grouped.
+        @param rows: optional (start, stop) range of the rows to group.
+    """
+    key_names = _key_names(grouping_col_name)
+    names = list(dict.fromkeys(key_names + aggregated_columns(aggregates)))
+    data, valid = _read_columns(fb_bytes, names, where, selection, rows)
+    missing = [name for name in names if name not in data]
+    if missing:
+        raise KeyError(f"Columns not found in dataframe: {missing}")
+    if len(key_names) > 1:
+        return partial_aggregate([data[name] for name in key_names], key_names, data, aggregates, valid)
+    return partial_aggregate(data[key_names[0]], key_names[0], data, aggregates, valid)
+
+
+def fb_dataframe_row_counts(fb_buf) -> list:
+    """
+        Returns the number of rows of each row group of the flatbuffer dataframe, in row order (a
+        frame without row groups counts as one).
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe.
+    """
+    return [num_rows for num_rows, _ in _iter_row_groups(fb_buf)]
 
 
 def fb_dataframe_group_by_sum(fb_bytes: bytes, grouping_col_name: str, sum_col_name: str) -> pd.DataFrame:
@@ -143,38 +1328,104 @@ def fb_dataframe_group_by_sum(fb_bytes: bytes, grouping_col_name: str, sum_col_n
         @param grouping_col_name: column to group by.
         @param sum_col_name: column to sum.
     """
+    return fb_dataframe_group_by(fb_bytes, grouping_col_name, {sum_col_name: 'sum'})
 
-    df = DataFrame.DataFrame.GetRootAsDataFrame(fb_bytes, 0)
-    data = {}
 
-    for i in range(df.ColumnsLength()):
-        col = df.Columns(i)
-        col_name = col.Metadata().Name().decode('utf-8')
-        if col_name in [grouping_col_name, sum_col_name]:
-            if col.Metadata().Dtype() == ValueType.ValueType().Int:
-                data[col_name] = [col.IntValues(j) for j in range(col.IntValuesLength())]
-            elif col.Metadata().Dtype() == ValueType.ValueType().Float:
-                data[col_name] = [col.FloatValues(j) for j in range(col.FloatValuesLength())]
-            elif col.Metadata().Dtype() == ValueType.ValueType().String:
-                data[col_name] = [col.StringValues(j).decode('utf-8') for j in range(col.StringValuesLength())]
+def _mapped_values(values: np.ndarray, map_func: types.FunctionType, vectorized: bool = False) -> np.ndarray:
+    """
+        Returns map_func applied to every element of values, as an array of the same dtype. A
+        vectorized map_func (NumPy ufuncs always are) is called once on the whole array and must
+        return an array of the same shape; any other map_func is called once per element,
+        MAP_CHUNK_SIZE values at a time. Exceptions raised by map_func are not caught.
 
-    # make df from dict
-    df = pd.DataFrame(data)
-    result = df.groupby(grouping_col_name).sum()
+        @param values: NumPy view over a numeric column.
+        @param map_func: function to apply to elements in the column.
+        @param vectorized: map_func takes and returns whole arrays (e.g. lambda x: x * 2).
+    """
+    if vectorized or isinstance(map_func, np.ufunc):
+        with np.errstate(all='ignore'):
+            mapped = np.asarray(map_func(values))
+        if mapped.shape != values.shape:
+            raise ValueError(f"A vectorized map_func must return an array of shape {values.shape}, "
+                             f"not {mapped.shape}.")
+        return mapped.astype(values.dtype, copy=False)
 
-    return result
+    mapped = np.empty_like(values)
+    for start in range(0, len(values), MAP_CHUNK_SIZE):
+        chunk = values[start:start + MAP_CHUNK_SIZE].tolist()
+        mapped[start:start + len(chunk)] = np.array([map_func(value) for value in chunk]).astype(values.dtype, copy=False)
+    return mapped
 
 
-def fb_dataframe_map_numeric_column(fb_buf: memoryview, col_name: str, map_func: types.FunctionType) -> None:
+def fb_dataframe_map_numeric_column(fb_buf: memoryview, col_name: str, map_func: types.FunctionType,
+                                    vectorized: bool = False) -> None:
     """
         Apply map_func to elements in a numeric column in the Flatbuffer Dataframe in place.
         This function shouldn't do anything if col_name doesn't exist or the specified
-        column is a string column.
+        column is a string column. The whole column is mapped before any of it is written, so if
+        map_func raises, the column is left unchanged. Frame-of-reference and delta encoded chunks
+        are decoded, mapped and encoded again in place; if the mapped values of one of them no
+        longer fit its encoded vector, TypeError is raised and nothing is mapped.
 
         @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe.
         @param col_name: name of the numeric column to apply map_func to.
         @param map_func: function to apply to elements in the numeric column.
+        @param vectorized: map_func takes and returns whole arrays (e.g. lambda x: x * 2), so it is
+            called once per column chunk instead of once per element. NumPy ufuncs always are.
     """
-    # YOUR CODE HERE...
-    pass
-    
\ No newline at end of file
+    frames = []
+    for frame in _frames(fb_buf):
+        root_df = DataFrame.DataFrame.GetRootAsDataFrame(frame, 0)
+        located = _locate_columns(root_df, [col_name])
+        if col_name not in located:
+            return
+        index, dtype = located[col_name]
+        if dtype not in FIXED_WIDTH_TYPES or FIXED_WIDTH_TYPES[dtype][0].kind not in 'iuf':
+            return
+
+        chunks = [columns[col_name][0] for _, columns in _row_groups(root_df, located)]
+        frames.append((root_df, index, dtype, chunks))
+
+    # map the chunks of every frame before writing any, so a column is never left half mapped
+    views, mapped, references = [], [], []
+    for _, _, dtype, chunks in frames:
+        for col in chunks:
+            # The view aliases the column's values vector (the run values of a run-length encoded
+            # column, each mapped once per run, or the offsets or deltas of the other encodings),
+            # so writing to it updates fb_buf.
+            values = _column_values(col, dtype) if col.Encoding() == Encoding.Plain else _encoded_values(col)
+            if not values.flags.writeable:
+                raise TypeError("fb_buf must be a writable buffer (e.g. bytearray or shared memory memoryview).")
+            views.append(values)
+            if col.Encoding() in (Encoding.Plain, Encoding.RunLength):
+                mapped.append(_mapped_values(values, map_func, vectorized))
+                continue
+            # a reference left out of the table (it was 0) can't be written, so it stays 0
+            reference_offset = col._tab.Offset(REFERENCE_OFFSET)
+            encoded = encode_as(col.Encoding(), _mapped_values(_column_values(col, dtype), map_func, vectorized),
+                                values.dtype, None if reference_offset else 0)
+            if encoded is None:
+                raise TypeError(f"Column '{col_name}' can't be mapped in place: the mapped values of one of its "
+                                f"frame-of-reference or delta encoded chunks don't fit in its {values.dtype} vector.")
+            reference, encoded_values = encoded
+            mapped.append(encoded_values)
+            if reference_offset:
+                references.append((col._tab.Bytes, col._tab.Pos + reference_offset, reference))
+    for values, new_values in zip(views, mapped):
+        values[:] = new_values
+    for buf, position, reference in references:
+        REFERENCE.pack_into(buf, position, reference)
+    if references and isinstance(fb_buf, DescribedBuffer):
+        # the descriptors hold the old references
+        fb_buf.forget_column(col_name)
+
+    for root_df, index, dtype, chunks in frames:
+        # keep the stats in step with the new values
+        chunk_stats = []
+        for col in chunks:
+            if col.Stats() is not None:
+                values = _column_values(col, dtype)
+                chunk_stats.append(_values_stats(values, _column_validity(col, len(values))))
+                _write_stats(col, dtype, chunk_stats[-1])
+        if root_df.RowGroupsLength() and root_df.Columns(index).Stats() is not None:
+            _write_stats(root_df.Columns(index), dtype, _merge_stats(chunk_stats))
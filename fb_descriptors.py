@@ -0,0 +1,232 @@
+"""
+Column descriptors: the vtable lookups of a frame's columns resolved once into plain offsets, so
+repeated queries on the same frame go straight to the vectors. Descriptors hold positions relative
+to their frame, never the buffer itself, so they can be cached (e.g. by FbSharedMemory per catalog
+version) without pinning shared memory and stay valid when the frame is moved.
+"""
+
+import numpy as np
+
+from Project.DataFrame import Column, ColumnStats, DataFrame
+
+def vtable_offset(add_field) -> int:
+    """
+        Returns the vtable offset of a table field, read off its generated adder (e.g.
+        Column.ColumnAddIntValues), which stores field i of the table in vtable slot i, at offset
+        4 + 2 * i. Deriving the offsets from the generated code keeps them right when the schema changes.
+
+        @param add_field: the generated <Table>Add<Field> function.
+    """
+    slots = []
+
+    class SlotRecorder:
+        # stands in for the builder: every Prepend...Slot(slot, value, default) call records its slot
+        def __getattr__(self, name):
+            return lambda slot, *args: slots.append(slot)
+
+    add_field(SlotRecorder(), 0)
+    return 4 + 2 * slots[0]
+
+
+# Vector fields of the Column table by generated accessor name: (vtable offset, NumPy dtype of the
+# elements, None for vectors of strings).
+COLUMN_VECTORS = {field: (vtable_offset(getattr(Column, f'ColumnAdd{field}')), dtype) for field, dtype in [
+    ('IntValues', np.dtype('<i8')),
+    ('FloatValues', np.dtype('<f8')),
+    ('StringValues', None),
+    ('Dictionary', None),
+    ('Codes', np.dtype('<i4')),
+    ('StringData', np.dtype(np.uint8)),
+    ('StringOffsets', np.dtype('<i4')),
+    ('LargeStringOffsets', np.dtype('<i8')),
+    ('BoolValues', np.dtype(np.bool_)),
+    ('Int8Values', np.dtype(np.int8)),
+    ('Int16Values', np.dtype('<i2')),
+    ('Int32Values', np.dtype('<i4')),
+    ('Uint8Values', np.dtype(np.uint8)),
+    ('Uint16Values', np.dtype('<u2')),
+    ('Uint32Values', np.dtype('<u4')),
+    ('Uint64Values', np.dtype('<u8')),
+    ('Float32Values', np.dtype('<f4')),
+    ('Validity', np.dtype(np.uint8)),
+    ('RunEnds', np.dtype('<i8')),
+]}
+
+
+class ColumnDescriptor:
+    """
+        The resolved fields of one column (or column chunk of a row group): the position of the
+        Column table, (start, length) of each vector present, the encoding fields and the position
+        of the stats struct.
+    """
+    __slots__ = ('position', 'vectors', 'encoding', 'encoded_type', 'reference', 'stats_position')
+
+    def __init__(self, col: Column.Column):
+        tab = col._tab
+        self.position = tab.Pos
+        self.vectors = {}
+        for field, (slot, _) in COLUMN_VECTORS.items():
+            offset = tab.Offset(slot)
+            if offset:
+                self.vectors[field] = (tab.Vector(offset), tab.VectorLen(offset))
+        self.encoding, self.encoded_type, self.reference = col.Encoding(), col.EncodedType(), col.Reference()
+        stats = col.Stats()
+        self.stats_position = None if stats is None else stats._tab.Pos
+
+
+class DescribedColumn:
+    """
+        A column served from its ColumnDescriptor with the same accessors as the generated Column:
+        <Field>AsNumpy(), <Field>Length() and <Field>IsNone() of the COLUMN_VECTORS, Encoding(),
+        EncodedType(), Reference() and Stats() skip the vtable; anything else (e.g. Dictionary(j))
+        is delegated to a Column over the same buffer.
+    """
+    __slots__ = ('_buf', '_descriptor', '_column')
+
+    def __init__(self, buf, descriptor: ColumnDescriptor):
+        self._buf = buf
+        self._descriptor = descriptor
+        self._column = None
+
+    def Encoding(self) -> int:
+        return self._descriptor.encoding
+
+    def EncodedType(self) -> int:
+        return self._descriptor.encoded_type
+
+    def Reference(self) -> int:
+        return self._descriptor.reference
+
+    def Stats(self):
+        if self._descriptor.stats_position is None:
+            return None
+        stats = ColumnStats.ColumnStats()
+        stats.Init(self._buf, self._descriptor.stats_position)
+        return stats
+
+    def __getattr__(self, name: str):
+        if self._column is None:
+            self._column = Column.Column()
+            self._column.Init(self._buf, self._descriptor.position)
+        return getattr(self._column, name)
+
+
+def _vector_accessors(field: str, dtype: np.dtype) -> tuple:
+    """
+        Returns the <field>AsNumpy, <field>Length and <field>IsNone methods of DescribedColumn.
+    """
+    def as_numpy(self):
+        vector = self._descriptor.vectors.get(field)
+        if vector is None:
+            # what the generated accessor returns for a missing vector
+            return 0
+        start, length = vector
+        return np.frombuffer(self._buf, dtype=dtype, count=length, offset=start)
+
+    def length(self):
+        return self._descriptor.vectors.get(field, (0, 0))[1]
+
+    def is_none(self):
+        return field not in self._descriptor.vectors
+
+    return as_numpy, length, is_none
+
+
+for _field, (_, _dtype) in COLUMN_VECTORS.items():
+    _as_numpy, _length, _is_none = _vector_accessors(_field, _dtype)
+    if _dtype is not None:
+        setattr(DescribedColumn, f'{_field}AsNumpy', _as_numpy)
+    setattr(DescribedColumn, f'{_field}Length', _length)
+    setattr(DescribedColumn, f'{_field}IsNone', _is_none)
+
+
+class FrameDescriptor:
+    """
+        The layout of one flatbuffer frame: where it starts in its buffer and its length, its schema
+        (FbSchema), the number of rows of each row group (None for a frame without row groups) and,
+        per row group (one for frames without row groups), the ColumnDescriptors resolved so far by
+        column name. Columns are resolved the first time they are read.
+    """
+    __slots__ = ('start', 'length', 'schema', 'num_rows', 'columns')
+
+    def __init__(self, start: int, length: int, schema, num_rows: list = None):
+        self.start = start
+        self.length = length
+        self.schema = schema
+        self.num_rows = num_rows
+        self.columns = [{} for _ in range(len(num_rows) if num_rows is not None else 1)]
+
+
+class DescribedBuffer:
+    """
+        A flatbuffer dataframe buffer together with the FrameDescriptors of its frames. The
+        fb_dataframe functions accept it anywhere they accept the buffer and read columns through
+        the descriptors. Build one with fb_dataframe.fb_dataframe_describe.
+
+        With staged, the descriptors of columns resolved while reading are kept aside until commit(),
+        so descriptors shared with other readers only get columns resolved from a buffer known to
+        have been consistent (e.g. a shared memory read validated by its seqlock).
+    """
+    __slots__ = ('buf', 'descriptors', 'staged', '_roots')
+
+    def __init__(self, buf, descriptors: list, staged: bool = False):
+        self.buf = buf
+        self.descriptors = descriptors
+        self.staged = {} if staged else None
+        self._roots = {}
+
+    def frames(self) -> list:
+        """
+            Returns (frame buffer, FrameDescriptor) for each frame.
+        """
+        view = memoryview(self.buf)
+        return [(view[descriptor.start:descriptor.start + descriptor.length], descriptor)
+                for descriptor in self.descriptors]
+
+    def column(self, frame_index: int, frame, group: int, name: str) -> DescribedColumn:
+        """
+            Returns a column of a row group of a frame, resolving its descriptor on first use.
+
+            @param frame_index: index of the frame.
+            @param frame: the buffer of the frame, as returned by frames().
+            @param group: index of the row group (0 for frames without row groups).
+            @param name: name of the column.
+        """
+        descriptor = self.descriptors[frame_index]
+        column = descriptor.columns[group].get(name)
+        if column is None and self.staged is not None:
+            column = self.staged.get((frame_index, group, name))
+        if column is None:
+            if frame_index not in self._roots:
+                self._roots[frame_index] = DataFrame.DataFrame.GetRootAsDataFrame(frame, 0)
+            root_df = self._roots[frame_index]
+            position, _ = descriptor.schema.columns[name]
+            column = ColumnDescriptor(root_df.Columns(position) if descriptor.num_rows is None
+                                      else root_df.RowGroups(group).Columns(position))
+            if self.staged is None:
+                descriptor.columns[group][name] = column
+            else:
+                self.staged[(frame_index, group, name)] = column
+        return DescribedColumn(frame, column)
+
+    def forget_column(self, name: str) -> None:
+        """
+            Drops the descriptors resolved for a column, e.g. after its encoding fields were rewritten.
+
+            @param name: name of the column.
+        """
+        for descriptor in self.descriptors:
+            for columns in descriptor.columns:
+                columns.pop(name, None)
+        if self.staged:
+            for key in [key for key in self.staged if key[2] == name]:
+                del self.staged[key]
+
+    def commit(self) -> None:
+        """
+            Adds the staged column descriptors to the FrameDescriptors.
+        """
+        if self.staged:
+            for (frame_index, group, name), column in self.staged.items():
+                self.descriptors[frame_index].columns[group][name] = column
+            self.staged.clear()
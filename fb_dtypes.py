@@ -0,0 +1,143 @@
+"""
+How pandas column dtypes are stored in the flatbuffer columns and restored on read. Every column is
+stored as one of the ValueTypes; Metadata.pandas_dtype records the pandas dtype to restore when it
+isn't the default NumPy dtype of that ValueType (object for String).
+"""
+
+import numpy as np
+import pandas as pd
+
+from Project.DataFrame import ValueType
+from Project.DataFrame.DataType import DataType
+
+# NumPy dtype of the values of each fixed-width ValueType and the name of its Column vector field.
+# DataType uses the same numbering, so the table also applies to the DataType of a column.
+FIXED_WIDTH_TYPES = {
+    ValueType.ValueType.Int: (np.dtype(np.int64), 'IntValues'),
+    ValueType.ValueType.Float: (np.dtype(np.float64), 'FloatValues'),
+    ValueType.ValueType.Bool: (np.dtype(np.bool_), 'BoolValues'),
+    ValueType.ValueType.Int8: (np.dtype(np.int8), 'Int8Values'),
+    ValueType.ValueType.Int16: (np.dtype(np.int16), 'Int16Values'),
+    ValueType.ValueType.Int32: (np.dtype(np.int32), 'Int32Values'),
+    ValueType.ValueType.UInt8: (np.dtype(np.uint8), 'Uint8Values'),
+    ValueType.ValueType.UInt16: (np.dtype(np.uint16), 'Uint16Values'),
+    ValueType.ValueType.UInt32: (np.dtype(np.uint32), 'Uint32Values'),
+    ValueType.ValueType.UInt64: (np.dtype(np.uint64), 'Uint64Values'),
+    ValueType.ValueType.Float32: (np.dtype(np.float32), 'Float32Values'),
+}
+
+# DataType of each NumPy dtype stored natively.
+NUMPY_DATA_TYPES = {np_dtype: dtype for dtype, (np_dtype, _) in FIXED_WIDTH_TYPES.items()}
+
+# pandas nullable dtypes, stored as the values of their DataType plus a validity bitmap.
+NULLABLE_DTYPES = {
+    **{name: NUMPY_DATA_TYPES[np.dtype(name.lower())] for name in
+       ['Int8', 'Int16', 'Int32', 'Int64', 'UInt8', 'UInt16', 'UInt32', 'UInt64', 'Float32', 'Float64']},
+    'string': DataType.String,
+    'boolean': DataType.Bool,
+}
+
+# Zero-copy constructors of the pandas masked arrays, given (values, null mask), by NumPy dtype kind.
+_MASKED_ARRAYS = {
+    'i': pd.arrays.IntegerArray,
+    'u': pd.arrays.IntegerArray,
+    'f': pd.arrays.FloatingArray,
+    'b': pd.arrays.BooleanArray,
+}
+
+
+def column_dtype(col_data: pd.Series) -> tuple:
+    """
+        Returns (DataType, pandas dtype) for a pandas column: the DataType its values are serialized
+        as and the pandas dtype to restore on read (None for the default one, else its name or, for
+        categoricals, the pd.CategoricalDtype). Datetimes and timedeltas are stored as int64 counts
+        of their unit (UTC for tz-aware datetimes); categoricals as dictionary-encoded strings.
+
+        @param col_data: the pandas column.
+    """
+    dtype = col_data.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        if dtype.categories.inferred_type not in ('string', 'empty'):
+            raise TypeError(f"Unsupported categories dtype {dtype.categories.dtype} for column '{col_data.name}', "
+                            f"only string categories are supported.")
+        return DataType.String, dtype
+    elif dtype.kind in 'mM':
+        return DataType.Int64, str(dtype)
+    elif str(dtype) in NULLABLE_DTYPES:
+        return NULLABLE_DTYPES[str(dtype)], str(dtype)
+    elif dtype == object:
+        return DataType.String, None
+    elif dtype in NUMPY_DATA_TYPES:
+        return NUMPY_DATA_TYPES[dtype], None
+    raise TypeError(f"Unsupported dtype {dtype} for column '{col_data.name}'.")
+
+
+def is_time_dtype(pandas_dtype) -> bool:
+    """
+        Returns True if pandas_dtype names a datetime64 or timedelta64 dtype (stored as int64).
+
+        @param pandas_dtype: a pandas dtype as returned by column_dtype, or None.
+    """
+    return isinstance(pandas_dtype, str) and pandas_dtype.startswith(('datetime64', 'timedelta64'))
+
+
+def time_array(values: np.ndarray, pandas_dtype: str):
+    """
+        Returns int64 counts of the unit of a datetime64/timedelta64 pandas dtype as a pandas array of
+        that dtype.
+
+        @param values: the int64 values.
+        @param pandas_dtype: the name of the dtype, e.g. 'datetime64[ns]' or 'datetime64[ns, UTC]'.
+    """
+    dtype = pd.api.types.pandas_dtype(pandas_dtype)
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return pd.array(values.view(f'M8[{dtype.unit}]')).tz_localize('UTC').tz_convert(dtype.tz)
+    return pd.array(values.view(dtype))
+
+
+def time_values(col_data: pd.Series) -> np.ndarray:
+    """
+        Returns a datetime64/timedelta64 column as int64 counts of its unit (NaT as the minimum int64).
+
+        @param col_data: the pandas column.
+    """
+    return np.asarray(col_data.array.asi8)
+
+
+def time_value(value, pandas_dtype: str) -> int:
+    """
+        Returns a datetime/timedelta literal (e.g. a pd.Timestamp or a string) as the int64 count
+        stored for it in a column of a datetime64/timedelta64 pandas dtype.
+
+        @param value: the literal.
+        @param pandas_dtype: the name of the dtype of the column.
+    """
+    return int(pd.array([value], dtype=pandas_dtype).asi8[0])
+
+
+def to_pandas(values, valid: np.ndarray, pandas_dtype):
+    """
+        Returns column values as an array for a pandas dataframe, with nulls and the pandas dtype
+        restored.
+
+        @param values: the column values (NumPy array or list of strings).
+        @param valid: mask of the non-null values, or None if there are no nulls.
+        @param pandas_dtype: the pandas dtype of the column as returned by column_dtype, or None for
+            the default dtype.
+    """
+    if isinstance(pandas_dtype, pd.CategoricalDtype):
+        values = np.array(values, dtype=object)
+        if valid is not None:
+            values[~valid] = None
+        return pd.Categorical(values, dtype=pandas_dtype)
+    elif is_time_dtype(pandas_dtype):
+        array = time_array(values, pandas_dtype)
+        if valid is not None:
+            array[~valid] = pd.NaT
+        return array
+    elif pandas_dtype in NULLABLE_DTYPES and pandas_dtype != 'string':
+        return _MASKED_ARRAYS[values.dtype.kind](values, np.zeros(len(values), dtype=bool) if valid is None else ~valid)
+    if valid is not None:
+        values = np.array(values, dtype=object)
+        values[~valid] = None
+    return values if pandas_dtype is None else pd.array(values, dtype=pandas_dtype)
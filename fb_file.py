@@ -0,0 +1,107 @@
+"""
+Flatbuffer dataframe files: a frame (or a stream of frames) saved as is after a one page header, so
+it can be memory-mapped and queried in place by the fb_dataframe functions, without reading or
+deserializing it first:
+
++-------------------------------------------+---------+---------------------------------------+
+| header: magic, format version,            | padding | flatbuffer dataframe (a single frame  |
+| data offset, data length                  |         | or a stream), starting on a page      |
++-------------------------------------------+---------+---------------------------------------+
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+
+from fb_dataframe import fb_dataframe_describe
+from fb_descriptors import DescribedBuffer
+
+FILE_MAGIC = b"FBDFFILE"
+FILE_VERSION = 1
+
+# magic, format version, data offset, data length.
+FILE_HEADER = struct.Struct("<8sI4xQQ")
+
+# The data starts on a page boundary of the host writing the file (16K or 64K on some hosts, 4K
+# at least), so the mapping puts it (and its 8-byte aligned int64/float64 vectors) at aligned
+# addresses. Readers take the data offset from the header, so they open files of any page size.
+PAGE_SIZE = max(4096, mmap.ALLOCATIONGRANULARITY)
+
+
+def save_flatbuffer(fb_buf, path: str) -> int:
+    """
+        Saves a flatbuffer dataframe (e.g. the bytes returned by to_flatbuffer) to a file that
+        FbFile can map. The file is written next to path and then renamed over it, so readers
+        never open a partially written file. Returns the size of the file.
+
+        @param fb_buf: buffer containing bytes of the Flatbuffer Dataframe, or a DescribedBuffer.
+        @param path: path of the file.
+    """
+    data = memoryview(fb_buf.buf if isinstance(fb_buf, DescribedBuffer) else fb_buf).cast('B')
+    header = FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, PAGE_SIZE, len(data))
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(header)
+            file.write(bytes(PAGE_SIZE - len(header)))
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return PAGE_SIZE + len(data)
+
+
+class FbFile:
+    """
+        A flatbuffer dataframe file mapped into memory. buf is a DescribedBuffer over the mapped
+        dataframe: pass it to fb_dataframe_head, fb_dataframe_group_by, fb_dataframe_filter, ...
+        and the pages they touch are read straight from the file (or the page cache) on demand.
+        Opened writable, fb_dataframe_map_numeric_column updates the file in place; flush() writes
+        the changes back.
+
+        close() (or leaving a with block) unmaps the file; it fails with BufferError while NumPy
+        arrays viewing the file are still alive.
+    """
+    def __init__(self, path: str, writable: bool = False):
+        """
+            @param path: path of a file written by save_flatbuffer.
+            @param writable: map the file for writing, so columns can be mapped in place.
+        """
+        self.path = path
+        with open(path, 'r+b' if writable else 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < FILE_HEADER.size:
+                raise ValueError(f"'{path}' is not a flatbuffer dataframe file.")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, offset, length = FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != FILE_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"'{path}' is not a flatbuffer dataframe file.")
+        if version != FILE_VERSION or offset + length > size:
+            self._mmap.close()
+            raise ValueError(f"'{path}' has an unsupported format version ({version}) or is truncated.")
+        self._view = memoryview(self._mmap)[offset:offset + length]
+        self.buf = fb_dataframe_describe(self._view)
+
+    def flush(self) -> None:
+        """
+            Writes changes made to a writable file's mapping back to the file.
+        """
+        self._mmap.flush()
+
+    def close(self) -> None:
+        """
+            Unmaps the file.
+        """
+        self.buf = None
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,461 @@
+"""
+Group-by aggregation kernels that run directly on column arrays (e.g. NumPy views over flatbuffer
+vectors), without building an intermediate pandas DataFrame.
+"""
+
+import numpy as np
+import pandas as pd
+
+from fb_dtypes import NULLABLE_DTYPES, is_time_dtype, time_array
+
+AGGREGATES = ('sum', 'count', 'min', 'max', 'mean')
+
+# The aggregates computed on each range of rows for a requested aggregate (see partial_aggregate),
+# and the aggregate that combines the values of each of them across ranges. 'mean_sum' is the sum
+# a mean divides, in float64 when int sums could overflow.
+PARTIAL_AGGREGATES = {'sum': ('sum',), 'count': ('count',), 'min': ('min',), 'max': ('max',),
+                      'mean': ('mean_sum', 'count')}
+MERGE_AGGREGATES = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max', 'mean_sum': 'sum'}
+
+# Dense (bincount-based) grouping is used for int keys whose value range is at most this many slots.
+MAX_DENSE_KEY_RANGE = 1 << 24
+
+
+class GroupIndex:
+    """
+        Assigns each row a group id. The groups are the sorted unique keys, matching the group order
+        of pandas groupby(sort=True). Null (and NaN) keys are dropped, like pandas does; valid is an
+        optional mask of the non-null keys. With run_lengths, keys are the values of runs of equal
+        keys (e.g. a run-length encoded column) and the groups are found from the runs alone.
+    """
+    def __init__(self, keys, valid: np.ndarray = None, run_lengths: np.ndarray = None):
+        if valid is not None and valid.all():
+            valid = None
+        if run_lengths is not None and valid is not None:
+            # valid is per row, so expand the runs
+            keys, run_lengths = np.repeat(_as_array(keys), run_lengths), None
+        if valid is not None:
+            keys = (keys if isinstance(keys, pd.Categorical) else _as_array(keys))[valid]
+        categories = None
+        if isinstance(keys, pd.Categorical) and keys.categories.is_monotonic_increasing and (keys.codes >= 0).all():
+            # Group on the integer codes; with sorted categories code order is key order, so the
+            # keys are only decoded once per group.
+            categories = keys.categories.to_numpy()
+            keys = keys.codes
+        keys = _as_array(keys)
+        self.valid = valid
+        if keys.dtype.kind == 'f':
+            not_nan = ~np.isnan(keys)
+            if not not_nan.all():
+                keys = keys[not_nan]
+                if self.valid is None:
+                    self.valid = not_nan
+                else:
+                    self.valid = self.valid.copy()
+                    self.valid[self.valid] = not_nan
+
+        if keys.dtype.kind in 'iu' and len(keys) and _dense_key_range(keys) is not None:
+            key_min, key_range = _dense_key_range(keys)
+            key_min = keys.dtype.type(key_min)
+            # Subtract in the key dtype: even if it wraps around (e.g. int8), the true offsets are in
+            # [0, key_range), so reading the result as unsigned gives them back exactly.
+            offsets = (keys - key_min).view(f'u{keys.dtype.itemsize}').astype(np.intp)
+            present = np.bincount(offsets, minlength=key_range) > 0
+            lookup = np.cumsum(present) - 1
+            self.keys = np.flatnonzero(present).astype(keys.dtype) + key_min
+            self.inverse = lookup[offsets]
+        else:
+            self.keys, self.inverse = np.unique(keys, return_inverse=True)
+            self.inverse = self.inverse.reshape(-1)
+        if categories is not None:
+            self.keys = categories[self.keys]
+        if run_lengths is not None:
+            self.inverse = np.repeat(self.inverse, run_lengths)
+
+        self.num_groups = len(self.keys)
+        self._order = None
+
+    @classmethod
+    def combined(cls, keys: list, valid: list = None) -> 'GroupIndex':
+        """
+            Returns the GroupIndex of composite keys: the groups are the sorted unique combinations
+            of the values of several key columns (like pandas groupby on a list of columns) and keys
+            is the list of the values of each key column per group. Rows where any key is null are
+            dropped. Each key column is indexed on its own and the group ids are combined one key
+            at a time, so the ids never grow beyond rows * groups of a key.
+
+            Besides keys, levels holds (unique keys, key code per group) of each key column, from
+            which the MultiIndex of the result is built without hashing the keys again.
+
+            @param keys: values of each key column.
+            @param valid: optional masks of the non-null values of each key column (or None).
+        """
+        valid = valid or [None] * len(keys)
+        mask = np.ones(len(keys[0]), dtype=bool)
+        for values, values_valid in zip(keys, valid):
+            if values_valid is not None:
+                mask &= values_valid
+            if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+                mask &= ~np.isnan(values)
+        mask = None if mask.all() else mask
+
+        levels = [cls(values, mask) for values in keys]
+        inverse = np.zeros(len(levels[0].inverse), dtype=np.int64)
+        level_codes = []
+        for level in levels:
+            # the codes of each key are in key order, so the combined ids are in lexicographic key order
+            width = max(level.num_groups, 1)
+            compact = cls(inverse * width + level.inverse)
+            level_codes = [codes[compact.keys // width] for codes in level_codes] + [compact.keys % width]
+            inverse = compact.inverse.astype(np.int64, copy=False)
+
+        index = cls.__new__(cls)
+        index.valid, index.inverse, index.num_groups, index._order = mask, inverse, len(level_codes[-1]), None
+        index.levels = [(level.keys, codes) for level, codes in zip(levels, level_codes)]
+        index.keys = [level.keys[codes] for level, codes in zip(levels, level_codes)]
+        return index
+
+    def aggregate(self, values, agg: str, valid: np.ndarray = None) -> np.ndarray:
+        """
+            Computes one aggregate of values per group, skipping null and NaN values like pandas does.
+
+            @param values: column values aligned with the keys the index was built from.
+            @param agg: one of AGGREGATES (or 'mean_sum', see PARTIAL_AGGREGATES).
+            @param valid: optional mask of the non-null values.
+        """
+        if agg not in AGGREGATES and agg != 'mean_sum':
+            raise ValueError(f"Unsupported aggregate '{agg}', expected one of {AGGREGATES}.")
+        values = _as_array(values)
+        inverse = self.inverse
+        if self.valid is not None:
+            values = values[self.valid]
+            valid = None if valid is None else valid[self.valid]
+
+        if values.dtype.kind == 'f':
+            not_nan = ~np.isnan(values)
+            valid = not_nan if valid is None else valid & not_nan
+        if valid is not None and valid.all():
+            valid = None
+        order = None
+        if valid is not None:
+            inverse, values = inverse[valid], values[valid]
+        else:
+            order = self._order
+
+        counts = np.bincount(inverse, minlength=self.num_groups)
+        if agg == 'count':
+            return counts.astype(np.int64)
+        if agg == 'sum':
+            return _group_sum(inverse, values, self.num_groups, counts)
+        if agg in ('mean', 'mean_sum'):
+            if values.dtype.kind in 'iu' and len(values) and \
+                    max(abs(int(values.min())), abs(int(values.max()))) * len(values) >= 2 ** 63:
+                # the int64 sums could overflow (e.g. datetimes in ns), accumulate in float64 instead
+                sums = np.bincount(inverse, weights=values, minlength=self.num_groups)
+            else:
+                sums = _group_sum(inverse, values, self.num_groups, counts)
+            if agg == 'mean_sum':
+                return sums
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return sums / counts
+
+        # min / max: reduce each group's run in group order.
+        if order is None:
+            order = np.argsort(inverse, kind='stable')
+            if valid is None:
+                self._order = order
+        nonempty = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        ufunc = np.minimum if agg == 'min' else np.maximum
+        reduced = ufunc.reduceat(values[order], starts) if len(starts) else values[:0]
+        if nonempty.all():
+            return reduced
+        # ints go into an object array so values beyond 2**53 stay exact next to the NaNs
+        result = np.full(self.num_groups, np.nan, dtype=object if values.dtype.kind in 'Oiu' else np.float64)
+        result[nonempty] = reduced
+        return result
+
+
+def group_by_aggregate(keys, key_name, columns: dict, aggregates, valid: dict = None,
+                       pandas_dtypes: dict = None, run_lengths: np.ndarray = None) -> pd.DataFrame:
+    """
+        Groups columns by keys and aggregates them in one pass over the group ids, which are only
+        computed once. Returns a pandas dataframe shaped like df.groupby(key_name).agg(aggregates).
+
+        @param keys: grouping column values, or a list of the values of each grouping column.
+        @param key_name: name of the grouping column (the index name of the result), or a list of
+            the names of the grouping columns (the levels of the MultiIndex of the result).
+        @param columns: dict mapping column names to values aligned with keys.
+        @param aggregates: dict mapping column names to an aggregate name or a list of them, or a
+            list of (column name, aggregate) pairs (see aggregate_pairs).
+        @param valid: optional dict mapping column names to masks of their non-null values.
+        @param pandas_dtypes: optional dict mapping column names to the pandas dtype they are read
+            back as, when it isn't the dtype of their values (e.g. 'Int64', 'datetime64[ns]' or a
+            pd.CategoricalDtype), so results get the dtypes pandas returns. Categorical keys only
+            get the observed categories as groups, like groupby(observed=True).
+        @param run_lengths: optional number of rows in each run when keys are run values (see
+            GroupIndex).
+    """
+    valid = valid or {}
+    pandas_dtypes = pandas_dtypes or {}
+    index = _group_index(keys, key_name, valid, run_lengths)
+    pairs, multi = aggregate_pairs(aggregates)
+    data = {}
+    for col_name, agg in pairs:
+        result = index.aggregate(columns[col_name], agg, valid.get(col_name))
+        data[(col_name, agg) if multi else col_name] = _typed_result(
+            result, agg, getattr(columns[col_name], 'dtype', None), pandas_dtypes.get(col_name))
+    return _result_frame(index, key_name, data, multi, pandas_dtypes)
+
+
+def partial_aggregate(keys, key_name, columns: dict, aggregates, valid: dict = None) -> tuple:
+    """
+        Computes the partial aggregates of one range of rows, which merge_aggregates combines with
+        those of the other ranges. Returns (group keys (a list of them per grouping column when
+        there are several), {(column name, partial aggregate): value per group}, {column name:
+        dtype of its values, None for lists of strings}); the partial aggregates of each aggregate
+        are listed in PARTIAL_AGGREGATES.
+
+        @param keys: grouping column values of the range, or a list of them per grouping column.
+        @param key_name: name of the grouping column, or a list of them.
+        @param columns: dict mapping column names to values aligned with keys.
+        @param aggregates: dict mapping column names to an aggregate name or a list of them, or a
+            list of (column name, aggregate) pairs.
+        @param valid: optional dict mapping column names to masks of their non-null values.
+    """
+    valid = valid or {}
+    index = _group_index(keys, key_name, valid)
+    partials, dtypes = {}, {}
+    for col_name, agg in aggregate_pairs(aggregates)[0]:
+        dtypes[col_name] = getattr(columns[col_name], 'dtype', None)
+        if agg not in PARTIAL_AGGREGATES:
+            raise ValueError(f"Unsupported aggregate '{agg}', expected one of {AGGREGATES}.")
+        for partial in PARTIAL_AGGREGATES[agg]:
+            if (col_name, partial) not in partials:
+                partials[(col_name, partial)] = index.aggregate(columns[col_name], partial, valid.get(col_name))
+    group_keys = [_as_array(level) for level in index.keys] if isinstance(key_name, list) else _as_array(index.keys)
+    return group_keys, partials, dtypes
+
+
+def merge_aggregates(partials: list, key_name, aggregates, pandas_dtypes: dict = None) -> pd.DataFrame:
+    """
+        Combines the partial aggregates of disjoint ranges of rows (as returned by partial_aggregate)
+        into the result group_by_aggregate gives for all the rows.
+
+        @param partials: the partial aggregates of each range, in row order.
+        @param key_name: name of the grouping column (the index name of the result), or a list of them.
+        @param aggregates: dict mapping column names to an aggregate name or a list of them, or a
+            list of (column name, aggregate) pairs.
+        @param pandas_dtypes: optional dict mapping column names to the pandas dtype they are read
+            back as (see group_by_aggregate).
+    """
+    pandas_dtypes = pandas_dtypes or {}
+    if isinstance(key_name, list):
+        index = GroupIndex.combined([_concat([keys[level] for keys, _, _ in partials])
+                                     for level in range(len(key_name))])
+    else:
+        index = GroupIndex(_concat([keys for keys, _, _ in partials]))
+    _, computed, dtypes = partials[0]
+    merged = {}
+    for name, partial in computed:
+        values = _concat([results[(name, partial)] for _, results, _ in partials])
+        if partial == 'mean_sum' and values.dtype.kind in 'iu':
+            # add the int sums as Python ints so they can't overflow
+            values = values.astype(object)
+        # min/max of a range without values is NaN, and a string sum 0
+        valid = None
+        if values.dtype == object:
+            valid = ~pd.isna(values)
+            if partial == 'sum':
+                valid &= np.array([isinstance(value, str) for value in values], dtype=bool)
+        result = index.aggregate(values, MERGE_AGGREGATES[partial], valid)
+        if partial in ('min', 'max') and result.dtype == object and dtypes[name] is not None and \
+                dtypes[name].kind in 'iu' and not pd.isna(result).any():
+            result = result.astype(dtypes[name])
+        merged[(name, partial)] = result
+
+    data = {}
+    pairs, multi = aggregate_pairs(aggregates)
+    for col_name, agg in pairs:
+        if agg == 'mean':
+            sums = merged[(col_name, 'mean_sum')]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = sums.astype(np.float64) / merged[(col_name, 'count')]
+        else:
+            result = merged[(col_name, agg)]
+        data[(col_name, agg) if multi else col_name] = _typed_result(
+            result, agg, dtypes[col_name], pandas_dtypes.get(col_name))
+    return _result_frame(index, key_name, data, multi, pandas_dtypes)
+
+
+def aggregate_pairs(aggregates) -> tuple:
+    """
+        Returns the (column name, aggregate) pairs requested by aggregates in the order of the
+        result columns, and whether the result columns are labelled by those pairs (else by the
+        column name alone, when a dict maps every column to a single aggregate).
+
+        @param aggregates: dict mapping column names to an aggregate name or a list of them, or a
+            list of (column name, aggregate) pairs.
+    """
+    if isinstance(aggregates, dict):
+        multi = any(isinstance(aggs, (list, tuple)) for aggs in aggregates.values())
+        return [(col_name, agg) for col_name, aggs in aggregates.items()
+                for agg in (aggs if isinstance(aggs, (list, tuple)) else [aggs])], multi
+    return [tuple(pair) for pair in aggregates], True
+
+
+def aggregated_columns(aggregates) -> list:
+    """
+        Returns the names of the columns aggregates aggregates, in order and without repeats.
+    """
+    return list(dict.fromkeys(col_name for col_name, _ in aggregate_pairs(aggregates)[0]))
+
+
+def _group_index(keys, key_name, valid: dict, run_lengths: np.ndarray = None) -> GroupIndex:
+    """
+        Returns the GroupIndex of one grouping column, or the combined one of a list of them.
+    """
+    if isinstance(key_name, list):
+        return GroupIndex.combined(keys, [valid.get(name) for name in key_name])
+    return GroupIndex(keys, valid.get(key_name), run_lengths)
+
+
+def _result_frame(index: GroupIndex, key_name, data: dict, multi: bool, pandas_dtypes: dict) -> pd.DataFrame:
+    """
+        Returns the result of a group by: data (the typed aggregates per group) indexed by the group
+        keys, converted back to the pandas dtype of the grouping column. With a list of grouping
+        columns the index is a MultiIndex built from the levels of the combined GroupIndex.
+    """
+    names = key_name if isinstance(key_name, list) else [key_name]
+    levels = index.levels if isinstance(key_name, list) else [(index.keys, np.arange(index.num_groups))]
+    if any(isinstance(pandas_dtypes.get(name), pd.CategoricalDtype) for name in names):
+        # groups follow the order of the categories rather than of the values
+        ranks = [pandas_dtypes[name].categories.get_indexer(keys)[codes]
+                 if isinstance(pandas_dtypes.get(name), pd.CategoricalDtype) else codes
+                 for name, (keys, codes) in zip(names, levels)]
+        order = np.lexsort(ranks[::-1])
+        levels = [(keys, codes[order]) for keys, codes in levels]
+        data = {name: values[order] for name, values in data.items()}
+    levels = [(time_array(keys, pandas_dtypes[name]) if is_time_dtype(pandas_dtypes.get(name))
+               else pd.array(keys, dtype=pandas_dtypes[name]) if name in pandas_dtypes else keys, codes)
+              for name, (keys, codes) in zip(names, levels)]
+    if isinstance(key_name, list):
+        result_index = pd.MultiIndex(levels=[keys for keys, _ in levels], codes=[codes for _, codes in levels],
+                                     names=names, verify_integrity=False)
+    else:
+        keys, codes = levels[0]
+        result_index = pd.Index(keys[codes], name=key_name)
+    result = pd.DataFrame(data, index=result_index)
+    if multi:
+        result.columns = pd.MultiIndex.from_tuples(result.columns)
+    return result
+
+
+def _typed_result(values: np.ndarray, agg: str, values_dtype: np.dtype, pandas_dtype):
+    """
+        Returns an aggregate of a column in the dtype pandas groupby gives it: min/max keep the dtype
+        of the column (empty groups of nullable columns become <NA>, of datetime columns NaT), so do
+        sums of float columns and int sums that fit in it (else int64/uint64), and mean is float64, or
+        float32 for float32 columns.
+
+        @param values: the aggregate per group.
+        @param agg: the aggregate.
+        @param values_dtype: NumPy dtype of the aggregated values, or None for lists of strings.
+        @param pandas_dtype: the pandas dtype the column is read back as, or None.
+    """
+    if agg == 'count':
+        return pd.array(values, dtype='Int64') if pandas_dtype in NULLABLE_DTYPES and pandas_dtype != 'string' \
+            else values
+    if is_time_dtype(pandas_dtype):
+        if agg == 'sum' and pandas_dtype.startswith('datetime64'):
+            raise TypeError("datetime64 columns can't be summed.")
+        missing = pd.isna(values)
+        # means are truncated to whole units like pandas does
+        result = time_array(np.where(missing, 0, values).astype(np.int64), pandas_dtype)
+        result[missing] = pd.NaT
+        return result
+    if pandas_dtype == 'string':
+        return pd.array(values, dtype='string')
+    if pandas_dtype is not None:
+        if agg == 'mean':
+            return pd.array(values, dtype='Float32' if pandas_dtype == 'Float32' else 'Float64')
+        elif agg == 'sum' and pandas_dtype == 'boolean':
+            return pd.array(values, dtype='Int64')
+        elif agg == 'sum' and values_dtype is not None and values_dtype.kind in 'iu':
+            return pd.array(values, dtype=pandas_dtype if _fits(values, values_dtype)
+                            else 'UInt64' if values_dtype.kind == 'u' else 'Int64')
+        return pd.array(values, dtype=pandas_dtype)
+    if values_dtype is None or values_dtype.kind not in 'iuf' or values.dtype.kind not in 'iuf':
+        return values
+    if agg == 'mean':
+        return values.astype(np.float32) if values_dtype == np.float32 else values
+    if agg == 'sum' and values_dtype.kind in 'iu' and not _fits(values, values_dtype):
+        return values.astype(np.uint64 if values_dtype.kind == 'u' else np.int64, copy=False)
+    return values.astype(values_dtype, copy=False)
+
+
+def _fits(values: np.ndarray, dtype: np.dtype) -> bool:
+    """
+        Returns True if every value of an int aggregate can be represented in the int dtype dtype.
+    """
+    bounds = np.iinfo(dtype)
+    return not len(values) or (bounds.min <= values.min() and values.max() <= bounds.max)
+
+
+def _as_array(values) -> np.ndarray:
+    """
+        Returns values as a NumPy array; lists of strings and categoricals become object arrays.
+    """
+    if isinstance(values, np.ndarray):
+        return values
+    if isinstance(values, pd.Categorical):
+        return np.asarray(values, dtype=object)
+    return np.array(values, dtype=object) if values else np.empty(0, dtype=object)
+
+
+def _concat(parts: list) -> np.ndarray:
+    """
+        Concatenates the arrays computed on several ranges of rows, ignoring empty ones (a range
+        without rows has no values to take the dtype from).
+    """
+    nonempty = [part for part in parts if len(part)]
+    return np.concatenate(nonempty) if nonempty else parts[0]
+
+
+def _dense_key_range(keys: np.ndarray):
+    """
+        Returns (min key, key range) if keys are compact enough to group with bincount, else None.
+    """
+    key_min, key_max = int(keys.min()), int(keys.max())
+    key_range = key_max - key_min + 1
+    if key_range > min(MAX_DENSE_KEY_RANGE, 4 * len(keys) + 1024):
+        return None
+    return key_min, key_range
+
+
+def _group_sum(inverse: np.ndarray, values: np.ndarray, num_groups: int, counts: np.ndarray) -> np.ndarray:
+    """
+        Sums values per group. Int sums stay exact: bincount's float64 accumulator is only used when
+        no partial sum can exceed 2**53. Float sums, float32 ones included, are accumulated in
+        float64 (and float32 ones rounded back by _typed_result), so they can differ in the last
+        bits from pandas, which accumulates in the column's dtype with Kahan compensation.
+    """
+    if values.dtype.kind in 'iub':
+        if not len(values):
+            return np.zeros(num_groups, dtype=np.int64)
+        bound = max(abs(int(values.min())), abs(int(values.max())))
+        if bound * len(values) < 2 ** 53:
+            return np.bincount(inverse, weights=values, minlength=num_groups).astype(np.int64)
+        result = np.zeros(num_groups, dtype=np.uint64 if values.dtype == np.uint64 else np.int64)
+        np.add.at(result, inverse, values)
+        return result
+    if values.dtype.kind == 'f':
+        return np.bincount(inverse, weights=values, minlength=num_groups)
+    # Object (e.g. string) columns sum by concatenation like pandas, and groups without values sum to 0.
+    order = np.argsort(inverse, kind='stable')
+    nonempty = counts > 0
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+    result = np.zeros(num_groups, dtype=object)
+    if len(starts):
+        result[nonempty] = np.add.reduceat(values[order], starts)
+    return result
@@ -0,0 +1,130 @@
+"""
+Cross-process locks for the shared memory dataframes, implemented as fcntl byte-range locks on a lock
+file: byte 0 guards the catalog, byte slot + 1 guards the dataframe in that directory slot.
+"""
+
+import fcntl
+import os
+import tempfile
+import threading
+
+from contextlib import contextmanager
+
+CATALOG_LOCK = 0
+
+# POSIX record locks belong to the process and are all dropped when any descriptor of the file is
+# closed, so each lock file is opened once per process and shared by every FbFileLock on it.
+_lock_files = {}
+_lock_files_guard = threading.Lock()
+
+
+class _HeldRanges:
+    """
+        The byte ranges of a lock file held (or being acquired) by the threads of this process.
+        Record locks don't exclude threads of the same process, so threads exclude each other
+        here first: overlapping shared ranges are held together, an exclusive range excludes every
+        overlapping one, and new shared holders wait while an overlapping exclusive range is
+        wanted. Threads only wait here on conflicting ranges of this process, never while blocked
+        on the record lock of another process, so unrelated slots don't serialize.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        # [start, stop, exclusive] of each range held or being acquired
+        self.held = []
+        # (start, stop) of each exclusive range waited for
+        self.wanted = []
+
+    def _conflicts(self, start: int, stop: int, exclusive: bool) -> bool:
+        for held_start, held_stop, held_exclusive in self.held:
+            if held_start < stop and start < held_stop and (exclusive or held_exclusive):
+                return True
+        return not exclusive and any(want_start < stop and start < want_stop for want_start, want_stop in self.wanted)
+
+    def acquire(self, start: int, stop: int, exclusive: bool) -> list:
+        """
+            Waits until no range of this process conflicts with [start, stop) and registers it.
+            Returns the registered range, to pass to release().
+        """
+        held = [start, stop, exclusive]
+        with self.cond:
+            if exclusive:
+                self.wanted.append((start, stop))
+            try:
+                self.cond.wait_for(lambda: not self._conflicts(start, stop, exclusive))
+            finally:
+                if exclusive:
+                    self.wanted.remove((start, stop))
+            self.held.append(held)
+        return held
+
+    def release(self, fd: int, held: list) -> None:
+        """
+            Unregisters a range and unlocks the bytes of it no other range of this process still
+            holds (unlocking a record lock unlocks it for the whole process).
+        """
+        start, stop, _ = held
+        with self.cond:
+            self.held.remove(held)
+            for other_start, other_stop, _ in sorted(self.held):
+                if other_stop <= start or stop <= other_start:
+                    continue
+                if start < other_start:
+                    fcntl.lockf(fd, fcntl.LOCK_UN, other_start - start, start)
+                start = max(start, other_stop)
+            if start < stop:
+                fcntl.lockf(fd, fcntl.LOCK_UN, stop - start, start)
+            self.cond.notify_all()
+
+
+def _open_lock_file(path: str) -> tuple:
+    """
+        Returns (fd, held ranges) for path, opening the file the first time it is used in this process.
+    """
+    with _lock_files_guard:
+        pid, fd, held_ranges = _lock_files.get(path, (None, None, None))
+        if pid != os.getpid():
+            # Descriptors and held locks aren't meaningful in a forked child; start fresh.
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+            held_ranges = _HeldRanges()
+            _lock_files[path] = (os.getpid(), fd, held_ranges)
+        return fd, held_ranges
+
+
+def lock_file_path(shm_name: str) -> str:
+    """
+        Returns the path of the lock file for the shared memory named shm_name.
+    """
+    return os.path.join(tempfile.gettempdir(), f"{shm_name}.lock")
+
+
+class FbFileLock:
+    """
+        Reader/writer locks over byte ranges of a lock file, excluding both other processes (with
+        record locks) and other threads of this process (see _HeldRanges). Any number of threads
+        and processes can hold overlapping shared ranges at once.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.fd, self._held_ranges = _open_lock_file(path)
+
+    @contextmanager
+    def _locked(self, mode: int, start: int, length: int):
+        held = self._held_ranges.acquire(start, start + length, mode == fcntl.LOCK_EX)
+        try:
+            # other shared holders of this process may already hold the record lock; taking it again is a no-op
+            fcntl.lockf(self.fd, mode, length, start)
+            yield
+        finally:
+            self._held_ranges.release(self.fd, held)
+
+    def exclusive(self, start: int, length: int = 1):
+        """
+            Returns a context manager holding an exclusive lock on bytes [start, start + length).
+        """
+        return self._locked(fcntl.LOCK_EX, start, length)
+
+    def shared(self, start: int, length: int = 1):
+        """
+            Returns a context manager holding a shared lock on bytes [start, start + length).
+        """
+        return self._locked(fcntl.LOCK_SH, start, length)
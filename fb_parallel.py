@@ -0,0 +1,176 @@
+"""
+Parallel queries on shared memory dataframes: a query is split into tasks over disjoint row ranges,
+run by a persistent pool of worker processes attached to the same shared memory (so nothing is
+copied to them), and their partial results are merged.
+"""
+
+import concurrent.futures
+import numpy as np
+import os
+import pandas as pd
+
+from fb_dataframe import fb_dataframe_filter, fb_dataframe_group_by_partial, fb_dataframe_row_counts, \
+    fb_dataframe_schema
+from fb_groupby import merge_aggregates
+from fb_shared_memory import FbSharedMemory
+
+# Number of row range tasks per worker a query is split into, so ranges of uneven cost even out.
+TASKS_PER_WORKER = 2
+
+# Times the tasks of a query are run again when they didn't all read the same version of the
+# dataframe (it was mapped or re-added meanwhile) before the query is run in a single read instead.
+PARALLEL_ATTEMPTS = 3
+
+# The FbSharedMemory of a worker process.
+_worker_shm = None
+
+
+def _attach(shm_name: str, lock_mode: str) -> None:
+    """
+        Initializes a worker process: attaches it to the shared memory of the executor, which must
+        exist (a worker never creates one).
+    """
+    global _worker_shm
+    _worker_shm = FbSharedMemory(lock_mode=lock_mode, shm_name=shm_name, create=False)
+
+
+def _group_by_task(df_name: str, grouping_col_name: str, aggregates: dict, where, selection, rows: tuple) -> tuple:
+    """
+        Returns (version, partial aggregates) of a group by over a range of rows.
+    """
+    return _worker_shm._read_version(df_name, lambda fb_buf: fb_dataframe_group_by_partial(
+        fb_buf, grouping_col_name, aggregates, where, selection, rows))
+
+
+def _filter_task(df_name: str, predicate, rows: tuple) -> tuple:
+    """
+        Returns (version, indices of the rows satisfying predicate) over a range of rows.
+    """
+    return _worker_shm._read_version(df_name, lambda fb_buf: fb_dataframe_filter(fb_buf, predicate, rows))
+
+
+def split_rows(row_counts: list, num_tasks: int) -> list:
+    """
+        Splits the rows of a dataframe into at most num_tasks (start, stop) ranges of about the same
+        size. When there are at least as many row groups as tasks, ranges end on row group
+        boundaries so no row group is read by two tasks.
+
+        @param row_counts: number of rows of each row group (see fb_dataframe_row_counts).
+        @param num_tasks: number of ranges wanted.
+    """
+    total = sum(row_counts)
+    bounds = np.cumsum(row_counts)
+    ranges, start = [], 0
+    for task in range(1, num_tasks + 1):
+        stop = total * task // num_tasks
+        if len(row_counts) >= num_tasks:
+            stop = int(bounds[np.abs(bounds - stop).argmin()])
+        if stop > start:
+            ranges.append((start, stop))
+            start = stop
+    return ranges or [(0, 0)]
+
+
+class FbParallelExecutor:
+    """
+        Runs group by and filter queries on the dataframes of an FbSharedMemory in a pool of worker
+        processes attached to the same shared memory. Each query is split into TASKS_PER_WORKER
+        row range tasks per worker; every task reads its range in place and the partial results are
+        merged into the result the FbSharedMemory method of the same name returns. The tasks of a
+        query must all read the same version of the dataframe, else they are run again.
+
+        The pool is started once and reused by every query; close() (or leaving a with block) stops it.
+    """
+    def __init__(self, fb_shm: FbSharedMemory, workers: int = None):
+        """
+            @param fb_shm: the shared memory holding the dataframes.
+            @param workers: number of worker processes; defaults to the number of CPUs.
+        """
+        self.fb_shm = fb_shm
+        self.workers = workers or os.cpu_count()
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=_attach,
+                                                           initargs=(fb_shm.shm_name, fb_shm.lock_mode))
+
+    def _run(self, df_name: str, task, task_args):
+        """
+            Runs task(df_name, *task_args(rows), rows) for each row range of the dataframe. Returns
+            (results in row order, pandas dtypes of its columns), or None if the tasks never all read
+            the same version.
+
+            @param df_name: name of the Dataframe.
+            @param task: function run by the workers, returning (version, result).
+            @param task_args: function returning the arguments of the task for a (start, stop) range.
+        """
+        for _ in range(PARALLEL_ATTEMPTS):
+            version, (row_counts, pandas_dtypes) = self.fb_shm._read_version(
+                df_name, lambda fb_buf: (fb_dataframe_row_counts(fb_buf), fb_dataframe_schema(fb_buf).pandas_dtypes))
+            futures = [self.pool.submit(task, df_name, *task_args(rows), rows)
+                       for rows in split_rows(row_counts, self.workers * TASKS_PER_WORKER)]
+            results = [future.result() for future in futures]
+            if all(task_version == version for task_version, _ in results):
+                return [result for _, result in results], pandas_dtypes
+        return None
+
+    def group_by(self, df_name: str, grouping_col_name, aggregates, where=None,
+                 selection: np.ndarray = None) -> pd.DataFrame:
+        """
+            Applies GROUP BY on the dataframe in parallel (see FbSharedMemory.dataframe_group_by).
+
+            @param df_name: name of the Dataframe.
+            @param grouping_col_name: column to group by, or a list of them.
+            @param aggregates: dict mapping column names to an aggregate name or a list of them, or a
+                list of (column name, aggregate) pairs.
+            @param where: optional predicate restricting the rows that are grouped.
+            @param selection: optional selection vector as returned by dataframe_filter.
+        """
+        if selection is not None:
+            selection = np.asarray(selection, dtype=np.int64)
+
+        def task_args(rows: tuple) -> tuple:
+            # each task only gets the part of the selection vector in its range
+            ranged = None if selection is None else selection[slice(*np.searchsorted(selection, rows))]
+            return grouping_col_name, aggregates, where, ranged
+
+        done = self._run(df_name, _group_by_task, task_args)
+        if done is None:
+            return self.fb_shm.dataframe_group_by(df_name, grouping_col_name, aggregates, where, selection)
+        partials, pandas_dtypes = done
+        if isinstance(grouping_col_name, (list, tuple)):
+            grouping_col_name = list(grouping_col_name) if len(grouping_col_name) > 1 else grouping_col_name[0]
+        return merge_aggregates(partials, grouping_col_name, aggregates, pandas_dtypes)
+
+    def group_by_sum(self, df_name: str, grouping_col_name: str, sum_col_name: str) -> pd.DataFrame:
+        """
+            Applies GROUP BY SUM on the dataframe in parallel (see FbSharedMemory.dataframe_group_by_sum).
+
+            @param df_name: name of the Dataframe.
+            @param grouping_col_name: column to group by.
+            @param sum_col_name: column to sum.
+        """
+        return self.group_by(df_name, grouping_col_name, {sum_col_name: 'sum'})
+
+    def filter(self, df_name: str, predicate) -> np.ndarray:
+        """
+            Evaluates a predicate on the dataframe in parallel and returns the selection vector (see
+            FbSharedMemory.dataframe_filter).
+
+            @param df_name: name of the Dataframe.
+            @param predicate: the predicate, e.g. ('or', ("int_col", "<", 3), ("float_col", ">=", 0.5)).
+        """
+        done = self._run(df_name, _filter_task, lambda rows: (predicate,))
+        if done is None:
+            return self.fb_shm.dataframe_filter(df_name, predicate)
+        selections, _ = done
+        return np.concatenate(selections)
+
+    def close(self) -> None:
+        """
+            Stops the worker processes.
+        """
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
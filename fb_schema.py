@@ -0,0 +1,157 @@
+"""
+The schema of a flatbuffer dataframe (column names, ValueTypes and pandas dtypes) and column lookup
+by name. Frames store their columns' positions sorted by name, so a few columns are found by binary
+search without reading the metadata of the others, and a schema id, under which the schema of
+every frame read in full is cached.
+"""
+
+import hashlib
+import pandas as pd
+
+from fb_cache import LruCache
+from Project.DataFrame import DataFrame, Metadata
+
+# Number of schemas kept in the schema cache (least recently used ones are evicted first).
+SCHEMA_CACHE_SIZE = 256
+
+_schema_cache = LruCache(SCHEMA_CACHE_SIZE)
+
+
+class FbSchema:
+    """
+        The columns of a flatbuffer dataframe: their names in dataframe order, the (position in
+        DataFrame.columns, ValueType) of each name, and the pandas dtype of the columns read back as
+        something other than the default dtype of their ValueType (e.g. 'Int64' or a
+        pd.CategoricalDtype). Treat it as read only: it is shared by every frame with its schema id.
+        Without root_df the schema has no columns.
+    """
+    def __init__(self, root_df: DataFrame.DataFrame = None):
+        self.names = []
+        self.columns = {}
+        self.pandas_dtypes = {}
+        # columns are stored in reverse, so walk back to front to match the original column order
+        for i in reversed(range(root_df.ColumnsLength() if root_df is not None else 0)):
+            metadata = root_df.Columns(i).Metadata()
+            name = metadata.Name().decode('utf-8')
+            self.names.append(name)
+            self.columns[name] = (i, metadata.Dtype())
+            pandas_dtype = read_pandas_dtype(metadata)
+            if pandas_dtype is not None:
+                self.pandas_dtypes[name] = pandas_dtype
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __repr__(self) -> str:
+        return f"FbSchema({self.names})"
+
+
+def schema_id(col_names: list, dtypes: dict, pandas_dtypes: dict) -> int:
+    """
+        Returns the schema id to store in a frame: a 64-bit fingerprint of its column names and
+        types (never 0, which marks frames written without one).
+
+        @param col_names: the column names, in the order they are stored.
+        @param dtypes: dict mapping column names to their DataType.
+        @param pandas_dtypes: dict mapping column names to the pandas dtype to restore on read.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for name in col_names:
+        pandas_dtype = pandas_dtypes.get(name)
+        if isinstance(pandas_dtype, pd.CategoricalDtype):
+            pandas_dtype = ('category', tuple(pandas_dtype.categories), bool(pandas_dtype.ordered))
+        digest.update(repr((name, int(dtypes[name]), pandas_dtype)).encode('utf-8'))
+    return int.from_bytes(digest.digest(), 'little') or 1
+
+
+def read_pandas_dtype(metadata: Metadata.Metadata):
+    """
+        Returns the pandas dtype a column is read back as (its name or, for categoricals, the
+        pd.CategoricalDtype), or None for the default one of its ValueType.
+
+        @param metadata: the metadata of the column.
+    """
+    pandas_dtype = metadata.PandasDtype()
+    if pandas_dtype is None:
+        return None
+    pandas_dtype = pandas_dtype.decode('utf-8')
+    if pandas_dtype == 'category':
+        categories = [metadata.Categories(j).decode('utf-8') for j in range(metadata.CategoriesLength())]
+        return pd.CategoricalDtype(pd.Index(categories, dtype=object), ordered=metadata.Ordered())
+    return pandas_dtype
+
+
+def cached_schema(root_df: DataFrame.DataFrame):
+    """
+        Returns the cached schema of a frame, or None if it isn't cached (or the frame has no schema id).
+
+        @param root_df: the flatbuffer dataframe.
+    """
+    key = root_df.SchemaId()
+    return _schema_cache.get(key) if key else None
+
+
+def read_schema(root_df: DataFrame.DataFrame) -> FbSchema:
+    """
+        Returns the schema of a frame, reading the metadata of all its columns unless the schema
+        of a frame with the same schema id is cached.
+
+        @param root_df: the flatbuffer dataframe.
+    """
+    schema = cached_schema(root_df)
+    if schema is not None:
+        return schema
+    schema = FbSchema(root_df)
+    key = root_df.SchemaId()
+    if key:
+        _schema_cache.put(key, schema)
+    return schema
+
+
+def find_columns(root_df: DataFrame.DataFrame, names) -> dict:
+    """
+        Returns a dict mapping each requested column name found in a frame to its (position in
+        DataFrame.columns, ValueType) pair, in the order requested. Uses the cached schema if there
+        is one, else binary searches the column name index (frames written without one are read in
+        full).
+
+        @param root_df: the flatbuffer dataframe.
+        @param names: names of the columns to look up.
+    """
+    schema = cached_schema(root_df)
+    if schema is None and root_df.SortedColumnsIsNone():
+        schema = read_schema(root_df)
+    if schema is not None:
+        return {name: schema.columns[name] for name in names if name in schema.columns}
+    found = {}
+    for name in names:
+        position = _search(root_df, name.encode('utf-8'))
+        if position is not None:
+            found[name] = (position, root_df.Columns(position).Metadata().Dtype())
+    return found
+
+
+def _search(root_df: DataFrame.DataFrame, name: bytes):
+    """
+        Binary searches the column name index of a frame. Returns the position of the column named
+        name in DataFrame.columns, or None.
+
+        @param root_df: the flatbuffer dataframe.
+        @param name: the UTF-8 encoded column name.
+    """
+    low, high = 0, root_df.SortedColumnsLength()
+    while low < high:
+        middle = (low + high) // 2
+        position = root_df.SortedColumns(middle)
+        # UTF-8 bytes sort in code point order, the order the index was sorted in
+        middle_name = root_df.Columns(position).Metadata().Name()
+        if middle_name < name:
+            low = middle + 1
+        elif middle_name > name:
+            high = middle
+        else:
+            return position
+    return None
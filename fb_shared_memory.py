@@ -1,37 +1,510 @@
 import dill
 import hashlib
+import numpy as np
 import pandas as pd
+import threading
+import time
 import types
 
 from multiprocessing import shared_memory
 
-from fb_dataframe import to_flatbuffer, fb_dataframe_head, fb_dataframe_group_by_sum, fb_dataframe_map_numeric_column
+from fb_cache import LruCache
+from fb_catalog import FbCatalog
+from fb_lock import CATALOG_LOCK, FbFileLock, lock_file_path
+from fb_dataframe import to_flatbuffer, fb_dataframe_head, fb_dataframe_group_by, fb_dataframe_group_by_sum, \
+    fb_dataframe_map_numeric_column, fb_dataframe_write_stream, fb_dataframe_column_stats, fb_dataframe_filter, \
+    fb_dataframe_describe, fb_dataframe_schema, fb_dataframe_select, is_stream, stream_chunk, STREAM_MAGIC
+from fb_descriptors import DescribedBuffer
+from fb_file import FbFile, save_flatbuffer
+from fb_schema import FbSchema
+
+
+SHM_NAME = "CS598"
+
+# Default size of each shared memory segment (200M).
+SEGMENT_SIZE = 200000000
+
+# Optimistic (seqlock) read attempts before a reader falls back to a shared file lock, so readers
+# can't be starved by a steady stream of writers.
+OPTIMISTIC_READS = 3
+
+# Number of dataframe versions whose column descriptors each FbSharedMemory keeps.
+DESCRIPTOR_CACHE_SIZE = 64
+
+# Number of query results each FbSharedMemory keeps.
+RESULT_CACHE_SIZE = 256
+
+# Seconds between two passes of the background merge of appended rows (see start_merging), and the
+# number of frames from which a dataframe's frames are merged.
+MERGE_INTERVAL = 5.0
+MERGE_MIN_FRAMES = 8
+
+# Times merge_appended re-serializes a dataframe whose rows were changed (other than by appends)
+# while it was merging them, before giving up until the next merge.
+MERGE_ATTEMPTS = 3
+
+
+class _SharedMemoryStreamWriter:
+    """
+        File-like object writing into a reserved extent of the shared memory. When the extent fills
+        up, what was written so far moves to an extent at least twice as large.
+    """
+    def __init__(self, fb_shm):
+        self.fb_shm = fb_shm
+        self.segment, self.offset, self.reserved = fb_shm.catalog.reserve(1)
+        self.length = 0
+
+    def write(self, data: bytes) -> int:
+        if self.length + len(data) > self.reserved:
+            self._grow(self.length + len(data))
+        start = self.offset + self.length
+        self.fb_shm._segment_buf(self.segment)[start:start + len(data)] = data
+        self.length += len(data)
+        return len(data)
+
+    def _grow(self, min_length: int) -> None:
+        catalog = self.fb_shm.catalog
+        segment, offset, reserved = catalog.reserve(max(min_length, 2 * self.reserved))
+        old_buf = self.fb_shm._segment_buf(self.segment)
+        self.fb_shm._segment_buf(segment)[offset:offset + self.length] = old_buf[self.offset:self.offset + self.length]
+        catalog.release(self.segment, self.offset, self.reserved)
+        self.segment, self.offset, self.reserved = segment, offset, reserved
 
 
 class FbSharedMemory:
     """
         Class for managing the shared memory for holding flatbuffer dataframes.
+
+        Dataframes live in the "CS598" segment; when it is full, new segments "CS598-1", "CS598-2", ...
+        are created on demand and recorded in the catalog. Other processes attach to them lazily, the
+        first time they access a dataframe stored there.
+
+        Writers (add, remove, compact, map) exclude each other with file locks. Readers don't lock by
+        default: they read optimistically and retry if the catalog's seqlock shows the dataframe
+        changed meanwhile, falling back to a shared file lock after OPTIMISTIC_READS attempts. With
+        lock_mode "file", readers always take the shared file lock.
+
+        The column layout of each dataframe read is cached per catalog version (see fb_descriptors),
+        so repeated queries on a dataframe don't decode its flatbuffer tables again; adding, mapping
+        or re-adding a dataframe gives it a new version. The results of group by queries without a
+        filter are cached per version as well; result_cache.hits and result_cache.misses count how
+        often repeated queries are answered from it.
+
+        Rows appended with append_rows are stored as extra frames after the dataframe's (which
+        becomes a stream, see fb_dataframe_write_stream), so readers see the union without the
+        dataframe being serialized again. merge_appended, or a background thread started with
+        start_merging, merges the frames back into one.
     """
-    def __init__(self):
+    def __init__(self, segment_size: int = SEGMENT_SIZE, lock_mode: str = "seqlock",
+                 descriptor_cache_size: int = DESCRIPTOR_CACHE_SIZE, result_cache_size: int = RESULT_CACHE_SIZE,
+                 shm_name: str = None, create: bool = True):
+        """
+            @param segment_size: size of newly created segments; larger dataframes get a segment of their own size.
+            @param lock_mode: "seqlock" or "file", how readers are kept consistent with writers.
+            @param descriptor_cache_size: number of dataframe versions whose column descriptors are cached.
+            @param result_cache_size: number of query results cached; 0 disables the result cache.
+            @param shm_name: name of the shared memory; defaults to SHM_NAME.
+            @param create: create the shared memory if it doesn't exist yet; without it, attaching to
+                a missing one raises FileNotFoundError.
+        """
+        if lock_mode not in ("seqlock", "file"):
+            raise ValueError(f"Unknown lock_mode '{lock_mode}', expected 'seqlock' or 'file'.")
+        self.shm_name = shm_name or SHM_NAME
         try:
-            self.df_shared_memory = shared_memory.SharedMemory(name = "CS598")
+            self.df_shared_memory = shared_memory.SharedMemory(name = self.shm_name)
         except FileNotFoundError:
-            # Shared memory is not created yet, create it with size 200M.
-            self.df_shared_memory = shared_memory.SharedMemory(name = "CS598", create=True, size=200000000)
+            if not create:
+                raise
+            # Shared memory is not created yet, create it with size segment_size.
+            self.df_shared_memory = shared_memory.SharedMemory(name = self.shm_name, create=True, size=segment_size)
+
+        self.segment_size = segment_size
+        self.segments = {0: self.df_shared_memory}
+        # guards segments: threads (e.g. of AsyncFbSharedMemory) attach to segments concurrently
+        self._segments_lock = threading.Lock()
+        self.lock_mode = lock_mode
+        self.lock = FbFileLock(lock_file_path(self.shm_name))
+        # (dataframe name, version) -> FrameDescriptors of the dataframe at that version.
+        self.descriptor_cache = LruCache(descriptor_cache_size)
+        # (dataframe name, version, query) -> result of the query on the dataframe at that version.
+        self.result_cache = LruCache(result_cache_size)
+        self._merger = None
+        self._stop_merging = threading.Event()
+
+        # The catalog formats the segment header on first use and is shared by every attached process.
+        with self.lock.exclusive(CATALOG_LOCK):
+            self.catalog = FbCatalog(self.df_shared_memory.buf, segment_buf=self._segment_buf,
+                                     create_segment=self._create_segment)
+
+    def _segment_buf(self, segment: int) -> memoryview:
+        """
+            Returns the buffer of a segment, attaching to it on first use.
+
+            @param segment: index of the segment.
+        """
+        shm = self.segments.get(segment)
+        if shm is None:
+            with self._segments_lock:
+                if segment not in self.segments:
+                    self.segments[segment] = shared_memory.SharedMemory(name = f"{self.shm_name}-{segment}")
+                shm = self.segments[segment]
+        return shm.buf
 
-            # Add more initialization steps if needed here...
+    def _create_segment(self, segment: int, min_size: int) -> memoryview:
+        """
+            Creates a new segment of at least min_size bytes and returns its buffer.
 
-        # Add other class members you need here...
+            @param segment: index of the segment.
+            @param min_size: minimum size of the segment.
+        """
+        name = f"{self.shm_name}-{segment}"
+        size = max(self.segment_size, min_size)
+        with self._segments_lock:
+            try:
+                self.segments[segment] = shared_memory.SharedMemory(name = name, create=True, size=size)
+            except FileExistsError:
+                # Left over from a previous store that the catalog no longer knows about.
+                stale = shared_memory.SharedMemory(name = name)
+                stale.unlink()
+                stale.close()
+                self.segments[segment] = shared_memory.SharedMemory(name = name, create=True, size=size)
+            return self.segments[segment].buf
 
-    def add_dataframe(self, name: str, df: pd.DataFrame) -> None:
+    def add_dataframe(self, name: str, df: pd.DataFrame, row_group_size: int = None,
+                      compress: bool = False, workers: int = None) -> None:
         """
             Adds a dataframe into the shared memory. Does nothing if a dataframe with 'name' already exists.
 
             @param name: name of the dataframe.
             @param df: the dataframe to add to shared memory.
+            @param row_group_size: number of rows per row group (see to_flatbuffer).
+            @param compress: encode integer columns when that shrinks them (see to_flatbuffer).
+            @param workers: number of processes serializing the dataframe (see to_flatbuffer).
+        """
+        if name in self.catalog:
+            return
+        fb_bytes = to_flatbuffer(df, row_group_size, compress, workers)
+        with self.lock.exclusive(CATALOG_LOCK):
+            if name not in self.catalog:
+                self.catalog.add(name, fb_bytes)
+
+    def add_dataframe_stream(self, name: str, chunks, compress: bool = False) -> None:
         """
-        # YOUR CODE HERE...
+            Adds a dataframe given as an iterator of chunks (e.g. pd.read_csv(..., chunksize=n)) into
+            the shared memory, serializing one chunk at a time straight into the segment. Does
+            nothing if a dataframe with 'name' already exists. Other dataframes can't be added until
+            the stream is consumed.
 
+            @param name: name of the dataframe.
+            @param chunks: iterable of dataframes with the same columns.
+            @param compress: encode integer columns when that shrinks them (see to_flatbuffer).
+        """
+        if name in self.catalog:
+            return
+        with self.lock.exclusive(CATALOG_LOCK):
+            if name in self.catalog:
+                return
+            writer = _SharedMemoryStreamWriter(self)
+            try:
+                fb_dataframe_write_stream(chunks, writer, compress)
+                self.catalog.commit(name, writer.segment, writer.offset, writer.length, writer.reserved)
+            except BaseException:
+                self.catalog.release(writer.segment, writer.offset, writer.reserved)
+                raise
+
+    def add_dataframe_file(self, name: str, path: str) -> None:
+        """
+            Adds a dataframe saved with save_dataframe (or fb_file.save_flatbuffer) into the shared
+            memory, copying its flatbuffer from the mapped file without deserializing it. Does
+            nothing if a dataframe with 'name' already exists.
+
+            @param name: name of the dataframe.
+            @param path: path of the file.
+        """
+        if name in self.catalog:
+            return
+        with FbFile(path) as fb_file, self.lock.exclusive(CATALOG_LOCK):
+            if name not in self.catalog:
+                self.catalog.add(name, fb_file.buf.buf)
+
+    def save_dataframe(self, name: str, path: str) -> int:
+        """
+            Saves a dataframe in shared memory to a file that FbFile maps and add_dataframe_file
+            loads (see fb_file). Returns the size of the file.
+
+            @param name: name of the dataframe.
+            @param path: path of the file.
+        """
+        return save_flatbuffer(self._read_dataframe(name, lambda fb_buf: bytes(fb_buf.buf)), path)
+
+    def append_rows(self, name: str, df_chunk: pd.DataFrame, row_group_size: int = None,
+                    compress: bool = False) -> None:
+        """
+            Appends rows to a dataframe in shared memory. Only the new rows are serialized: they are
+            written as a frame after the dataframe's frames, in place when the space after it is
+            free, else the dataframe moves to an extent with room to grow into. Readers see the
+            dataframe with or without all of the new rows.
+
+            @param name: name of the dataframe.
+            @param df_chunk: the rows to append, with the same columns and dtypes as the dataframe.
+            @param row_group_size: number of rows per row group of the new frame (see to_flatbuffer).
+            @param compress: encode integer columns of the new frame when that shrinks them.
+        """
+        fb_bytes = to_flatbuffer(df_chunk, row_group_size, compress)
+        with self.lock.exclusive(CATALOG_LOCK):
+            slot, entry = self.catalog.snapshot(name)
+            if slot is None:
+                raise KeyError(f"Dataframe '{name}' not found in shared memory.")
+            with self.lock.exclusive(slot + 1):
+                fb_buf = self._entry_buf(entry)
+                schema, chunk_schema = fb_dataframe_schema(fb_buf), fb_dataframe_schema(fb_bytes)
+                if schema.names != chunk_schema.names or schema.pandas_dtypes != chunk_schema.pandas_dtypes or \
+                        any(schema.columns[col][1] != chunk_schema.columns[col][1] for col in schema.names):
+                    raise ValueError(f"Rows appended to dataframe '{name}' must have its columns and dtypes.")
+
+                # a single flatbuffer becomes the first chunk of a stream, so it has to move
+                kept = len(fb_buf) if is_stream(fb_buf) else 0
+                added = stream_chunk(fb_bytes) if kept else STREAM_MAGIC + stream_chunk(fb_buf) + stream_chunk(fb_bytes)
+                length = kept + len(added)
+                # room for as much again, so a dataframe appended to repeatedly rarely moves
+                segment, offset, capacity = self.catalog.grow(name, length, spare=length, in_place=kept > 0)
+                buf = self._segment_buf(segment)
+                _, old_segment, _, _, old_offset, _, _, _ = entry
+                if kept and (segment, offset) != (old_segment, old_offset):
+                    buf[offset:offset + kept] = fb_buf
+                buf[offset + kept:offset + length] = added
+                self.catalog.update(name, segment, offset, length, capacity)
+        self._forget_cached(name)
+
+    def merge_appended(self, name: str, row_group_size: int = None, compress: bool = False) -> bool:
+        """
+            Merges the frames of a dataframe (e.g. rows added by append_rows) into a single frame.
+            The rows are copied and serialized again without holding any lock; rows appended
+            meanwhile stay appended after the merged frame. Returns False if the dataframe already
+            was a single frame, or if its rows were changed otherwise (e.g. mapped) each of the
+            MERGE_ATTEMPTS times it was merged.
+
+            @param name: name of the dataframe.
+            @param row_group_size: number of rows per row group of the merged frame; defaults to
+                the row group size of the dataframe's first frame.
+            @param compress: encode integer columns of the merged frame when that shrinks them.
+        """
+        for _ in range(MERGE_ATTEMPTS):
+            merged = self._read_dataframe(name, lambda fb_buf: bytes(fb_buf.buf) if len(fb_buf.descriptors) > 1 else None)
+            if merged is None:
+                return False
+            num_rows = fb_dataframe_describe(merged).descriptors[0].num_rows
+            fb_bytes = to_flatbuffer(fb_dataframe_select(merged), row_group_size or (num_rows[0] if num_rows else None),
+                                     compress)
+            with self.lock.exclusive(CATALOG_LOCK):
+                slot, entry = self.catalog.snapshot(name)
+                if slot is None:
+                    raise KeyError(f"Dataframe '{name}' not found in shared memory.")
+                with self.lock.exclusive(slot + 1):
+                    fb_buf = self._entry_buf(entry)
+                    if fb_buf[:len(merged)] != merged:
+                        continue
+                    appended = fb_buf[len(merged):]
+                    data = STREAM_MAGIC + stream_chunk(fb_bytes) + bytes(appended) if len(appended) else fb_bytes
+                    segment, offset, reserved = self.catalog.reserve(len(data))
+                    self._segment_buf(segment)[offset:offset + len(data)] = data
+                    self.catalog.update(name, segment, offset, len(data), reserved)
+            self._forget_cached(name)
+            return True
+        return False
+
+    def start_merging(self, interval: float = MERGE_INTERVAL, min_frames: int = MERGE_MIN_FRAMES) -> None:
+        """
+            Starts a background thread that, every interval seconds, merges the frames of each
+            dataframe made of at least min_frames of them (see merge_appended). Stopped by
+            stop_merging() or close().
+
+            @param interval: seconds between two merge passes.
+            @param min_frames: number of frames from which a dataframe is merged.
+        """
+        if self._merger is not None:
+            return
+        self._stop_merging.clear()
+
+        def merge_loop() -> None:
+            while not self._stop_merging.wait(interval):
+                with self.lock.exclusive(CATALOG_LOCK):
+                    names = [name for name, _, _, _, _ in self.catalog.entries()]
+                for name in names:
+                    try:
+                        if self._read_dataframe(name, lambda fb_buf: len(fb_buf.descriptors)) >= min_frames:
+                            self.merge_appended(name)
+                    except (KeyError, MemoryError):
+                        # removed meanwhile, or no room to merge it now; try again next time
+                        pass
+
+        self._merger = threading.Thread(target=merge_loop, name=f"{self.shm_name}-merge", daemon=True)
+        self._merger.start()
+
+    def stop_merging(self) -> None:
+        """
+            Stops the background merge thread, waiting for a merge in progress to finish.
+        """
+        if self._merger is not None:
+            self._stop_merging.set()
+            self._merger.join()
+            self._merger = None
+
+    def remove_dataframe(self, name: str) -> None:
+        """
+            Removes a dataframe from the shared memory and frees its space.
+
+            @param name: name of the dataframe.
+        """
+        with self.lock.exclusive(CATALOG_LOCK):
+            slot, _ = self.catalog.snapshot(name)
+            if slot is None:
+                raise KeyError(f"Dataframe '{name}' not found in shared memory.")
+            with self.lock.exclusive(slot + 1):
+                self.catalog.remove(name)
+        self._forget_cached(name)
+
+    def compact(self) -> None:
+        """
+            Moves the stored dataframes together so the free space becomes one contiguous region.
+            Buffers previously obtained for the dataframes must not be used afterwards.
+        """
+        with self.lock.exclusive(CATALOG_LOCK), self.lock.exclusive(1, self.catalog.num_slots):
+            self.catalog.compact()
+
+    def _entry_buf(self, entry: tuple) -> memoryview:
+        """
+            Returns the section of the buffer holding the dataframe of a catalog snapshot entry.
+        """
+        _, segment, _, _, offset, length, _, _ = entry
+        return self._segment_buf(segment)[offset:offset + length]
+
+    def _described_buf(self, df_name: str, entry: tuple) -> DescribedBuffer:
+        """
+            Returns the section of the buffer holding the dataframe of a catalog snapshot entry with
+            its frame descriptors, taken from the descriptor cache when they are cached for the
+            entry's version. Columns resolved while reading are staged until _cache_descriptors.
+        """
+        _, _, _, _, _, _, version, _ = entry
+        descriptors = self.descriptor_cache.get((df_name, version))
+        fb_buf = self._entry_buf(entry)
+        if descriptors is None:
+            return fb_dataframe_describe(fb_buf, staged=True)
+        return DescribedBuffer(fb_buf, descriptors, staged=True)
+
+    def _cache_descriptors(self, df_name: str, entry: tuple, described: DescribedBuffer) -> None:
+        """
+            Caches the descriptors of a dataframe once a read has proved they were resolved from a
+            consistent state of it.
+        """
+        _, _, _, _, _, _, version, _ = entry
+        described.commit()
+        if (df_name, version) not in self.descriptor_cache:
+            self.descriptor_cache.put((df_name, version), described.descriptors)
+
+    def _cache_result(self, df_name: str, entry: tuple, query: tuple, result) -> None:
+        """
+            Caches a copy of the result of a query on a consistent state of a dataframe (callers
+            get their own copy, so they may modify it).
+        """
+        if query is not None and self.result_cache.max_entries:
+            _, _, _, _, _, _, version, _ = entry
+            self.result_cache.put((df_name, version, query), result.copy())
+
+    def _read_dataframe(self, df_name: str, read, query: tuple = None):
+        """
+            Returns read(fb_buf) computed on a consistent state of the dataframe with df_name. fb_buf
+            is the dataframe's section of the shared memory itself (not a copy), wrapped with its
+            column descriptors in a DescribedBuffer, so read must not return views into it.
+
+            @param df_name: name of the Dataframe.
+            @param read: function reading the flatbuffer dataframe.
+            @param query: hashable description of what read computes, to cache its pd.DataFrame
+                result per version of the dataframe; None to not cache it.
+        """
+        _, result = self._read_version(df_name, read, query)
+        return result
+
+    def _read_version(self, df_name: str, read, query: tuple = None) -> tuple:
+        """
+            Returns (version, result) where result is read(fb_buf) computed on the version of the
+            dataframe with df_name (see _read_dataframe). Reads of the same dataframe returning the
+            same version saw the same values.
+        """
+        if query is not None and self.result_cache.max_entries:
+            _, entry = self.catalog.snapshot(df_name)
+            if entry is not None:
+                _, _, _, _, _, _, version, _ = entry
+                result = self.result_cache.get((df_name, version, query))
+                if result is not None:
+                    return version, result.copy()
+        attempts = 0
+        while True:
+            slot, entry = self.catalog.snapshot(df_name)
+            if slot is None:
+                raise KeyError(f"Dataframe '{df_name}' not found in shared memory.")
+
+            attempts += 1
+            if self.lock_mode == "file" or attempts > OPTIMISTIC_READS:
+                with self.lock.shared(slot + 1):
+                    if self.catalog.unchanged(slot, entry):
+                        described = self._described_buf(df_name, entry)
+                        result = read(described)
+                        self._cache_descriptors(df_name, entry, described)
+                        self._cache_result(df_name, entry, query, result)
+                        _, _, _, _, _, _, version, _ = entry
+                        return version, result
+                continue
+
+            if entry[-1] % 2:
+                # A writer is mapping the dataframe; wait for it to finish.
+                time.sleep(0)
+                continue
+            try:
+                described = self._described_buf(df_name, entry)
+                result = read(described)
+            except Exception:
+                # Reading a dataframe while it is being moved can fail; only errors on a stable dataframe count.
+                if self.catalog.unchanged(slot, entry):
+                    raise
+                continue
+            if self.catalog.unchanged(slot, entry):
+                self._cache_descriptors(df_name, entry, described)
+                self._cache_result(df_name, entry, query, result)
+                _, _, _, _, _, _, version, _ = entry
+                return version, result
+
+    def _write_dataframe(self, df_name: str, write):
+        """
+            Runs write(fb_buf) to modify the dataframe with df_name in place, excluding other writers
+            and flagging the dataframe as being written for seqlock readers.
+
+            @param df_name: name of the Dataframe.
+            @param write: function modifying the flatbuffer dataframe in place.
+        """
+        while True:
+            slot, _ = self.catalog.snapshot(df_name)
+            if slot is None:
+                raise KeyError(f"Dataframe '{df_name}' not found in shared memory.")
+            with self.lock.exclusive(slot + 1):
+                # Compaction may have moved the dataframe to another slot before the lock was taken.
+                locked_slot, entry = self.catalog.snapshot(df_name)
+                if locked_slot != slot:
+                    continue
+                self.catalog.begin_write(slot)
+                try:
+                    return write(self._entry_buf(entry))
+                finally:
+                    self.catalog.end_write(slot)
+                    self._forget_cached(df_name)
+
+    def _forget_cached(self, df_name: str) -> None:
+        """
+            Drops the cached descriptors and results of every version of a dataframe this process
+            changed or removed (versions changed by other processes are simply never looked up again).
+        """
+        self.descriptor_cache.discard(lambda key: key[0] == df_name)
+        self.result_cache.discard(lambda key: key[0] == df_name)
 
     def _get_fb_buf(self, df_name: str) -> memoryview:
         """
@@ -40,19 +513,81 @@ class FbSharedMemory:
 
             @param df_name: name of the Dataframe.
         """
-        return self.df_shared_memory.buf  # REPLACE THIS WITH YOUR CODE...
+        entry = self.catalog.lookup(df_name)
+        if entry is None:
+            raise KeyError(f"Dataframe '{df_name}' not found in shared memory.")
+        segment, offset, length, _ = entry
+        return self._segment_buf(segment)[offset:offset + length]
 
 
-    def dataframe_head(self, df_name: str, rows: int = 5) -> pd.DataFrame:
+    def dataframe_head(self, df_name: str, rows: int = 5, selection: np.ndarray = None,
+                       columns: list = None) -> pd.DataFrame:
         """
             Returns the first n rows of the Flatbuffer Dataframe as a Pandas Dataframe
             similar to df.head(). If there are less than n rows, returns the entire Dataframe.
 
             @param df_name: name of the Dataframe.
             @param rows: number of rows to return.
+            @param selection: optional selection vector as returned by dataframe_filter.
+            @param columns: optional names of the columns to return.
+        """
+        return self._read_dataframe(df_name, lambda fb_buf: fb_dataframe_head(fb_buf, rows, selection, columns))
+
+    def dataframe_schema(self, df_name: str) -> FbSchema:
+        """
+            Returns the column names, ValueTypes and pandas dtypes of a dataframe (see fb_dataframe_schema).
+
+            @param df_name: name of the Dataframe.
+        """
+        return self._read_dataframe(df_name, fb_dataframe_schema)
+
+    def dataframe_filter(self, df_name: str, predicate) -> np.ndarray:
+        """
+            Evaluates a predicate on the dataframe in shared memory and returns the indices of the
+            rows satisfying it (see fb_dataframe_filter).
+
+            @param df_name: name of the Dataframe.
+            @param predicate: the predicate, e.g. ('or', ("int_col", "<", 3), ("float_col", ">=", 0.5)).
+        """
+        return self._read_dataframe(df_name, lambda fb_buf: fb_dataframe_filter(fb_buf, predicate))
+
+    def dataframe_select(self, df_name: str, columns: list = None, where=None,
+                         selection: np.ndarray = None) -> pd.DataFrame:
+        """
+            Returns the requested columns of the rows satisfying where and/or picked by selection
+            (see fb_dataframe_select).
+
+            @param df_name: name of the Dataframe.
+            @param columns: names of the columns to return; None for all columns.
+            @param where: optional predicate the rows must satisfy.
+            @param selection: optional selection vector as returned by dataframe_filter.
+        """
+        return self._read_dataframe(df_name, lambda fb_buf: fb_dataframe_select(fb_buf, columns, where, selection))
+
+    def dataframe_group_by(self, df_name: str, grouping_col_name, aggregates, where=None,
+                           selection: np.ndarray = None) -> pd.DataFrame:
         """
-        fb_bytes = bytes(self._get_fb_buf(df_name))
-        return fb_dataframe_head(fb_bytes, rows)
+            Applies GROUP BY on the dataframe computing every requested aggregate in one pass (see
+            fb_dataframe_group_by).
+
+            @param df_name: name of the Dataframe.
+            @param grouping_col_name: column to group by, or a list of columns to group by their combinations.
+            @param aggregates: dict mapping column names to an aggregate name or a list of them, or a
+                list of (column name, aggregate) pairs.
+            @param where: optional predicate restricting the rows that are grouped.
+            @param selection: optional selection vector as returned by dataframe_filter.
+        """
+        query = None
+        if where is None and selection is None:
+            if isinstance(aggregates, dict):
+                aggregates_key = tuple((col_name, agg_names if isinstance(agg_names, str) else tuple(agg_names))
+                                       for col_name, agg_names in aggregates.items())
+            else:
+                aggregates_key = ('pairs',) + tuple(tuple(pair) for pair in aggregates)
+            keys_key = tuple(grouping_col_name) if isinstance(grouping_col_name, (list, tuple)) else grouping_col_name
+            query = ('group_by', keys_key, aggregates_key)
+        return self._read_dataframe(df_name, lambda fb_buf: fb_dataframe_group_by(
+            fb_buf, grouping_col_name, aggregates, where, selection), query)
 
     def dataframe_group_by_sum(self, df_name: str, grouping_col_name: str, sum_col_name: str) -> pd.DataFrame:
         """
@@ -63,25 +598,53 @@ class FbSharedMemory:
             @param grouping_col_name: column to group by.
             @param sum_col_name: column to sum.
         """
-        fb_bytes = bytes(self._get_fb_buf(df_name))
-        return fb_dataframe_group_by_sum(fb_bytes, grouping_col_name, sum_col_name)
+        return self._read_dataframe(
+            df_name, lambda fb_buf: fb_dataframe_group_by_sum(fb_buf, grouping_col_name, sum_col_name),
+            ('group_by_sum', grouping_col_name, sum_col_name))
+
+    def dataframe_column_stats(self, df_name: str, col_name: str) -> dict:
+        """
+            Returns the count, null count, min and max of a column from its statistics.
+
+            @param df_name: name of the Dataframe.
+            @param col_name: name of the column.
+        """
+        return self._read_dataframe(df_name, lambda fb_buf: fb_dataframe_column_stats(fb_buf, col_name))
 
-    def dataframe_map_numeric_column(self, df_name: str, col_name: str, map_func: types.FunctionType) -> None:
+    def dataframe_map_numeric_column(self, df_name: str, col_name: str, map_func: types.FunctionType,
+                                     vectorized: bool = False) -> None:
         """
             Apply map_func to elements in a numeric column in the Flatbuffer Dataframe in place.
 
             @param df_name: name of the Dataframe.
             @param col_name: name of the numeric column to apply map_func to.
             @param map_func: function to apply to elements in the numeric column.
+            @param vectorized: map_func takes and returns whole arrays (see fb_dataframe_map_numeric_column).
         """
-        fb_dataframe_map_numeric_column(self._get_fb_buf(df_name), col_name, map_func)
+        self._write_dataframe(df_name, lambda fb_buf: fb_dataframe_map_numeric_column(fb_buf, col_name, map_func,
+                                                                                      vectorized))
 
 
     def close(self) -> None:
         """
             Closes the managed shared memory.
         """
-        try:
-            self.df_shared_memory.close()
-        except:
-            pass
\ No newline at end of file
+        self.stop_merging()
+        with self._segments_lock:
+            segments = list(self.segments.values())
+        for segment in segments:
+            try:
+                segment.close()
+            except:
+                pass
+
+    def unlink(self) -> None:
+        """
+            Destroys the shared memory segments, including the ones this process hasn't attached to yet.
+        """
+        for segment in range(1, self.catalog.num_segments):
+            self._segment_buf(segment)
+        with self._segments_lock:
+            segments = list(self.segments.values())
+        for segment in segments:
+            segment.unlink()
@@ -0,0 +1,479 @@
+import asyncio
+import numpy as np
+import os
+import pandas as pd
+import pytest
+import threading
+import time
+
+import fb_shared_memory
+
+from fb_async import AsyncFbSharedMemory
+from fb_catalog import FbCatalog
+from fb_parallel import FbParallelExecutor
+from fb_shared_memory import FbSharedMemory
+from multiprocessing import shared_memory
+from test_fb_dataframe import generate_random_df
+
+
+def test_catalog_add_lookup_remove():
+    buf = bytearray(200000)
+    catalog = FbCatalog(memoryview(buf), num_slots=8)
+    data_start = catalog._header()['data_start']
+
+    _, offset_a, length_a, version_a = catalog.add("a", b"x" * 10)
+    _, offset_b, _, version_b = catalog.add("b", b"y" * 16)
+    assert offset_a == data_start and offset_b == data_start + 16
+    assert version_b > version_a
+    assert catalog.lookup("a") == (0, offset_a, length_a, version_a)
+    assert buf[offset_b:offset_b + 16] == b"y" * 16
+    with pytest.raises(KeyError):
+        catalog.add("a", b"z")
+
+    # Another view over the same buffer (e.g. another process) sees the same catalog.
+    assert FbCatalog(memoryview(buf)).lookup("b") == catalog.lookup("b")
+
+    # Freed space is reused first-fit, and re-adding a name gets a new version.
+    catalog.remove("a")
+    assert "a" not in catalog
+    _, offset_a2, _, version_a2 = catalog.add("a", b"z" * 8)
+    assert offset_a2 == offset_a and version_a2 > version_b
+    with pytest.raises(KeyError):
+        catalog.remove("missing")
+
+
+def test_catalog_coalesces_and_compacts():
+    buf = bytearray(100000)
+    catalog = FbCatalog(memoryview(buf), num_slots=8)
+    free_space = catalog._read_free_list()[0][2]
+
+    for i in range(5):
+        catalog.add(f"df{i}", bytes([i]) * 100)
+    for i in [1, 3, 2]:
+        catalog.remove(f"df{i}")
+    # The three adjacent holes merge into one extent.
+    assert len(catalog._read_free_list()) == 2
+
+    catalog.compact()
+    assert catalog._read_free_list() == [(0, catalog._header()['data_start'] + 2 * 104, free_space - 2 * 104)]
+    for i in [0, 4]:
+        _, offset, length, _ = catalog.lookup(f"df{i}")
+        assert buf[offset:offset + length] == bytes([i]) * 100
+
+    with pytest.raises(MemoryError):
+        catalog.add("too_big", bytes(free_space))
+
+
+def test_catalog_grows_dataframes_in_place_or_moves_them():
+    buf = bytearray(100000)
+    catalog = FbCatalog(memoryview(buf), num_slots=8)
+    _, offset_a, _, version = catalog.add("a", b"a" * 10)
+
+    # The free space right after "a" is taken without moving it.
+    assert catalog.grow("a", 30) == (0, offset_a, 32)
+    buf[offset_a + 10:offset_a + 30] = b"b" * 20
+    assert catalog.update("a", 0, offset_a, 30, 32) == version + 1
+    assert catalog.lookup("a") == (0, offset_a, 30, version + 1)
+
+    # With another dataframe right after it, "a" moves; its old extent and the spare are freed.
+    _, offset_c, _, _ = catalog.add("c", b"c" * 8)
+    segment, offset, capacity = catalog.grow("a", 40, spare=40)
+    assert offset > offset_c and capacity == 80
+    buf[offset:offset + 40] = buf[offset_a:offset_a + 30] + b"d" * 10
+    catalog.update("a", segment, offset, 40, capacity)
+    assert catalog.lookup("a")[1:3] == (offset, 40)
+    assert catalog._read_free_list()[0] == (0, offset_a, 32)
+    assert catalog.grow("a", 80) == (0, offset, 80)
+
+
+def test_catalog_spills_into_new_segments():
+    segments = {0: bytearray(100000)}
+
+    def create_segment(segment, min_size):
+        segments[segment] = bytearray(max(min_size, 1000))
+        return memoryview(segments[segment])
+
+    catalog = FbCatalog(memoryview(segments[0]), num_slots=8,
+                        segment_buf=lambda segment: memoryview(segments[segment]), create_segment=create_segment)
+    free_space = catalog._read_free_list()[0][2]
+
+    catalog.add("fits", bytes(free_space - 8))
+    catalog.add("small", b"s" * 100)
+    catalog.add("large", b"l" * 5000)
+    assert catalog.num_segments == 3
+    assert catalog.lookup("small")[:2] == (1, 0) and catalog.lookup("large")[:2] == (2, 0)
+
+    # Free space left in an existing segment is used before adding another one.
+    assert catalog.add("next", b"n" * 100)[:2] == (1, 104)
+    catalog.remove("small")
+    catalog.compact()
+    assert catalog.lookup("next")[:2] == (1, 0)
+    assert segments[1][:100] == b"n" * 100
+
+
+def test_shared_memory_spills_into_new_segments(monkeypatch):
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", f"CS598-test-{os.getpid()}")
+    df = generate_random_df(1000, 10)
+
+    fb_shm = FbSharedMemory(segment_size=300000)
+    try:
+        for i in range(4):
+            fb_shm.add_dataframe(f"df{i}", df)
+        assert fb_shm.catalog.num_segments > 1
+
+        # A second attachment discovers the new segments lazily.
+        fb_shm2 = FbSharedMemory(segment_size=300000)
+        assert len(fb_shm2.segments) == 1
+        assert fb_shm2.dataframe_head("df3", 1000).equals(df)
+        assert len(fb_shm2.segments) > 1
+        fb_shm2.close()
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def test_threads_attach_to_a_segment_once(monkeypatch):
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", f"CS598-test-{os.getpid()}")
+    df = generate_random_df(1000, 10)
+
+    fb_shm = FbSharedMemory(segment_size=300000)
+    try:
+        for i in range(4):
+            fb_shm.add_dataframe(f"df{i}", df)
+        fb_shm2 = FbSharedMemory(segment_size=300000)
+        attached = []
+
+        class SlowSharedMemory(shared_memory.SharedMemory):
+            # widens the window between checking for a segment and recording it
+            def __init__(self, *args, **kwargs):
+                time.sleep(0.05)
+                super().__init__(*args, **kwargs)
+                attached.append(self.name)
+
+        monkeypatch.setattr(fb_shared_memory.shared_memory, "SharedMemory", SlowSharedMemory)
+        threads = [threading.Thread(target=fb_shm2.dataframe_head, args=("df3", 10)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(attached) == len(set(attached)) == len(fb_shm2.segments) - 1
+        fb_shm2.close()
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def test_shared_memory_remove_and_compact():
+    df1 = generate_random_df(10, 1)
+    df2 = generate_random_df(20, 1)
+
+    fb_shm = FbSharedMemory()
+    fb_shm.add_dataframe("catalog_df1", df1)
+    fb_shm.add_dataframe("catalog_df2", df2)
+    fb_shm.remove_dataframe("catalog_df1")
+    fb_shm.compact()
+
+    assert FbSharedMemory().dataframe_head("catalog_df2", 20).equals(df2)
+    with pytest.raises(KeyError):
+        fb_shm.dataframe_head("catalog_df1")
+    fb_shm.remove_dataframe("catalog_df2")
+    fb_shm.close()
+
+
+def test_shared_memory_reads_do_not_pin_the_segment(monkeypatch):
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", f"CS598-test-{os.getpid()}")
+    df = generate_random_df(100, 2)
+
+    fb_shm = FbSharedMemory(segment_size=1000000)
+    fb_shm.add_dataframe("df", df)
+    head = fb_shm.dataframe_head("df", 100)
+    group_by = fb_shm.dataframe_group_by_sum("df", "int_col", "float_col")
+    fb_shm.unlink()
+
+    # Results are read straight from shared memory but hold no views into it, so it can be unmapped.
+    fb_shm.catalog = None
+    fb_shm.df_shared_memory.close()
+    assert head.equals(df)
+    pd.testing.assert_frame_equal(group_by, df.groupby("int_col").agg({"float_col": "sum"}))
+
+
+def test_shared_memory_streams_chunks_across_segments(monkeypatch):
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", f"CS598-test-{os.getpid()}")
+    df = generate_random_df(20000, 10)
+    chunks = (df.iloc[start:start + 2000] for start in range(0, len(df), 2000))
+
+    fb_shm = FbSharedMemory(segment_size=200000)
+    try:
+        fb_shm.add_dataframe("before", df.head(10))
+        fb_shm.add_dataframe_stream("streamed", chunks)
+        # The stream outgrew its first extent and was moved, leaving the free space behind usable.
+        assert fb_shm.catalog.num_segments > 1
+        fb_shm.add_dataframe("after", df.head(10))
+
+        assert fb_shm.dataframe_head("streamed", 20000).equals(df)
+        pd.testing.assert_frame_equal(fb_shm.dataframe_group_by_sum("streamed", "int_col", "float_col"),
+                                      df.groupby("int_col").agg({"float_col": "sum"}))
+        assert fb_shm.dataframe_head("after", 10).equals(df.head(10))
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def test_shared_memory_filters_in_place(monkeypatch):
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", f"CS598-test-{os.getpid()}")
+    df = generate_random_df(1000, 1)
+
+    fb_shm = FbSharedMemory(segment_size=1000000)
+    try:
+        fb_shm.add_dataframe("df", df, row_group_size=128)
+        predicate = ("or", ("int_col", "==", 3), ("float_col", "<", 0.1))
+        expected = df[(df["int_col"] == 3) | (df["float_col"] < 0.1)]
+        selection = fb_shm.dataframe_filter("df", predicate)
+
+        assert np.array_equal(selection, expected.index.to_numpy())
+        assert fb_shm.dataframe_head("df", 3, selection).equals(expected.head(3).reset_index(drop=True))
+        assert fb_shm.dataframe_select("df", ["float_col"], where=predicate).equals(
+            expected[["float_col"]].reset_index(drop=True))
+        pd.testing.assert_frame_equal(fb_shm.dataframe_group_by("df", "int_col", {"float_col": ["min", "max"]},
+                                                                selection=selection),
+                                      expected.groupby("int_col").agg({"float_col": ["min", "max"]}))
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def test_shared_memory_caches_descriptors_per_version(monkeypatch):
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", f"CS598-test-{os.getpid()}")
+    df = generate_random_df(500, 2)
+
+    fb_shm = FbSharedMemory(segment_size=1000000, descriptor_cache_size=2, result_cache_size=0)
+    try:
+        fb_shm.add_dataframe("df", df, row_group_size=100)
+        expected = df.groupby("int_col").agg({"float_col": "sum"})
+        for _ in range(3):
+            pd.testing.assert_frame_equal(fb_shm.dataframe_group_by_sum("df", "int_col", "float_col"), expected)
+        assert (fb_shm.descriptor_cache.hits, fb_shm.descriptor_cache.misses) == (2, 1)
+
+        # Mapping bumps the version: the next read resolves the descriptors again.
+        fb_shm.dataframe_map_numeric_column("df", "float_col", lambda x: x + 1)
+        df["float_col"] += 1
+        pd.testing.assert_frame_equal(fb_shm.dataframe_head("df", 500), df)
+        assert fb_shm.descriptor_cache.misses == 2
+
+        # A dataframe added again under the same name never reuses the old descriptors.
+        fb_shm.remove_dataframe("df")
+        fb_shm.add_dataframe("df", df[["float_col", "int_col"]])
+        assert fb_shm.dataframe_head("df", 500).equals(df[["float_col", "int_col"]])
+        assert fb_shm.descriptor_cache.misses == 3
+
+        for name in ["a", "b", "c"]:
+            fb_shm.add_dataframe(name, df)
+            fb_shm.dataframe_head(name)
+        assert len(fb_shm.descriptor_cache) == 2
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def test_shared_memory_caches_group_by_results(monkeypatch):
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", f"CS598-test-{os.getpid()}")
+    df = generate_random_df(500, 1)
+
+    fb_shm = FbSharedMemory(segment_size=1000000, result_cache_size=2)
+    try:
+        fb_shm.add_dataframe("df", df)
+        expected = df.groupby("int_col").agg({"float_col": "sum"})
+        first = fb_shm.dataframe_group_by_sum("df", "int_col", "float_col")
+        first["float_col"] = 0
+        pd.testing.assert_frame_equal(fb_shm.dataframe_group_by_sum("df", "int_col", "float_col"), expected)
+        assert (fb_shm.result_cache.hits, fb_shm.result_cache.misses) == (1, 1)
+
+        # Mapping and re-adding bump the version, so the cached result is never returned again.
+        fb_shm.dataframe_map_numeric_column("df", "float_col", lambda x: x * 2)
+        pd.testing.assert_frame_equal(fb_shm.dataframe_group_by_sum("df", "int_col", "float_col"), expected * 2)
+        fb_shm.remove_dataframe("df")
+        fb_shm.add_dataframe("df", df)
+        pd.testing.assert_frame_equal(fb_shm.dataframe_group_by_sum("df", "int_col", "float_col"), expected)
+        assert (fb_shm.result_cache.hits, fb_shm.result_cache.misses) == (1, 3)
+
+        # Queries with different parameters are cached separately, up to result_cache_size of them.
+        aggregates = {"float_col": ["min", "max"]}
+        pd.testing.assert_frame_equal(fb_shm.dataframe_group_by("df", "int_col", aggregates),
+                                      df.groupby("int_col").agg(aggregates))
+        fb_shm.dataframe_group_by("df", "int_col", aggregates)
+        fb_shm.dataframe_group_by("df", "int_col", aggregates, where=("float_col", "<", 0.5))
+        assert (fb_shm.result_cache.hits, fb_shm.result_cache.misses) == (2, 4)
+        assert len(fb_shm.result_cache) == 2
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def test_parallel_executor_matches_single_read():
+    name = f"CS598-test-{os.getpid()}"
+    df = generate_random_df(2000, 1)
+
+    # workers attach to the executor's shared memory by name, and never create one
+    with pytest.raises(FileNotFoundError):
+        FbSharedMemory(shm_name=f"{name}-missing", create=False)
+    fb_shm = FbSharedMemory(segment_size=1000000, result_cache_size=0, shm_name=name)
+    try:
+        fb_shm.add_dataframe("df", df, row_group_size=300)
+        aggregates = {"float_col": ["sum", "mean", "min"], "additional_col_0": ["max", "count"]}
+        predicate = ("or", ("int_col", "==", 3), ("float_col", "<", 100.0))
+        with FbParallelExecutor(fb_shm, workers=2) as executor:
+            pd.testing.assert_frame_equal(executor.group_by("df", "string_col", aggregates),
+                                          fb_shm.dataframe_group_by("df", "string_col", aggregates))
+            selection = executor.filter("df", predicate)
+            assert np.array_equal(selection, fb_shm.dataframe_filter("df", predicate))
+            pd.testing.assert_frame_equal(executor.group_by("df", "int_col", aggregates, selection=selection),
+                                          fb_shm.dataframe_group_by("df", "int_col", aggregates, selection=selection))
+
+            # The workers read the dataframe in place, so they see it mapped.
+            fb_shm.dataframe_map_numeric_column("df", "float_col", lambda x: x + 1)
+            pd.testing.assert_frame_equal(executor.group_by_sum("df", "int_col", "float_col"),
+                                          df.groupby("int_col").agg({"float_col": lambda x: (x + 1).sum()}))
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def test_async_requests_are_batched_per_dataframe(monkeypatch):
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", f"CS598-test-{os.getpid()}")
+    df = generate_random_df(1000, 1)
+
+    fb_shm = FbSharedMemory(segment_size=1000000)
+    async_shm = AsyncFbSharedMemory(fb_shm, max_workers=2)
+    try:
+        fb_shm.add_dataframe("a", df)
+        fb_shm.add_dataframe("b", df, row_group_size=300)
+        aggregates = {"float_col": ["sum", "mean"], "additional_col_0": "max"}
+        predicate = ("int_col", "<", 3)
+
+        async def clients():
+            return await asyncio.gather(
+                async_shm.head("a"), async_shm.head("a", 12, ["float_col", "int_col"]),
+                async_shm.group_by_sum("b", "int_col", "float_col"),
+                async_shm.group_by_sum("b", "int_col", "float_col"),
+                async_shm.group_by("b", "int_col", aggregates), async_shm.filter("b", predicate),
+                async_shm.head("a", columns=["missing_col"]), return_exceptions=True)
+
+        results = asyncio.run(clients())
+        # One batch per dataframe, each answered from a single read.
+        assert (async_shm.batches, async_shm.requests) == (2, 7)
+        pd.testing.assert_frame_equal(results[0], fb_shm.dataframe_head("a"))
+        pd.testing.assert_frame_equal(results[1], fb_shm.dataframe_head("a", 12, columns=["float_col", "int_col"]))
+        pd.testing.assert_frame_equal(results[2], fb_shm.dataframe_group_by_sum("b", "int_col", "float_col"))
+        pd.testing.assert_frame_equal(results[3], results[2])
+        assert results[3] is not results[2]
+        pd.testing.assert_frame_equal(results[4], fb_shm.dataframe_group_by("b", "int_col", aggregates))
+        assert np.array_equal(results[5], fb_shm.dataframe_filter("b", predicate))
+        # A failing request gets its own error without failing the rest of its batch.
+        assert isinstance(results[6], KeyError)
+
+        async_shm.batching = False
+        pd.testing.assert_frame_equal(asyncio.run(async_shm.head("a")), results[0])
+        with pytest.raises(KeyError):
+            asyncio.run(async_shm.head("missing"))
+    finally:
+        async_shm.close()
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def test_shared_memory_group_by_composite_keys(monkeypatch):
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", f"CS598-test-{os.getpid()}")
+    df = generate_random_df(500, 2)
+
+    fb_shm = FbSharedMemory(segment_size=1000000)
+    try:
+        fb_shm.add_dataframe("df", df, row_group_size=200)
+        keys = ["int_col", "string_col"]
+        pairs = [("float_col", "sum"), ("additional_col_0", "max")]
+        expected = df.groupby(keys).agg({"float_col": ["sum"], "additional_col_0": ["max"]})
+        pd.testing.assert_frame_equal(fb_shm.dataframe_group_by("df", keys, pairs), expected)
+        # Pairs and dicts give differently labelled results, so they are cached apart.
+        pd.testing.assert_frame_equal(fb_shm.dataframe_group_by("df", keys, dict(pairs)),
+                                      df.groupby(keys).agg(dict(pairs)))
+        pd.testing.assert_frame_equal(fb_shm.dataframe_group_by("df", keys, pairs), expected)
+        assert (fb_shm.result_cache.hits, fb_shm.result_cache.misses) == (1, 2)
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def test_shared_memory_appends_rows_and_merges_them(monkeypatch):
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", f"CS598-test-{os.getpid()}")
+    df = generate_random_df(1000, 1)
+    df["nullable"] = pd.array([None if i % 3 == 0 else i for i in range(1000)], dtype="Int64")
+
+    fb_shm = FbSharedMemory(segment_size=2000000)
+    try:
+        fb_shm.add_dataframe("df", df.iloc[:400], row_group_size=100)
+        fb_shm.add_dataframe("next", df.iloc[:10])
+        # Readers see the union of the dataframe and the appended rows.
+        fb_shm.append_rows("df", df.iloc[400:700])
+        fb_shm.append_rows("df", df.iloc[700:800])
+        pd.testing.assert_frame_equal(fb_shm.dataframe_select("df"), df.iloc[:800])
+        pd.testing.assert_frame_equal(fb_shm.dataframe_group_by_sum("df", "int_col", "float_col"),
+                                      df.iloc[:800].groupby("int_col").agg({"float_col": "sum"}))
+        with pytest.raises(ValueError):
+            fb_shm.append_rows("df", df[["int_col", "float_col"]])
+        with pytest.raises(KeyError):
+            fb_shm.append_rows("missing", df)
+
+        # Rows appended while the frames are being merged stay appended after the merged frame.
+        serialize = fb_shared_memory.to_flatbuffer
+
+        def append_while_merging(*args):
+            monkeypatch.setattr(fb_shared_memory, "to_flatbuffer", serialize)
+            fb_shm.append_rows("df", df.iloc[800:])
+            return serialize(*args)
+
+        monkeypatch.setattr(fb_shared_memory, "to_flatbuffer", append_while_merging)
+        assert fb_shm.merge_appended("df")
+        assert fb_shm._read_dataframe("df", lambda fb_buf: len(fb_buf.descriptors)) == 2
+        pd.testing.assert_frame_equal(fb_shm.dataframe_select("df"), df)
+
+        # A merge that raced with a map is done again.
+        def map_while_merging(*args):
+            monkeypatch.setattr(fb_shared_memory, "to_flatbuffer", serialize)
+            fb_shm.dataframe_map_numeric_column("df", "float_col", lambda x: x + 1)
+            return serialize(*args)
+
+        monkeypatch.setattr(fb_shared_memory, "to_flatbuffer", map_while_merging)
+        assert fb_shm.merge_appended("df")
+        assert not fb_shm.merge_appended("df")
+        expected = df.assign(float_col=df["float_col"] + 1)
+        pd.testing.assert_frame_equal(fb_shm.dataframe_select("df"), expected)
+
+        fb_shm.start_merging(interval=0.01, min_frames=2)
+        fb_shm.append_rows("next", df.iloc[10:20])
+        for _ in range(500):
+            if fb_shm._read_dataframe("next", lambda fb_buf: len(fb_buf.descriptors)) == 1:
+                break
+            time.sleep(0.01)
+        fb_shm.stop_merging()
+        pd.testing.assert_frame_equal(fb_shm.dataframe_select("next"), df.iloc[:20])
+        assert fb_shm._read_dataframe("next", lambda fb_buf: len(fb_buf.descriptors)) == 1
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
+
+
+def test_shared_memory_saves_and_loads_dataframe_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", f"CS598-test-{os.getpid()}")
+    df = generate_random_df(500, 1)
+    path = str(tmp_path / "df.fbdf")
+
+    fb_shm = FbSharedMemory(segment_size=1000000)
+    try:
+        fb_shm.add_dataframe("df", df.iloc[:300], row_group_size=100)
+        fb_shm.append_rows("df", df.iloc[300:])
+        fb_shm.save_dataframe("df", path)
+        fb_shm.add_dataframe_file("loaded", path)
+        pd.testing.assert_frame_equal(fb_shm.dataframe_select("loaded"), df)
+        assert fb_shm._read_dataframe("loaded", lambda fb_buf: len(fb_buf.descriptors)) == 2
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()
@@ -0,0 +1,606 @@
+import flatbuffers
+import io
+import math
+import mmap
+import numpy as np
+import pandas as pd
+import pytest
+
+import fb_dataframe
+import fb_file
+import fb_schema
+from fb_cache import LruCache
+from fb_descriptors import COLUMN_VECTORS, ColumnDescriptor
+from fb_file import FbFile, PAGE_SIZE, save_flatbuffer
+from fb_dataframe import to_flatbuffer, fb_dataframe_head, fb_dataframe_group_by, fb_dataframe_map_numeric_column, \
+    fb_dataframe_write_stream, fb_dataframe_column_stats, fb_dataframe_filter, fb_dataframe_schema, fb_dataframe_select, \
+    fb_dataframe_describe, _column_values, _find_columns
+from Project.DataFrame import Column, DataFrame, Metadata
+from Project.DataFrame.DataType import DataType
+from Project.DataFrame.Encoding import Encoding
+from test_fb_dataframe import generate_random_df
+
+
+def test_to_flatbuffer_numeric_columns_round_trip():
+    df = generate_random_df(257, 2)
+
+    fb_df = to_flatbuffer(df)
+
+    # Bulk-copied vectors hold the raw little-endian column buffers.
+    assert df["int_col"].to_numpy().astype('<i8').tobytes() in fb_df
+    assert df["float_col"].to_numpy().astype('<f8').tobytes() in fb_df
+    assert fb_dataframe_head(fb_df, len(df)).equals(df)
+
+
+def test_to_flatbuffer_numeric_columns_match_per_cell_build(monkeypatch):
+    df = generate_random_df(257, 2)
+    bulk = to_flatbuffer(df)
+
+    create_numpy_vector = flatbuffers.Builder.CreateNumpyVector
+    prepend = {np.dtype('int64'): flatbuffers.Builder.PrependInt64,
+               np.dtype('float64'): flatbuffers.Builder.PrependFloat64}
+
+    def per_cell(builder, values):
+        # The original to_flatbuffer loop: StartVector and one Prepend per value, last to first.
+        if values.dtype not in prepend:
+            return create_numpy_vector(builder, values)
+        builder.StartVector(8, len(values), 8)
+        for value in values[::-1]:
+            prepend[values.dtype](builder, value)
+        return builder.EndVector()
+
+    monkeypatch.setattr(flatbuffers.Builder, "CreateNumpyVector", per_cell)
+    assert to_flatbuffer(df) == bulk
+
+
+def test_column_values_are_zero_copy_views():
+    df = generate_random_df(50, 1)
+    fb_buf = bytearray(to_flatbuffer(df))
+
+    root_df = DataFrame.DataFrame.GetRootAsDataFrame(fb_buf, 0)
+    columns = _find_columns(root_df, ["int_col", "float_col", "string_col"])
+    int_values = _column_values(*columns["int_col"])
+    float_values = _column_values(*columns["float_col"])
+
+    assert np.array_equal(int_values, df["int_col"].to_numpy())
+    assert np.array_equal(float_values, df["float_col"].to_numpy())
+    assert _column_values(*columns["string_col"], rows=3) == list(df["string_col"][:3])
+
+    # Views share memory with the flatbuffer instead of copying it.
+    assert np.shares_memory(int_values, np.frombuffer(fb_buf, dtype=np.uint8))
+    int_values[0] = -1
+    assert fb_dataframe_head(fb_buf, 1)["int_col"][0] == -1
+
+
+def test_map_numeric_column_vectorized_and_fallback():
+    df = generate_random_df(1000, 1)
+    fb_buf = to_flatbuffer(df)
+
+    fb_dataframe_map_numeric_column(fb_buf, "int_col", np.negative)
+    fb_dataframe_map_numeric_column(fb_buf, "additional_col_0", lambda x: x if x > 500 else 0)
+    fb_dataframe_map_numeric_column(fb_buf, "float_col", math.sqrt)
+    fb_dataframe_map_numeric_column(fb_buf, "string_col", lambda x: x + "!")
+    fb_dataframe_map_numeric_column(fb_buf, "missing_col", lambda x: x)
+
+    df["int_col"] = -df["int_col"]
+    df["additional_col_0"] = df["additional_col_0"].apply(lambda x: x if x > 500 else 0)
+    df["float_col"] = df["float_col"].apply(math.sqrt)
+    assert fb_dataframe_head(fb_buf, len(df)).equals(df)
+
+    with pytest.raises(TypeError):
+        fb_dataframe_map_numeric_column(bytes(fb_buf), "int_col", lambda x: x * 2)
+
+
+def test_map_numeric_column_calls_map_func_once_per_element():
+    df = generate_random_df(300, 1)
+    fb_buf = to_flatbuffer(df)
+    calls = []
+
+    def doubled(x):
+        calls.append(x)
+        return x * 2
+
+    fb_dataframe_map_numeric_column(fb_buf, "int_col", doubled)
+    assert len(calls) == len(df)
+
+    # vectorized functions are called once, and what they raise isn't swallowed
+    fb_dataframe_map_numeric_column(fb_buf, "int_col", lambda x: calls.append(x) or x + 1, vectorized=True)
+    assert len(calls) == len(df) + 1
+    assert fb_dataframe_head(fb_buf, len(df))["int_col"].equals(df["int_col"] * 2 + 1)
+    with pytest.raises(ZeroDivisionError):
+        fb_dataframe_map_numeric_column(fb_buf, "int_col", lambda x: 1 // 0, vectorized=True)
+    with pytest.raises(ValueError):
+        fb_dataframe_map_numeric_column(fb_buf, "int_col", lambda x: x.sum(), vectorized=True)
+
+
+@pytest.mark.parametrize("row_group_size", [None, 50])
+def test_failing_map_leaves_column_unchanged(monkeypatch, row_group_size):
+    monkeypatch.setattr(fb_dataframe, "MAP_CHUNK_SIZE", 16)
+    df = generate_random_df(200, 1)
+    fb_buf = to_flatbuffer(df, row_group_size)
+    before = bytes(fb_buf)
+    seen = []
+
+    def failing(x):
+        # fails in the last chunk, after every earlier chunk (and row group) was mapped
+        seen.append(x)
+        if len(seen) == len(df):
+            raise RuntimeError("map failed")
+        return x + 1
+
+    with pytest.raises(RuntimeError):
+        fb_dataframe_map_numeric_column(fb_buf, "int_col", failing)
+    assert bytes(fb_buf) == before
+
+
+def test_stream_reads_as_one_dataframe(tmp_path):
+    df = generate_random_df(1000, 5)
+    chunks = [df.iloc[start:start + 300] for start in range(0, len(df), 300)]
+
+    path = tmp_path / "df.fbs"
+    with open(path, "wb") as out:
+        written = fb_dataframe_write_stream(iter(chunks), out)
+    fb_buf = bytearray(path.read_bytes())
+    assert written == len(fb_buf)
+
+    assert fb_dataframe_head(fb_buf, 5).equals(df.head(5))
+    assert fb_dataframe_head(fb_buf, 650).equals(df.head(650))
+    pd.testing.assert_frame_equal(fb_dataframe_group_by(fb_buf, "int_col", {"float_col": ["sum", "count"]}),
+                                  df.groupby("int_col").agg({"float_col": ["sum", "count"]}))
+
+    fb_dataframe_map_numeric_column(fb_buf, "int_col", lambda x: x * 2)
+    assert np.array_equal(fb_dataframe_head(fb_buf, 1000)["int_col"], df["int_col"] * 2)
+
+    out = io.BytesIO()
+    fb_dataframe_write_stream([], out)
+    assert fb_dataframe_head(out.getvalue()).empty
+
+
+def _to_flatbuffer_without_stats(df: pd.DataFrame) -> bytes:
+    # The layout written before row groups and column statistics were added to the schema.
+    builder = flatbuffers.Builder(1024)
+    column_offsets = []
+    for col_name in df.columns[::-1]:
+        name_offset = builder.CreateString(col_name)
+        dtype = {'int64': DataType.Int64, 'float64': DataType.Float, 'object': DataType.String}[str(df[col_name].dtype)]
+        if dtype == DataType.String:
+            string_offsets = [builder.CreateString(value) for value in df[col_name][::-1]]
+            Column.ColumnStartStringValuesVector(builder, len(string_offsets))
+            for offset in string_offsets:
+                builder.PrependUOffsetTRelative(offset)
+            values_offset = builder.EndVector()
+        else:
+            values_offset = builder.CreateNumpyVector(df[col_name].to_numpy())
+        Metadata.MetadataStart(builder)
+        Metadata.MetadataAddName(builder, name_offset)
+        Metadata.MetadataAddDtype(builder, dtype)
+        metadata_offset = Metadata.MetadataEnd(builder)
+        Column.ColumnStart(builder)
+        Column.ColumnAddMetadata(builder, metadata_offset)
+        if dtype == DataType.Int64:
+            Column.ColumnAddIntValues(builder, values_offset)
+        elif dtype == DataType.Float:
+            Column.ColumnAddFloatValues(builder, values_offset)
+        else:
+            Column.ColumnAddStringValues(builder, values_offset)
+        column_offsets.append(Column.ColumnEnd(builder))
+    DataFrame.DataFrameStartColumnsVector(builder, len(column_offsets))
+    for offset in reversed(column_offsets):
+        builder.PrependUOffsetTRelative(offset)
+    columns_offset = builder.EndVector()
+    DataFrame.DataFrameStart(builder)
+    DataFrame.DataFrameAddColumns(builder, columns_offset)
+    builder.Finish(DataFrame.DataFrameEnd(builder))
+    return builder.Output()
+
+
+@pytest.mark.parametrize("row_group_size", [None, 1, 64, 1000])
+def test_row_groups_round_trip_with_stats(row_group_size):
+    df = generate_random_df(300, 2)
+    df.loc[7, "float_col"] = math.nan
+
+    fb_buf = bytearray(to_flatbuffer(df, row_group_size))
+
+    assert fb_dataframe_head(fb_buf, 300).equals(df)
+    assert fb_dataframe_head(fb_buf, 100).equals(df.head(100))
+    assert fb_dataframe_column_stats(fb_buf, "int_col") == {
+        "count": 300, "null_count": 0, "min": df["int_col"].min(), "max": df["int_col"].max()}
+    assert fb_dataframe_column_stats(fb_buf, "float_col")["null_count"] == 1
+    assert fb_dataframe_column_stats(fb_buf, "string_col")["max"] == df["string_col"].max()
+    pd.testing.assert_frame_equal(
+        fb_dataframe_group_by(fb_buf, "int_col", {"float_col": "sum"}, where=[("string_col", "<", "M")]),
+        df[df["string_col"] < "M"].groupby("int_col").agg({"float_col": "sum"}))
+
+    # Mapping a column keeps its stats up to date.
+    fb_dataframe_map_numeric_column(fb_buf, "int_col", lambda x: x - 100)
+    assert fb_dataframe_column_stats(fb_buf, "int_col")["max"] == df["int_col"].max() - 100
+
+
+def test_row_group_stats_skip_groups(monkeypatch):
+    df = generate_random_df(1000, 1).sort_values("int_col", ignore_index=True)
+    fb_df = to_flatbuffer(df, row_group_size=100)
+
+    reads = []
+    column_values = fb_dataframe._column_values
+    monkeypatch.setattr(fb_dataframe, "_column_values", lambda *args: reads.append(args) or column_values(*args))
+    result = fb_dataframe_group_by(fb_df, "int_col", {"float_col": "sum"}, where=[("int_col", ">=", 9)])
+
+    pd.testing.assert_frame_equal(result, df[df["int_col"] >= 9].groupby("int_col").agg({"float_col": "sum"}))
+    # Only the groups holding keys >= 9 are read (where column, key and value column each).
+    assert len(reads) == 3 * len(set(df.index[df["int_col"] >= 9] // 100))
+    with pytest.raises(ValueError):
+        fb_dataframe_group_by(fb_df, "int_col", {"float_col": "sum"}, where=[("int_col", "~", 9)])
+
+
+def test_frames_without_stats_are_still_readable():
+    df = generate_random_df(100, 1)
+    fb_buf = bytearray(_to_flatbuffer_without_stats(df))
+
+    assert fb_dataframe_head(fb_buf, 100).equals(df)
+    assert fb_dataframe_column_stats(fb_buf, "string_col")["min"] == df["string_col"].min()
+    assert fb_dataframe_column_stats(fb_buf, "float_col")["max"] == df["float_col"].max()
+    pd.testing.assert_frame_equal(
+        fb_dataframe_group_by(fb_buf, "int_col", {"float_col": "max"}, where=[("float_col", ">", 5000.0)]),
+        df[df["float_col"] > 5000.0].groupby("int_col").agg({"float_col": "max"}))
+    fb_dataframe_map_numeric_column(fb_buf, "int_col", lambda x: x * 2)
+    assert fb_dataframe_head(fb_buf, 100)["int_col"].equals(df["int_col"] * 2)
+
+
+def test_repetitive_strings_are_dictionary_encoded():
+    df = generate_random_df(1000, 1)
+    df["user_id"] = np.random.choice(["u1", "u2", "u3"], len(df)).astype(object)
+
+    fb_df = to_flatbuffer(df)
+    columns = _find_columns(DataFrame.DataFrame.GetRootAsDataFrame(fb_df, 0), ["user_id", "string_col"])
+
+    # Distinct random strings stay plain; the repetitive column stores 3 strings plus int32 codes.
+    assert columns["string_col"][0].CodesIsNone()
+    assert columns["user_id"][0].DictionaryLength() == 3
+    assert len(fb_df) < len(to_flatbuffer(df.assign(user_id=df["user_id"] + df.index.astype(str))))
+    assert isinstance(_column_values(*columns["user_id"]), pd.Categorical)
+    assert fb_dataframe_head(fb_df, 1000).equals(df)
+    assert fb_dataframe_head(fb_df, 2).equals(df.head(2))
+
+
+def test_strings_are_packed_into_one_blob():
+    df = generate_random_df(100, 0)
+    df.loc[3, "string_col"] = ""
+    df.loc[4, "string_col"] = "naïve café ✓"
+
+    fb_df = to_flatbuffer(df)
+    col, dtype = _find_columns(DataFrame.DataFrame.GetRootAsDataFrame(fb_df, 0), ["string_col"])["string_col"]
+
+    assert col.StringValuesIsNone()
+    assert "".join(df["string_col"]).encode("utf-8") == col.StringDataAsNumpy().tobytes()
+    assert col.StringOffsetsLength() == 101
+    assert _column_values(col, dtype) == df["string_col"].tolist()
+    assert fb_dataframe_head(fb_df, 5).equals(df.head(5))
+
+
+@pytest.mark.parametrize("row_group_size", [None, 2])
+def test_nullable_columns_round_trip(row_group_size):
+    df = pd.DataFrame({
+        "int_col": pd.array([1, None, 3, 4, None], dtype="Int64"),
+        "float_col": pd.array([1.5, 2.5, None, 0.5, 1.0], dtype="Float64"),
+        "bool_col": pd.array([True, None, False, True, True], dtype="boolean"),
+        "string_col": pd.array(["a", "b", None, "a", "c"], dtype="string"),
+        "object_col": ["x", None, "y", "x", None],
+        "plain_bool_col": [True, False, False, True, True],
+    })
+
+    fb_buf = bytearray(to_flatbuffer(df, row_group_size))
+
+    assert fb_dataframe_head(fb_buf, 5).equals(df)
+    assert fb_dataframe_column_stats(fb_buf, "int_col") == {"count": 3, "null_count": 2, "min": 1, "max": 4}
+    assert fb_dataframe_column_stats(fb_buf, "bool_col")["null_count"] == 1
+    # Nulls never satisfy a condition.
+    pd.testing.assert_frame_equal(
+        fb_dataframe_group_by(fb_buf, "object_col", {"int_col": "sum"}, where=[("int_col", "!=", 3)]),
+        df[(df["int_col"] != 3).fillna(False)].groupby("object_col").agg({"int_col": "sum"}))
+
+    fb_dataframe_map_numeric_column(fb_buf, "int_col", lambda x: x * 10)
+    assert fb_dataframe_head(fb_buf, 5)["int_col"].equals(df["int_col"] * 10)
+
+
+@pytest.mark.parametrize("row_group_size", [None, 64])
+def test_fixed_width_datetime_and_category_columns_round_trip(row_group_size):
+    n = 200
+    df = pd.DataFrame({
+        "int8_col": np.arange(n, dtype=np.int64).astype(np.int8),
+        "uint16_col": np.arange(n, dtype=np.uint16) * 300,
+        "uint64_col": np.arange(n, dtype=np.uint64) + np.uint64(2 ** 63),
+        "float32_col": np.linspace(0, 1, n, dtype=np.float32),
+        "bool_col": np.arange(n) % 3 == 0,
+        "datetime_col": pd.date_range("2024-01-01", periods=n, freq="h"),
+        "tz_col": pd.date_range("2024-01-01", periods=n, freq="min", tz="US/Eastern"),
+        "timedelta_col": pd.to_timedelta(np.arange(n), unit="s"),
+        "category_col": pd.Categorical(np.where(np.arange(n) % 2, "b", "a"), categories=["b", "a", "c"]),
+        "int8_nullable_col": pd.array(np.arange(n) % 7, dtype="Int8"),
+    })
+    df.loc[5, "datetime_col"] = pd.NaT
+    df.loc[6, "category_col"] = None
+    df.loc[7, "int8_nullable_col"] = None
+
+    fb_buf = bytearray(to_flatbuffer(df, row_group_size))
+
+    assert fb_dataframe_head(fb_buf, n).equals(df)
+    assert fb_dataframe_head(fb_buf, 3).equals(df.head(3))
+    # Each value takes its own width: 1 byte per bool, 8 bytes per timestamp.
+    root_df = DataFrame.DataFrame.GetRootAsDataFrame(fb_buf, 0)
+    if row_group_size is None:
+        columns = _find_columns(root_df, ["bool_col", "datetime_col", "int8_col"])
+        assert columns["bool_col"][0].BoolValuesAsNumpy().nbytes == n
+        assert columns["int8_col"][0].Int8ValuesAsNumpy().nbytes == n
+        assert np.array_equal(_column_values(*columns["datetime_col"])[6:], df["datetime_col"][6:].to_numpy().view("i8"))
+    for col_name in ["uint64_col", "float32_col", "datetime_col", "tz_col", "timedelta_col"]:
+        stats = fb_dataframe_column_stats(fb_buf, col_name)
+        assert (stats["min"], stats["max"]) == (df[col_name].min(), df[col_name].max())
+
+    after = df["datetime_col"][100]
+    pd.testing.assert_frame_equal(
+        fb_dataframe_group_by(fb_buf, "category_col", {"int8_col": "sum"}, where=[("datetime_col", ">", after)]),
+        df[df["datetime_col"] > after].groupby("category_col", observed=True).agg({"int8_col": "sum"}))
+    fb_dataframe_map_numeric_column(fb_buf, "uint16_col", lambda x: x // 2)
+    assert fb_dataframe_head(fb_buf, n)["uint16_col"].equals(df["uint16_col"] // 2)
+
+
+def test_unsupported_categories_are_rejected():
+    with pytest.raises(TypeError):
+        to_flatbuffer(pd.DataFrame({"category_col": pd.Categorical([1, 2, 1])}))
+
+
+@pytest.mark.parametrize("row_group_size", [None, 300])
+def test_compressed_integer_columns_round_trip(row_group_size):
+    n = 1000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "for_col": rng.integers(10 ** 12, 10 ** 12 + 200, n),
+        "delta_col": pd.date_range("2024-01-01", periods=n, freq="s"),
+        "rle_col": np.repeat(np.arange(10, dtype=np.int32), n // 10),
+        "random_col": rng.integers(-2 ** 62, 2 ** 62, n),
+        "float_col": rng.random(n),
+        "nullable_col": pd.array(np.arange(n) % 5, dtype="Int16"),
+    })
+    df.loc[3, "nullable_col"] = None
+
+    fb_buf = bytearray(to_flatbuffer(df, row_group_size, compress=True))
+
+    assert len(fb_buf) < 0.7 * len(to_flatbuffer(df, row_group_size))
+    root_df = DataFrame.DataFrame.GetRootAsDataFrame(fb_buf, 0)
+    if row_group_size is None:
+        columns = _find_columns(root_df, list(df.columns))
+        assert {name: col.Encoding() for name, (col, _) in columns.items()} == {
+            "for_col": Encoding.FrameOfReference, "delta_col": Encoding.Delta, "rle_col": Encoding.RunLength,
+            "random_col": Encoding.Plain, "float_col": Encoding.Plain, "nullable_col": Encoding.FrameOfReference}
+    assert fb_dataframe_head(fb_buf, n).equals(df)
+    assert fb_dataframe_head(fb_buf, 7).equals(df.head(7))
+    pd.testing.assert_frame_equal(
+        fb_dataframe_group_by(fb_buf, "rle_col", {"for_col": "max"}, where=[("for_col", ">", 10 ** 12 + 100)]),
+        df[df["for_col"] > 10 ** 12 + 100].groupby("rle_col").agg({"for_col": "max"}))
+
+    # Run-length encoded columns are mapped run by run, the other encodings are encoded again in
+    # place, unless the mapped values no longer fit their encoded vectors.
+    fb_dataframe_map_numeric_column(fb_buf, "rle_col", lambda x: x * 3)
+    assert fb_dataframe_head(fb_buf, n)["rle_col"].equals(df["rle_col"] * 3)
+    assert fb_dataframe_column_stats(fb_buf, "rle_col")["max"] == 27
+    fb_dataframe_map_numeric_column(fb_buf, "for_col", lambda x: x - 10 ** 12 + 5)
+    fb_dataframe_map_numeric_column(fb_buf, "nullable_col", lambda x: x * 2)
+    expected = df.assign(for_col=df["for_col"] - 10 ** 12 + 5, nullable_col=df["nullable_col"] * 2,
+                         rle_col=df["rle_col"] * 3)
+    assert fb_dataframe_head(fb_buf, n).equals(expected)
+    assert fb_dataframe_column_stats(fb_buf, "for_col")["min"] == expected["for_col"].min()
+    with pytest.raises(TypeError):
+        fb_dataframe_map_numeric_column(fb_buf, "for_col", lambda x: x * 1000)
+    assert fb_dataframe_head(fb_buf, n).equals(expected)
+
+
+def test_map_checks_every_stream_frame_before_mapping_any(tmp_path):
+    wide = pd.DataFrame({"value": np.arange(0, 10 ** 6, 1000, dtype=np.int64)})
+    narrow = pd.DataFrame({"value": np.arange(1000, dtype=np.int64) % 100 + 50})
+    path = tmp_path / "chunks.fb"
+    with open(path, "wb") as out:
+        fb_dataframe_write_stream([wide, narrow], out, compress=True)
+    fb_buf = bytearray(path.read_bytes())
+    encodings = [DataFrame.DataFrame.GetRootAsDataFrame(frame, 0).Columns(0).Encoding()
+                 for frame in fb_dataframe._frames(fb_buf)]
+    assert encodings[0] != encodings[1] == Encoding.FrameOfReference
+
+    # through descriptors resolved before the map, which then hold outdated references
+    described = fb_dataframe_describe(fb_buf)
+    fb_dataframe_head(described, 2000)
+    fb_dataframe_map_numeric_column(described, "value", lambda x: x + 1)
+    expected = pd.concat([wide, narrow], ignore_index=True) + 1
+    assert fb_dataframe_head(described, len(expected)).equals(expected)
+    assert fb_dataframe_head(fb_buf, len(expected)).equals(expected)
+
+    # the narrow frame's uint8 offsets can't hold these, so neither frame is mapped
+    before = bytes(fb_buf)
+    with pytest.raises(TypeError):
+        fb_dataframe_map_numeric_column(fb_buf, "value", lambda x: x * 3)
+    assert bytes(fb_buf) == before
+
+
+@pytest.mark.parametrize("row_group_size", [None, 100])
+def test_filter_selection_vector_drives_head_select_and_group_by(row_group_size):
+    df = generate_random_df(1000, 1).sort_values("int_col", ignore_index=True)
+    df["nullable_col"] = pd.array(np.arange(1000) % 4, dtype="Int64")
+    df.loc[::9, "nullable_col"] = None
+    df["datetime_col"] = pd.date_range("2024-01-01", periods=1000, freq="min")
+    fb_df = to_flatbuffer(df, row_group_size)
+
+    predicate = ("or", ("int_col", "<", 2),
+                 ("and", ("float_col", ">=", 0.5), ("nullable_col", "==", 1)),
+                 [("datetime_col", ">", "2024-01-01 16:00"), ("additional_col_0", "<=", 100)])
+    expected = df[(df["int_col"] < 2) | ((df["float_col"] >= 0.5) & (df["nullable_col"] == 1)).fillna(False) |
+                  ((df["datetime_col"] > "2024-01-01 16:00") & (df["additional_col_0"] <= 100))]
+    selection = fb_dataframe_filter(fb_df, predicate)
+
+    assert np.array_equal(selection, expected.index.to_numpy())
+    assert fb_dataframe_head(fb_df, 5, selection).equals(expected.head(5).reset_index(drop=True))
+    assert fb_dataframe_select(fb_df, ["string_col", "nullable_col"], selection=selection).equals(
+        expected[["string_col", "nullable_col"]].reset_index(drop=True))
+    pd.testing.assert_frame_equal(fb_dataframe_group_by(fb_df, "nullable_col", {"float_col": "sum"}, selection=selection),
+                                  expected.groupby("nullable_col").agg({"float_col": "sum"}))
+    # where takes the same predicates; nothing selected still keeps the column dtypes.
+    assert fb_dataframe_select(fb_df, where=predicate).equals(expected.reset_index(drop=True))
+    assert fb_dataframe_select(fb_df, where=("int_col", ">", 100)).equals(df.head(0))
+
+    with pytest.raises(ValueError):
+        fb_dataframe_filter(fb_df, ("xor", ("int_col", "<", 2)))
+    with pytest.raises(KeyError):
+        fb_dataframe_filter(fb_df, ("missing_col", "<", 2))
+
+
+def test_column_lookup_uses_name_index_and_schema_cache(monkeypatch):
+    df = pd.DataFrame({f"col_{i}": np.arange(10) * i for i in range(100)})
+    df["é_col"] = pd.array(np.arange(10), dtype="Int32")
+    fb_df = to_flatbuffer(df)
+    root_df = DataFrame.DataFrame.GetRootAsDataFrame(fb_df, 0)
+    monkeypatch.setattr(fb_schema, "_schema_cache", LruCache(fb_schema.SCHEMA_CACHE_SIZE))
+
+    # Before the schema is cached, columns are found by binary search over the name index.
+    names_read = []
+    column = DataFrame.DataFrame.Columns
+    monkeypatch.setattr(DataFrame.DataFrame, "Columns", lambda self, j: names_read.append(j) or column(self, j))
+    assert fb_schema.find_columns(root_df, ["col_42", "é_col", "missing"]) == {
+        "col_42": (100 - 42, DataType.Int64), "é_col": (0, DataType.Int32)}
+    assert len(names_read) <= 3 * 8
+    assert fb_dataframe_head(fb_df, 2, columns=["é_col", "col_7"]).equals(df[["é_col", "col_7"]].head(2))
+    with pytest.raises(KeyError):
+        fb_dataframe_head(fb_df, 2, columns=["missing"])
+
+    # Reading the whole schema caches it for every frame with the same columns.
+    schema = fb_dataframe_schema(fb_df)
+    assert schema.names == list(df.columns) and schema.pandas_dtypes == {"é_col": "Int32"}
+    assert fb_dataframe_schema(to_flatbuffer(df.head(3))) is schema
+    assert fb_dataframe_schema(to_flatbuffer(df.astype({"col_1": np.int32}))) is not schema
+    names_read.clear()
+    assert fb_schema.find_columns(root_df, ["col_42"]) == {"col_42": (58, DataType.Int64)}
+    assert names_read == []
+
+
+@pytest.mark.parametrize("row_group_size", [None, 40])
+def test_described_buffer_matches_flatbuffer_reads(row_group_size):
+    df = pd.DataFrame({"key": np.repeat(np.arange(10), 10), "offset": np.arange(100) + 10 ** 9,
+                       "nullable": pd.array([None if i % 7 == 0 else i for i in range(100)], dtype="Int16"),
+                       "flag": np.arange(100) % 3 == 0, "label": ["a", "b"] * 50,
+                       "text": [f"row {i}" for i in range(100)], "value": np.linspace(0, 1, 100)})
+    fb_buf = bytearray(to_flatbuffer(df, row_group_size=row_group_size, compress=True))
+    described = fb_dataframe_describe(fb_buf)
+
+    # Every accessor of a described column matches the generated Column it describes.
+    for (_, raw_columns), (_, columns) in zip(fb_dataframe._iter_row_groups(fb_buf),
+                                              fb_dataframe._iter_row_groups(described)):
+        for name, (raw, _) in raw_columns.items():
+            col = columns[name][0]
+            for field in COLUMN_VECTORS:
+                assert getattr(col, f"{field}IsNone")() == getattr(raw, f"{field}IsNone")()
+                assert getattr(col, f"{field}Length")() == getattr(raw, f"{field}Length")()
+                if COLUMN_VECTORS[field][1] is not None:
+                    assert np.array_equal(getattr(col, f"{field}AsNumpy")(), getattr(raw, f"{field}AsNumpy")())
+            assert (col.Encoding(), col.EncodedType(), col.Reference()) == \
+                   (raw.Encoding(), raw.EncodedType(), raw.Reference())
+            assert (col.Stats() is None) == (raw.Stats() is None)
+            if raw.Stats() is not None:
+                assert col.Stats().NullCount() == raw.Stats().NullCount()
+            if not raw.DictionaryIsNone():
+                assert col.Dictionary(0) == raw.Dictionary(0)
+
+    # Queries give the same results, and columns are only resolved once they are read.
+    described = fb_dataframe_describe(fb_buf)
+    pd.testing.assert_frame_equal(fb_dataframe_group_by(described, "key", {"offset": ["sum"]}),
+                                  fb_dataframe_group_by(fb_buf, "key", {"offset": ["sum"]}))
+    assert set().union(*(columns.keys() for frame in described.descriptors for columns in frame.columns)) == \
+        {"key", "offset"}
+    assert fb_dataframe_head(described, 100).equals(fb_dataframe_head(fb_buf, 100))
+    assert fb_dataframe_select(described, where=("flag", "==", True)).equals(
+        fb_dataframe_select(fb_buf, where=("flag", "==", True)))
+    assert fb_dataframe_schema(described) is fb_dataframe_schema(fb_buf)
+
+    # Mapping values in place keeps the layout, so the descriptors stay valid.
+    fb_dataframe_map_numeric_column(described, "value", lambda x: x * 2)
+    assert fb_dataframe_head(described, 100)["value"].equals(df["value"] * 2)
+
+
+def test_column_vector_offsets_match_generated_accessors():
+    for length, (field, (_, dtype)) in enumerate(COLUMN_VECTORS.items(), 1):
+        # a Column holding only this vector, of a length no other field gets
+        builder = flatbuffers.Builder(1024)
+        if dtype is None:
+            strings = [builder.CreateString(str(j)) for j in range(length)]
+            getattr(Column, f"ColumnStart{field}Vector")(builder, length)
+            for string in reversed(strings):
+                builder.PrependUOffsetTRelative(string)
+            vector = builder.EndVector()
+        else:
+            vector = builder.CreateNumpyVector(np.ones(length, dtype=dtype))
+        Column.ColumnStart(builder)
+        getattr(Column, f"ColumnAdd{field}")(builder, vector)
+        builder.Finish(Column.ColumnEnd(builder))
+        col = Column.Column.GetRootAs(builder.Output(), 0)
+
+        descriptor = ColumnDescriptor(col)
+        assert list(descriptor.vectors) == [field]
+        assert descriptor.vectors[field][1] == getattr(col, f"{field}Length")() == length
+
+
+@pytest.mark.parametrize("row_group_size", [None, 70])
+def test_parallel_serialization_matches_sequential(row_group_size):
+    df = generate_random_df(300, 2)
+    df["nullable"] = pd.array([None if i % 7 == 0 else i for i in range(300)], dtype="Int64")
+    df["category"] = pd.Categorical(["low", "high", "mid"] * 100)
+    df["small"] = np.arange(300, dtype=np.float32)
+    sequential = to_flatbuffer(df, row_group_size, compress=True)
+    parallel = to_flatbuffer(df, row_group_size, compress=True, workers=2)
+
+    assert fb_dataframe_head(parallel, 300).equals(df)
+    assert fb_dataframe_schema(parallel).names == fb_dataframe_schema(sequential).names
+    assert fb_dataframe_column_stats(parallel, "int_col") == fb_dataframe_column_stats(sequential, "int_col")
+    pd.testing.assert_frame_equal(fb_dataframe_group_by(parallel, "int_col", {"float_col": ["sum"]}),
+                                  fb_dataframe_group_by(sequential, "int_col", {"float_col": ["sum"]}))
+    # Blocks are copied in whole, so the values of every column stay contiguous.
+    first_chunk = df["float_col"].to_numpy()[:row_group_size]
+    assert parallel.find(first_chunk.tobytes()) > 0
+
+
+@pytest.mark.parametrize("row_group_size", [None, 300])
+def test_mapped_file_is_queried_in_place(tmp_path, row_group_size):
+    df = generate_random_df(1000, 2)
+    path = tmp_path / "df.fbdf"
+    fb_bytes = to_flatbuffer(df, row_group_size)
+    assert save_flatbuffer(fb_bytes, str(path)) == PAGE_SIZE + len(fb_bytes)
+    # only the saved file is left behind
+    assert [entry.name for entry in tmp_path.iterdir()] == ["df.fbdf"]
+
+    with FbFile(str(path)) as fb_file:
+        assert fb_dataframe_head(fb_file.buf, 10).equals(df.head(10))
+        pd.testing.assert_frame_equal(fb_dataframe_group_by(fb_file.buf, "int_col", {"float_col": "sum"}),
+                                      df.groupby("int_col").agg({"float_col": "sum"}))
+        # columns are views of the read-only mapping itself, so they can't be mapped in place
+        with pytest.raises(TypeError):
+            fb_dataframe_map_numeric_column(fb_file.buf, "float_col", lambda x: x + 1)
+
+    with FbFile(str(path), writable=True) as fb_file:
+        fb_dataframe_map_numeric_column(fb_file.buf, "float_col", lambda x: x + 1)
+        fb_file.flush()
+    with FbFile(str(path)) as fb_file:
+        assert fb_dataframe_head(fb_file.buf, 1000)["float_col"].equals(df["float_col"] + 1)
+
+    path.write_bytes(b"not a dataframe file")
+    with pytest.raises(ValueError):
+        FbFile(str(path))
+
+
+def test_mapped_file_data_follows_the_page_size(tmp_path, monkeypatch):
+    assert PAGE_SIZE >= mmap.ALLOCATIONGRANULARITY and PAGE_SIZE % 4096 == 0
+    df = generate_random_df(100, 1)
+    fb_bytes = to_flatbuffer(df)
+    path = tmp_path / "df.fbdf"
+    # a file written on a host with 64K pages
+    monkeypatch.setattr(fb_file, "PAGE_SIZE", 65536)
+    assert save_flatbuffer(fb_bytes, str(path)) == 65536 + len(fb_bytes)
+    monkeypatch.undo()
+
+    assert path.read_bytes()[65536:] == fb_bytes
+    with FbFile(str(path)) as mapped:
+        assert fb_dataframe_head(mapped.buf, 100).equals(df)
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+from fb_dataframe import to_flatbuffer, fb_dataframe_group_by, fb_dataframe_group_by_partial, fb_dataframe_group_by_sum, \
+    fb_dataframe_schema
+from fb_groupby import GroupIndex, group_by_aggregate, merge_aggregates
+from test_fb_dataframe import generate_random_df
+
+
+def test_group_by_matches_pandas_agg():
+    df = generate_random_df(500, 2)
+    fb_df = to_flatbuffer(df)
+    aggregates = {"float_col": "mean", "additional_col_0": ["sum", "count", "min", "max", "mean"]}
+
+    for grouping_col_name in ["int_col", "string_col", "additional_col_1"]:
+        expected = df.groupby(grouping_col_name).agg(aggregates)
+        result = fb_dataframe_group_by(fb_df, grouping_col_name, aggregates)
+        pd.testing.assert_frame_equal(result, expected)
+
+    expected = df.groupby("int_col").agg({"additional_col_0": "sum"})
+    assert fb_dataframe_group_by_sum(fb_df, "int_col", "additional_col_0").equals(expected)
+
+
+def test_group_by_skips_nan_like_pandas():
+    df = pd.DataFrame({
+        "key": [1.0, np.nan, 2.0, 1.0, 3.0, 3.0],
+        "value": [np.nan, 5.0, 1.5, 2.5, np.nan, np.nan],
+    })
+    aggregates = {"value": ["sum", "count", "min", "max", "mean"]}
+
+    result = group_by_aggregate(df["key"].to_numpy(), "key", {"value": df["value"].to_numpy()}, aggregates)
+    pd.testing.assert_frame_equal(result, df.groupby("key").agg(aggregates))
+
+
+def test_group_by_string_sums_of_all_null_groups_match_pandas():
+    frames = [
+        pd.DataFrame({"k": [1, 1, 2, 2], "s": ["a", "b", None, None]}),
+        pd.DataFrame({"k": [1, 1, 2, 2], "s": [None, None, "a", "b"]}),
+        pd.DataFrame({"k": [1, 2, 2, 3], "s": [None, "x", None, "y"]}),
+        # repetitive enough to be dictionary-encoded
+        pd.DataFrame({"k": [1, 2, 1, 2, 3] * 20, "s": [None, "x", "b", None, None] * 20}),
+    ]
+    for df in frames:
+        fb_df = to_flatbuffer(df)
+        expected = df.groupby("k").agg({"s": "sum"})
+        pd.testing.assert_frame_equal(fb_dataframe_group_by(fb_df, "k", {"s": "sum"}), expected)
+
+        # ranges where a group has no values merge with ranges where it has some
+        partials = [fb_dataframe_group_by_partial(fb_df, "k", {"s": "sum"}, rows=(start, start + 2))
+                    for start in range(0, len(df), 2)]
+        pd.testing.assert_frame_equal(
+            merge_aggregates(partials, "k", {"s": "sum"}, fb_dataframe_schema(fb_df).pandas_dtypes), expected)
+
+
+def test_group_index_sparse_int_keys():
+    keys = np.array([10 ** 12, -5, 10 ** 12, 7], dtype=np.int64)
+    index = GroupIndex(keys)
+
+    assert list(index.keys) == [-5, 7, 10 ** 12]
+    assert list(index.inverse) == [2, 0, 2, 1]
+    assert list(index.aggregate(np.array([1, 2, 3, 4]), "sum")) == [2, 4, 4]
+
+
+def test_group_by_dictionary_encoded_strings(monkeypatch):
+    df = generate_random_df(2000, 1)
+    df["user_id"] = np.random.choice(["bob", "alice", "carol", "dave"], len(df)).astype(object)
+    aggregates = {"float_col": ["sum", "max"], "string_col": "min"}
+
+    for row_group_size in [None, 300]:
+        fb_df = to_flatbuffer(df, row_group_size)
+        pd.testing.assert_frame_equal(fb_dataframe_group_by(fb_df, "user_id", aggregates),
+                                      df.groupby("user_id").agg(aggregates))
+        pd.testing.assert_frame_equal(
+            fb_dataframe_group_by(fb_df, "user_id", {"int_col": "count"}, where=[("user_id", "!=", "bob")]),
+            df[df["user_id"] != "bob"].groupby("user_id").agg({"int_col": "count"}))
+
+    # Categorical keys are grouped by code and decoded once per group.
+    index = GroupIndex(pd.Categorical(df["user_id"]))
+    assert list(index.keys) == ["alice", "bob", "carol", "dave"]
+    assert np.array_equal(index.keys[index.inverse], df["user_id"].to_numpy())
+
+
+def test_group_by_nullable_columns_matches_pandas():
+    df = pd.DataFrame({
+        "key": pd.array([1, 2, None, 1, 3, 2], dtype="Int64"),
+        "int_col": pd.array([1, None, 3, None, None, 6], dtype="Int64"),
+        "float_col": pd.array([1.5, None, 2.0, 3.0, 1.0, None], dtype="Float64"),
+        "bool_col": pd.array([True, None, False, True, False, True], dtype="boolean"),
+        "string_col": pd.array(["a", None, "b", "a", "c", None], dtype="string"),
+    })
+    fb_df = to_flatbuffer(df)
+    numeric = ["sum", "count", "min", "max", "mean"]
+
+    for grouping_col_name in ["key", "string_col"]:
+        aggregates = {"int_col": numeric, "float_col": numeric, "bool_col": ["sum", "min", "max"]}
+        pd.testing.assert_frame_equal(fb_dataframe_group_by(fb_df, grouping_col_name, aggregates),
+                                      df.groupby(grouping_col_name).agg(aggregates))
+    pd.testing.assert_frame_equal(fb_dataframe_group_by(fb_df, "key", {"string_col": ["count", "min", "max"]}),
+                                  df.groupby("key").agg({"string_col": ["count", "min", "max"]}))
+
+
+def test_group_by_fixed_width_and_datetime_columns_matches_pandas():
+    n = 1000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "key": rng.integers(-128, 127, n).astype(np.int8),
+        "int8_col": rng.integers(-128, 127, n).astype(np.int8),
+        "uint8_col": rng.integers(0, 3, n).astype(np.uint8),
+        "uint64_col": rng.integers(0, 2 ** 64 - 1, n, dtype=np.uint64),
+        "float32_col": rng.random(n).astype(np.float32),
+        "timedelta_col": pd.to_timedelta(rng.integers(0, 10 ** 12, n)),
+        "datetime_col": pd.to_datetime(rng.integers(0, 10 ** 18, n)),
+        "Int16_col": pd.array(rng.integers(-5, 5, n), dtype="Int16"),
+    })
+    df.loc[::7, "Int16_col"] = None
+    fb_df = to_flatbuffer(df)
+
+    # Sums keep narrow int dtypes only when they fit, like pandas.
+    aggregates = {"int8_col": ["sum", "min", "mean"], "uint8_col": "sum", "uint64_col": ["min", "max", "count"],
+                  "float32_col": ["sum", "mean"], "timedelta_col": ["sum", "mean"], "datetime_col": ["min", "max"],
+                  "Int16_col": ["sum", "min", "mean"]}
+    pd.testing.assert_frame_equal(fb_dataframe_group_by(fb_df, "key", aggregates), df.groupby("key").agg(aggregates),
+                                  check_exact=False, rtol=1e-5)
+    for grouping_col_name in ["uint8_col", "datetime_col"]:
+        pd.testing.assert_frame_equal(fb_dataframe_group_by_sum(fb_df, grouping_col_name, "int8_col"),
+                                      df.groupby(grouping_col_name).agg({"int8_col": "sum"}))
+
+
+def test_group_by_float32_sums_match_pandas_within_float32_rounding():
+    n = 100000
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({"key": rng.integers(0, 20, n), "value": (rng.standard_normal(n) * 1000).astype(np.float32)})
+
+    result = fb_dataframe_group_by(to_flatbuffer(df), "key", {"value": ["sum", "mean"]})
+    expected = df.groupby("key").agg({"value": ["sum", "mean"]})
+    pd.testing.assert_index_equal(result.index, expected.index)
+    assert (result.dtypes == np.float32).all()
+
+    # Sums are accumulated in float64 and rounded to float32 once, pandas accumulates them in
+    # float32 (compensated), so the two may differ by a few float32 ulps of the summed magnitudes.
+    magnitude = df["value"].abs().groupby(df["key"]).agg(["sum", "mean"]).to_numpy(dtype=np.float64)
+    tolerance = 4 * np.finfo(np.float32).eps * magnitude
+    assert (np.abs(result.to_numpy(np.float64) - expected.to_numpy(np.float64)) <= tolerance).all()
+
+
+def test_group_by_run_length_encoded_keys_matches_pandas():
+    n = 1000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "key": pd.array(np.sort(rng.integers(0, 20, n)), dtype="Int64"),
+        "int_col": rng.integers(0, 1000, n),
+        "float_col": rng.random(n),
+    })
+    df.loc[500:520, "key"] = None
+
+    for row_group_size in [None, 128]:
+        fb_df = to_flatbuffer(df, row_group_size, compress=True)
+        aggregates = {"int_col": ["sum", "max"], "float_col": "mean"}
+        pd.testing.assert_frame_equal(fb_dataframe_group_by(fb_df, "key", aggregates), df.groupby("key").agg(aggregates))
+
+    # Groups are found from the runs and then spread over their rows.
+    index = GroupIndex(np.array([5, 3, 5]), run_lengths=np.array([2, 1, 3]))
+    assert index.keys.tolist() == [3, 5]
+    assert index.inverse.tolist() == [1, 1, 0, 1, 1, 1]
+
+
+def test_partial_aggregates_of_row_ranges_merge_like_one_pass():
+    df = generate_random_df(600, 1)
+    df["nullable"] = pd.array([None if i % 5 == 0 else i for i in range(600)], dtype="Int32")
+    df["small"] = np.arange(600, dtype=np.float32)
+    aggregates = {"float_col": ["sum", "mean", "min", "max"], "nullable": ["sum", "min", "count", "mean"],
+                  "small": "mean", "string_col": "max"}
+
+    for row_group_size in [None, 100]:
+        fb_df = to_flatbuffer(df, row_group_size)
+        for grouping_col_name in ["int_col", "nullable"]:
+            # uneven ranges, one of them empty and some cutting through row groups
+            partials = [fb_dataframe_group_by_partial(fb_df, grouping_col_name, aggregates, rows=rows)
+                        for rows in [(0, 150), (150, 150), (150, 420), (420, 600)]]
+            result = merge_aggregates(partials, grouping_col_name, aggregates, {"nullable": "Int32"})
+            pd.testing.assert_frame_equal(result, fb_dataframe_group_by(fb_df, grouping_col_name, aggregates))
+
+
+def test_group_by_composite_keys_and_aggregate_pairs_matches_pandas():
+    df = generate_random_df(1000, 2)
+    df["small"] = pd.array([None if i % 7 == 0 else i % 4 for i in range(1000)], dtype="Int64")
+    df["category"] = pd.Categorical(np.array(["z", "a", "m"])[np.arange(1000) % 3], categories=["z", "m", "a"])
+    df.loc[::11, "float_col"] = np.nan
+    aggregates = {"float_col": ["sum", "mean"], "additional_col_0": "max"}
+    pairs = [("additional_col_1", "min"), ("float_col", "sum"), ("additional_col_1", "count")]
+
+    for row_group_size in [None, 300]:
+        fb_df = to_flatbuffer(df, row_group_size)
+        for keys in [["int_col", "string_col"], ["small", "int_col"], ["category", "small"], ["float_col", "small"]]:
+            expected = df.groupby(keys, observed=True)
+            pd.testing.assert_frame_equal(fb_dataframe_group_by(fb_df, keys, aggregates), expected.agg(aggregates))
+            # pairs label the result columns by (column, aggregate), in the order given
+            pd.testing.assert_frame_equal(fb_dataframe_group_by(fb_df, keys, pairs),
+                                          expected.agg({"additional_col_1": ["min", "count"], "float_col": ["sum"]})[pairs])
+
+            partials = [fb_dataframe_group_by_partial(fb_df, keys, pairs, rows=rows) for rows in [(0, 450), (450, 1000)]]
+            pd.testing.assert_frame_equal(merge_aggregates(partials, keys, pairs, fb_dataframe_schema(fb_df).pandas_dtypes),
+                                          fb_dataframe_group_by(fb_df, keys, pairs))
+
+    # The ids of each key are combined in key order; rows with any null key are dropped.
+    index = GroupIndex.combined([np.array([2, 1, 2, 1, 9]), np.array(["b", "a", "a", "a", "c"], dtype=object)],
+                                [None, np.array([True, True, True, True, False])])
+    assert [keys.tolist() for keys in index.keys] == [[1, 2, 2], ["a", "a", "b"]]
+    assert index.inverse.tolist() == [2, 0, 1, 0]
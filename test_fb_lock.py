@@ -0,0 +1,161 @@
+import multiprocessing
+import numpy as np
+import os
+import pandas as pd
+import pytest
+import threading
+import time
+
+import fb_shared_memory
+from fb_lock import FbFileLock, lock_file_path
+from fb_shared_memory import FbSharedMemory
+
+ROWS = 200000
+
+
+def _hold_lock(path: str, start: int, acquired) -> None:
+    with FbFileLock(path).exclusive(start):
+        acquired.value = time.monotonic()
+
+
+def _map_rounds(lock_mode: str, rounds: int) -> None:
+    fb_shm = FbSharedMemory(lock_mode=lock_mode)
+    for _ in range(rounds):
+        fb_shm.dataframe_map_numeric_column("stress_df", "counter", lambda x: x + 1, vectorized=True)
+    fb_shm.close()
+
+
+def _read_rounds(lock_mode: str, rounds: int, torn) -> None:
+    fb_shm = FbSharedMemory(lock_mode=lock_mode)
+    for _ in range(rounds):
+        # Every consistent state of the column holds a single repeated value.
+        if fb_shm.dataframe_head("stress_df", ROWS)["counter"].nunique() != 1:
+            torn.value += 1
+        fb_shm.dataframe_group_by_sum("stress_df", "counter", "counter")
+    fb_shm.close()
+
+
+@pytest.fixture
+def private_shm_name(monkeypatch):
+    name = f"CS598-test-{os.getpid()}"
+    monkeypatch.setattr(fb_shared_memory, "SHM_NAME", name)
+    return name
+
+
+def test_file_lock_excludes_other_processes(tmp_path):
+    context = multiprocessing.get_context("fork")
+    path = str(tmp_path / "test.lock")
+    acquired = context.Value('d', 0.0)
+
+    with FbFileLock(path).exclusive(3):
+        child = context.Process(target=_hold_lock, args=(path, 3, acquired))
+        child.start()
+        time.sleep(0.3)
+        released = time.monotonic()
+    child.join()
+
+    assert acquired.value >= released
+
+
+def test_threads_share_and_exclude_lock_ranges(tmp_path):
+    path = str(tmp_path / "test.lock")
+    readers = 4
+    overlapping = threading.Barrier(readers, timeout=5)
+    counters = [0, 0]
+    errors = []
+
+    def read() -> None:
+        try:
+            with FbFileLock(path).shared(3):
+                # only returns once every reader holds the shared lock at the same time
+                overlapping.wait()
+        except threading.BrokenBarrierError as error:
+            errors.append(error)
+
+    def increment(slot: int) -> None:
+        for _ in range(200):
+            with FbFileLock(path).exclusive(slot + 1):
+                value = counters[slot]
+                time.sleep(0)
+                counters[slot] = value + 1
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    threads += [threading.Thread(target=increment, args=(slot,)) for slot in (0, 1) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert counters == [600, 600]
+
+
+def test_thread_exclusive_lock_only_blocks_overlapping_ranges(tmp_path):
+    path = str(tmp_path / "test.lock")
+    events = []
+
+    def lock(kind: str, start: int, length: int) -> None:
+        with getattr(FbFileLock(path), kind)(start, length):
+            events.append((kind, start))
+
+    with FbFileLock(path).exclusive(3):
+        others = [threading.Thread(target=lock, args=args)
+                  for args in (("shared", 3, 1), ("exclusive", 1, 5), ("exclusive", 4, 1), ("shared", 0, 1))]
+        for thread in others:
+            thread.start()
+        time.sleep(0.3)
+        # ranges overlapping byte 3 wait for it; the others are taken right away
+        assert sorted(events) == [("exclusive", 4), ("shared", 0)]
+    for thread in others:
+        thread.join()
+    assert len(events) == 4
+
+
+def test_record_lock_is_kept_while_any_thread_holds_it(tmp_path):
+    context = multiprocessing.get_context("fork")
+    path = str(tmp_path / "test.lock")
+    acquired = context.Value('d', 0.0)
+    first_done, second_done = threading.Event(), threading.Event()
+
+    def read(done: threading.Event) -> None:
+        with FbFileLock(path).shared(3):
+            done.wait()
+
+    readers = [threading.Thread(target=read, args=(done,)) for done in (first_done, second_done)]
+    for thread in readers:
+        thread.start()
+    time.sleep(0.1)
+    child = context.Process(target=_hold_lock, args=(path, 3, acquired))
+    child.start()
+    first_done.set()
+    time.sleep(0.3)
+    released = time.monotonic()
+    second_done.set()
+    for thread in readers:
+        thread.join()
+    child.join()
+
+    # the first reader leaving must not unlock the byte the second one still holds
+    assert acquired.value >= released
+
+
+@pytest.mark.parametrize("lock_mode", ["seqlock", "file"])
+def test_concurrent_readers_and_mappers_see_consistent_frames(private_shm_name, lock_mode):
+    context = multiprocessing.get_context("fork")
+    fb_shm = FbSharedMemory(segment_size=20000000, lock_mode=lock_mode)
+    try:
+        fb_shm.add_dataframe("stress_df", pd.DataFrame({"counter": np.zeros(ROWS, dtype=np.int64)}))
+        torn = context.Value('i', 0)
+        workers = [context.Process(target=_map_rounds, args=(lock_mode, 50)) for _ in range(2)]
+        workers += [context.Process(target=_read_rounds, args=(lock_mode, 30, torn)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        assert all(worker.exitcode == 0 for worker in workers)
+        assert torn.value == 0
+        assert (fb_shm.dataframe_head("stress_df", ROWS)["counter"] == 100).all()
+    finally:
+        fb_shm.unlink()
+        fb_shm.close()